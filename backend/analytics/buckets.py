@@ -0,0 +1,210 @@
+"""
+Maintenance of MovementDailyBucket.
+
+``record_movements`` folds newly inserted movements into their buckets with
+one UPDATE per touched bucket, creating the bucket when the UPDATE finds none.
+Large batches (bulk postings such as purchase order receipts) lock the
+existing buckets with one SELECT and write them back with bulk_update/bulk_create.
+``record_inserted`` takes a queryset of movements inserted in SQL (the expiry
+sweep's write-offs) and folds them in with one INSERT ... SELECT ... ON CONFLICT
+upsert, so the rows never reach Python.
+``rebuild_buckets`` recomputes whole days from the ledger (hot and archived
+movements) with one grouped query per tier and window, and is what the
+backfill command runs.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import ArchivedMovement, Inventory, InventoryMovement
+
+from .models import MovementDailyBucket
+
+# Above this many touched buckets, record_movements switches to the bulk path
+BULK_THRESHOLD = 50
+
+UPSERT_SQL = """
+    INSERT INTO {bucket} (organization_id, store_id, item_id, movement_type, day, quantity_total, movement_count)
+    SELECT organization_id, store_id, item_id, movement_type, bucket_day, quantity, movement_count
+    FROM ({totals}) totals
+    WHERE true
+    ON CONFLICT (organization_id, store_id, item_id, movement_type, day) DO UPDATE SET
+        quantity_total = {bucket}.quantity_total + excluded.quantity_total,
+        movement_count = {bucket}.movement_count + excluded.movement_count
+"""
+
+
+def _bucket_totals(movements):
+    """{(organization, store, item, movement_type, day): [quantity, count]}"""
+    movements = list(movements)
+    placement = {
+        pk: (organization_id, store_id, item_id)
+        for pk, organization_id, store_id, item_id in Inventory.objects.filter(
+            pk__in={movement.inventory_id for movement in movements}
+        ).values_list("pk", "store__organization_id", "store_id", "item_id")
+    }
+
+    totals = defaultdict(lambda: [0, 0])
+    for movement in movements:
+        created_at = movement.created_at or timezone.now()
+        key = (*placement[movement.inventory_id], movement.movement_type, timezone.localdate(created_at))
+        totals[key][0] += movement.quantity
+        totals[key][1] += 1
+    return totals
+
+
+def _add(key, quantity, count):
+    organization_id, store_id, item_id, movement_type, day = key
+    lookup = dict(
+        organization_id=organization_id,
+        store_id=store_id,
+        item_id=item_id,
+        movement_type=movement_type,
+        day=day,
+    )
+    updated = MovementDailyBucket.objects.filter(**lookup).update(
+        quantity_total=F("quantity_total") + quantity,
+        movement_count=F("movement_count") + count,
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            MovementDailyBucket.objects.create(quantity_total=quantity, movement_count=count, **lookup)
+    except IntegrityError:
+        # Another writer created the bucket first
+        MovementDailyBucket.objects.filter(**lookup).update(
+            quantity_total=F("quantity_total") + quantity,
+            movement_count=F("movement_count") + count,
+        )
+
+
+def _bucket_key(bucket):
+    return (
+        bucket.organization_id, bucket.store_id, bucket.item_id, bucket.movement_type, bucket.day,
+    )
+
+
+def _add_many(totals):
+    with transaction.atomic():
+        existing = {
+            _bucket_key(bucket): bucket
+            for bucket in MovementDailyBucket.objects.select_for_update().filter(
+                store_id__in={key[1] for key in totals},
+                item_id__in={key[2] for key in totals},
+                movement_type__in={key[3] for key in totals},
+                day__in={key[4] for key in totals},
+            )
+        }
+
+        updated, created = [], []
+        for key, (quantity, count) in totals.items():
+            bucket = existing.get(key)
+            if bucket is None:
+                organization_id, store_id, item_id, movement_type, day = key
+                created.append(MovementDailyBucket(
+                    organization_id=organization_id, store_id=store_id, item_id=item_id,
+                    movement_type=movement_type, day=day,
+                    quantity_total=quantity, movement_count=count,
+                ))
+            else:
+                bucket.quantity_total += quantity
+                bucket.movement_count += count
+                updated.append(bucket)
+
+        MovementDailyBucket.objects.bulk_update(updated, ["quantity_total", "movement_count"], batch_size=500)
+        try:
+            with transaction.atomic():
+                MovementDailyBucket.objects.bulk_create(created, batch_size=1000)
+        except IntegrityError:
+            # Another writer created some of these buckets first
+            for bucket in created:
+                _add(_bucket_key(bucket), bucket.quantity_total, bucket.movement_count)
+
+
+def record_movements(movements):
+    totals = _bucket_totals(movements)
+    if len(totals) > BULK_THRESHOLD:
+        _add_many(totals)
+        return
+
+    for key, (quantity, count) in totals.items():
+        _add(key, quantity, count)
+
+
+def _grouped_totals(movements):
+    """Per-bucket quantity and count of a movement queryset, grouped in the database"""
+    return (
+        movements.order_by()
+        .annotate(bucket_day=TruncDate("created_at"))
+        .values(
+            "movement_type",
+            "bucket_day",
+            organization_id=F("inventory__store__organization_id"),
+            store_id=F("inventory__store_id"),
+            item_id=F("inventory__item_id"),
+        )
+        .annotate(quantity=Sum("quantity"), movement_count=Count("pk"))
+    )
+
+
+def record_inserted(movements):
+    """Fold a queryset of already inserted movements into their buckets with one upsert"""
+    totals, params = _grouped_totals(movements).query.sql_with_params()
+    with connection.cursor() as cursor:
+        # "WHERE true" keeps SQLite from reading ON CONFLICT as a join constraint
+        cursor.execute(UPSERT_SQL.format(bucket=MovementDailyBucket._meta.db_table, totals=totals), params)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_buckets(start, end, organization_id=None):
+    """Recompute the buckets of days ``start`` to ``end`` (exclusive) from the ledger"""
+    buckets = MovementDailyBucket.objects.filter(day__gte=start, day__lt=end)
+    if organization_id:
+        buckets = buckets.filter(organization_id=organization_id)
+
+    # A day can straddle the archive cutoff, so both tiers add into one total
+    totals = defaultdict(lambda: [0, 0])
+    for model in (InventoryMovement, ArchivedMovement):
+        movements = model.objects.filter(
+            created_at__gte=_day_start(start),
+            created_at__lt=_day_start(end),
+        )
+        if organization_id:
+            movements = movements.filter(inventory__store__organization_id=organization_id)
+
+        for row in _grouped_totals(movements):
+            key = (row["organization_id"], row["store_id"], row["item_id"], row["movement_type"], row["bucket_day"])
+            totals[key][0] += row["quantity"]
+            totals[key][1] += row["movement_count"]
+
+    with transaction.atomic():
+        buckets.delete()
+        created = MovementDailyBucket.objects.bulk_create(
+            [
+                MovementDailyBucket(
+                    organization_id=bucket_organization, store_id=store, item_id=item,
+                    movement_type=movement_type, day=day,
+                    quantity_total=quantity, movement_count=count,
+                )
+                for (bucket_organization, store, item, movement_type, day), (quantity, count) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def day_windows(start, end, days):
+    """Split [start, end) into windows of at most ``days`` days"""
+    while start < end:
+        stop = min(start + timedelta(days=days), end)
+        yield start, stop
+        start = stop
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics.buckets import day_windows, rebuild_buckets
+from inventory.models import ArchivedMovement, InventoryMovement
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily movement buckets from the movement ledger, a window of days at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First day to rebuild (default: first movement)")
+        parser.add_argument("--until", help="Day to stop before (default: today)")
+        parser.add_argument("--organization", help="Only rebuild this organization id")
+        parser.add_argument("--days-per-chunk", type=int, default=7)
+
+    def handle(self, *args, **options):
+        until = self._date(options["until"]) or timezone.localdate()
+        start = self._date(options["start"])
+        if start is None:
+            # The archive holds the oldest movements
+            first = (
+                ArchivedMovement.objects.aggregate(first=Min("created_at"))["first"]
+                or InventoryMovement.objects.aggregate(first=Min("created_at"))["first"]
+            )
+            if first is None:
+                self.stdout.write("No movements to bucket.")
+                return
+            start = timezone.localdate(first)
+
+        total = 0
+        for window_start, window_end in day_windows(start, until, options["days_per_chunk"]):
+            created = rebuild_buckets(window_start, window_end, options["organization"])
+            total += created
+            self.stdout.write(f"{window_start} .. {window_end - timedelta(days=1)}: {created} buckets")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} buckets."))
+
+    def _date(self, value):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date: {value}")
+        return day
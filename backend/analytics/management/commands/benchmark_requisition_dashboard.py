@@ -0,0 +1,118 @@
+import random
+from contextlib import contextmanager
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.models import RequisitionWeeklyRollup
+from analytics.rollups import rebuild_rollups, summarize
+from inventory.models import Inventory
+from org.models import Department
+from services.models import AuditLog, Requisition
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def backdated(model, field_name):
+    """Let synthetic rows keep their own auto_now_add timestamps"""
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert synthetic requisitions with their audit trail, then compare the rollup dashboard "
+        "with computing the same figures live. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requisitions", type=int, default=100_000)
+        parser.add_argument("--weeks", type=int, default=52)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        departments = list(Department.objects.values_list("pk", "organization_id"))
+        inventories = list(Inventory.objects.values_list("pk", flat=True)[:100])
+        if not departments or not inventories:
+            raise CommandError("Needs at least one department and one inventory row to attach requisitions to.")
+
+        try:
+            with transaction.atomic():
+                self._seed(departments, inventories, options)
+                self._measure()
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f"{label}: {time.perf_counter() - started:.3f}s")
+        return result
+
+    def _seed(self, departments, inventories, options):
+        now = timezone.now()
+        span = options["weeks"] * 7 * 86400
+        rng = random.Random(0)
+
+        def batches():
+            requisitions, logs = [], []
+            for _ in range(options["requisitions"]):
+                department_id, organization_id = rng.choice(departments)
+                created_at = now - timedelta(seconds=rng.uniform(0, span))
+                requisition = Requisition(
+                    id=uuid.uuid4(), organization_id=organization_id, department_id=department_id,
+                    item_id=rng.choice(inventories), quantity=rng.randint(1, 50), status="completed",
+                )
+                requisitions.append((requisition, created_at))
+                at = created_at
+                for action in ("requested", "approved", "delivered", "completed"):
+                    at += timedelta(seconds=rng.expovariate(1 / 14400)) if action != "requested" else timedelta()
+                    logs.append((AuditLog(object_type="Requisition", object_id=str(requisition.id), action=action, description=action), at))
+                if len(requisitions) >= options["batch_size"]:
+                    yield requisitions, logs
+                    requisitions, logs = [], []
+            yield requisitions, logs
+
+        def seed():
+            for requisitions, logs in batches():
+                for requisition, created_at in requisitions:
+                    requisition.created_at = created_at
+                for log, at in logs:
+                    log.timestamp = at
+                Requisition.objects.bulk_create([requisition for requisition, _ in requisitions])
+                AuditLog.objects.bulk_create([log for log, _ in logs])
+
+        with backdated(Requisition, "created_at"), backdated(AuditLog, "timestamp"):
+            self._timed(f"seed {options['requisitions']} requisitions", seed)
+        self._timed("rebuild rollups from audit log", rebuild_rollups)
+
+    def _measure(self):
+        def from_rollups():
+            return summarize(RequisitionWeeklyRollup.objects.all())
+
+        def live():
+            created = dict(Requisition.objects.values_list("id", "created_at").iterator(chunk_size=10000))
+            latencies = sorted(
+                (at - created[uuid.UUID(object_id)]).total_seconds()
+                for object_id, at in AuditLog.objects.filter(object_type="Requisition", action="approved")
+                .values_list("object_id", "timestamp").iterator(chunk_size=10000)
+            )
+            return latencies[int(len(latencies) * 0.9)] / 3600 if latencies else None
+
+        summary = self._timed("dashboard from rollups", from_rollups)
+        exact = self._timed("live p90 time-to-approve over raw rows", live)
+        self.stdout.write(
+            f"p90 time to approve: rollup {summary['time_to_approve_hours']['p90']}h, exact {exact and round(exact, 2)}h"
+        )
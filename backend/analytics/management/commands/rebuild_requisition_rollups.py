@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute weekly requisition rollups from the requisition audit history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} weekly rollups."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('inventory', '0007_stocksnapshot'),
+        ('org', '0003_alter_department_options_alter_organization_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementDailyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+                ('quantity_total', models.PositiveBigIntegerField(default=0)),
+                ('movement_count', models.PositiveIntegerField(default=0)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movement_buckets', to='inventory.item')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movement_buckets', to='org.organization')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movement_buckets', to='inventory.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'movement_type', 'day'], name='analytics_m_organiz_1265e7_idx'), models.Index(fields=['store', 'movement_type', 'day'], name='analytics_m_store_i_e46811_idx')],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'store', 'item', 'movement_type', 'day'), name='unique_movement_daily_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('org', '0003_alter_department_options_alter_organization_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequisitionWeeklyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('requested_count', models.PositiveIntegerField(default=0)),
+                ('approved_count', models.PositiveIntegerField(default=0)),
+                ('rejected_count', models.PositiveIntegerField(default=0)),
+                ('delivered_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('quantity_requested', models.PositiveBigIntegerField(default=0)),
+                ('quantity_delivered', models.PositiveBigIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('approve_latency', models.JSONField(default=list)),
+                ('deliver_latency', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requisition_rollups', to='org.department')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requisition_rollups', to='org.organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'week'], name='analytics_r_organiz_ef2a28_idx')],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'department', 'week'), name='unique_requisition_weekly_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.db import models
+from org.models import Organization, Department
+from inventory.models import Item, Store
+
+
+# ----------------------------
+# Daily Movement Buckets
+# ----------------------------
+class MovementDailyBucket(models.Model):
+    """Per-day totals of InventoryMovement, maintained as movements are inserted"""
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name="movement_buckets"
+    )
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name="movement_buckets"
+    )
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="movement_buckets"
+    )
+    movement_type = models.CharField(max_length=20)
+    day = models.DateField()
+
+    quantity_total = models.PositiveBigIntegerField(default=0)
+    movement_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["organization", "store", "item", "movement_type", "day"],
+                name="unique_movement_daily_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["organization", "movement_type", "day"]),
+            models.Index(fields=["store", "movement_type", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.movement_type} {self.quantity_total} of {self.item_id} on {self.day}"
+
+
+# ----------------------------
+# Requisition Weekly Rollups
+# ----------------------------
+class RequisitionWeeklyRollup(models.Model):
+    """Requisition throughput per department and week (weeks start on Monday).
+
+    Latencies are kept as histograms over ``analytics.rollups.LATENCY_BOUNDS`` so
+    weeks and departments can be merged before percentiles are read.
+    """
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name="requisition_rollups"
+    )
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        related_name="requisition_rollups"
+    )
+    week = models.DateField()
+
+    requested_count = models.PositiveIntegerField(default=0)
+    approved_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+
+    quantity_requested = models.PositiveBigIntegerField(default=0)
+    quantity_delivered = models.PositiveBigIntegerField(default=0)
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    approve_latency = models.JSONField(default=list)  # request -> approval
+    deliver_latency = models.JSONField(default=list)  # request -> delivery
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["organization", "department", "week"],
+                name="unique_requisition_weekly_rollup",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["organization", "week"]),
+        ]
+
+    def __str__(self):
+        return f"{self.department_id} week of {self.week}"
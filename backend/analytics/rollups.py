@@ -0,0 +1,190 @@
+"""
+Requisition throughput rollups.
+
+Every requisition transition is written to AuditLog, so rollups are fed from
+there: ``record_transition`` folds one audit entry into its department/week
+row as it is created, and ``rebuild_rollups`` replays the audit history in
+chunks. Latencies are measured from the requisition's creation and counted
+into fixed histogram buckets; percentiles are read from merged histograms.
+"""
+import bisect
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from services.models import AuditLog, Requisition
+
+from .models import RequisitionWeeklyRollup
+
+# Upper bounds in seconds; the last histogram slot counts everything above them
+LATENCY_BOUNDS = [
+    60, 5 * 60, 15 * 60, 30 * 60,
+    3600, 2 * 3600, 4 * 3600, 8 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 5 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+]
+
+TRANSITIONS = ("requested", "approved", "rejected", "delivered", "completed")
+PERCENTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def empty_histogram():
+    return [0] * (len(LATENCY_BOUNDS) + 1)
+
+
+def merge_histograms(histograms):
+    merged = empty_histogram()
+    for histogram in histograms:
+        for slot, count in enumerate(histogram or ()):
+            merged[slot] += count
+    return merged
+
+
+def percentile(histogram, fraction):
+    """Latency in seconds below which ``fraction`` of the samples fall, interpolated within a bucket"""
+    total = sum(histogram)
+    if not total:
+        return None
+
+    target = fraction * total
+    seen = 0
+    for slot, count in enumerate(histogram):
+        if count and seen + count >= target:
+            lower = LATENCY_BOUNDS[slot - 1] if slot else 0
+            if slot == len(LATENCY_BOUNDS):
+                return lower
+            return lower + (LATENCY_BOUNDS[slot] - lower) * (target - seen) / count
+        seen += count
+    return LATENCY_BOUNDS[-1]
+
+
+def week_of(moment):
+    day = timezone.localdate(moment)
+    return day - timedelta(days=day.weekday())
+
+
+def _requisitions(ids):
+    return {
+        row["id"]: row
+        for row in Requisition.objects.filter(pk__in=ids).values(
+            "id", "organization_id", "department_id", "created_at", "quantity",
+            price=F("item__item__price_index__cheapest__price"),
+        )
+    }
+
+
+def _requisition_id(object_id):
+    try:
+        return uuid.UUID(object_id)
+    except ValueError:
+        return None
+
+
+def _fold(rollup, action, at, requisition):
+    """Add one transition to an in-memory rollup"""
+    latency = max((at - requisition["created_at"]).total_seconds(), 0)
+    slot = bisect.bisect_left(LATENCY_BOUNDS, latency)
+
+    if action == "requested":
+        rollup.requested_count += 1
+        rollup.quantity_requested += requisition["quantity"]
+    elif action == "approved":
+        rollup.approved_count += 1
+        rollup.approve_latency = rollup.approve_latency or empty_histogram()
+        rollup.approve_latency[slot] += 1
+    elif action == "rejected":
+        rollup.rejected_count += 1
+    elif action == "delivered":
+        rollup.delivered_count += 1
+        rollup.quantity_delivered += requisition["quantity"]
+        if requisition["price"] is not None:
+            rollup.spend = Decimal(rollup.spend) + requisition["price"] * requisition["quantity"]
+        rollup.deliver_latency = rollup.deliver_latency or empty_histogram()
+        rollup.deliver_latency[slot] += 1
+    elif action == "completed":
+        rollup.completed_count += 1
+
+
+def record_transition(audit_log):
+    """Fold a newly written requisition audit entry into its weekly rollup"""
+    if audit_log.object_type != "Requisition" or audit_log.action not in TRANSITIONS:
+        return
+
+    requisition_id = _requisition_id(audit_log.object_id)
+    requisition = _requisitions([requisition_id]).get(requisition_id) if requisition_id else None
+    if requisition is None:
+        return
+
+    with transaction.atomic():
+        rollup, _ = RequisitionWeeklyRollup.objects.select_for_update().get_or_create(
+            organization_id=requisition["organization_id"],
+            department_id=requisition["department_id"],
+            week=week_of(audit_log.timestamp),
+        )
+        _fold(rollup, audit_log.action, audit_log.timestamp, requisition)
+        rollup.save()
+
+
+def rebuild_rollups(chunk_size=5000):
+    """Recompute every rollup from the audit history; returns the number of rows written"""
+    logs = AuditLog.objects.filter(
+        object_type="Requisition", action__in=TRANSITIONS
+    ).order_by("pk").values_list("object_id", "action", "timestamp")
+
+    rollups = {}
+    chunk = []
+
+    def flush():
+        requisitions = _requisitions({_requisition_id(object_id) for object_id, _, _ in chunk} - {None})
+        for object_id, action, at in chunk:
+            requisition = requisitions.get(_requisition_id(object_id))
+            if requisition is None:
+                continue
+            key = (requisition["organization_id"], requisition["department_id"], week_of(at))
+            if key not in rollups:
+                rollups[key] = RequisitionWeeklyRollup(
+                    organization_id=key[0], department_id=key[1], week=key[2],
+                    approve_latency=empty_histogram(), deliver_latency=empty_histogram(),
+                )
+            _fold(rollups[key], action, at, requisition)
+        chunk.clear()
+
+    for row in logs.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    with transaction.atomic():
+        RequisitionWeeklyRollup.objects.all().delete()
+        RequisitionWeeklyRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+    return len(rollups)
+
+
+def _latency_hours(histogram):
+    return {
+        name: round(seconds / 3600, 2) if seconds is not None else None
+        for name, seconds in ((name, percentile(histogram, fraction)) for name, fraction in PERCENTILES.items())
+    }
+
+
+def summarize(rollups):
+    """Totals and latency percentiles (hours) over any set of rollups"""
+    rollups = list(rollups)
+    approve = merge_histograms(rollup.approve_latency for rollup in rollups)
+    deliver = merge_histograms(rollup.deliver_latency for rollup in rollups)
+    return {
+        "requested": sum(rollup.requested_count for rollup in rollups),
+        "approved": sum(rollup.approved_count for rollup in rollups),
+        "rejected": sum(rollup.rejected_count for rollup in rollups),
+        "delivered": sum(rollup.delivered_count for rollup in rollups),
+        "completed": sum(rollup.completed_count for rollup in rollups),
+        "quantity_requested": sum(rollup.quantity_requested for rollup in rollups),
+        "quantity_delivered": sum(rollup.quantity_delivered for rollup in rollups),
+        "spend": str(sum((rollup.spend for rollup in rollups), Decimal("0"))),
+        "time_to_approve_hours": _latency_hours(approve),
+        "time_to_deliver_hours": _latency_hours(deliver),
+    }
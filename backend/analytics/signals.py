@@ -0,0 +1,30 @@
+# analytics/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from inventory.models import InventoryMovement
+from inventory.stock import movements_inserted, movements_posted
+from services.models import AuditLog
+from .buckets import record_inserted, record_movements
+from .rollups import record_transition
+
+
+@receiver(post_save, sender=InventoryMovement)
+def bucket_saved_movement(sender, instance, created, **kwargs):
+    if created:
+        record_movements([instance])
+
+
+@receiver(movements_posted)
+def bucket_posted_movements(sender, movements, **kwargs):
+    record_movements(movements)
+
+
+@receiver(movements_inserted)
+def bucket_inserted_movements(sender, movements, **kwargs):
+    record_inserted(movements)
+
+
+@receiver(post_save, sender=AuditLog)
+def roll_up_requisition_transition(sender, instance, created, **kwargs):
+    if created:
+        record_transition(instance)
@@ -0,0 +1,76 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from inventory.models import Inventory, InventoryMovement, Item, Store
+from org.models import Department, Organization
+from services.models import AuditLog, Requisition
+from users.models import CustomUser
+
+
+class AnalyticsTestData(TestCase):
+    """One stocked store with a few stock-outs folded into the daily buckets"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name="North Trust")
+        cls.department = Department.objects.create(name="Ward 1", organization=cls.organization)
+        cls.admin = CustomUser.objects.create_user(
+            "admin@example.com", "Admin", "pw", role="admin", is_superuser=True
+        )
+        cls.store = Store.objects.create(name="Main", organization=cls.organization, department=cls.department)
+        cls.item = Item.objects.create(name="Glove", sku="GLV-001", organization=cls.organization)
+        inventory = Inventory.objects.create(item=cls.item, store=cls.store, quantity_available=50)
+        for quantity in (3, 4):
+            InventoryMovement.objects.create(
+                inventory=inventory, movement_type="stock_out", quantity=quantity, performed_by=cls.admin
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class ConsumptionParameterTests(AnalyticsTestData):
+    url = "/api/analytics/consumption/trend/"
+
+    def test_malformed_ids_are_rejected_with_400(self):
+        for param in ("organization", "store", "department", "item"):
+            with self.subTest(param=param):
+                response = self.client.get(self.url, {param: "not-a-uuid"})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": f"{param} must be a UUID"})
+
+    def test_valid_ids_filter_the_buckets(self):
+        response = self.client.get(self.url, {"organization": str(self.organization.pk), "item": str(self.item.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(row["quantity"] for row in response.json()["results"]), 7)
+
+        response = self.client.get(self.url, {"store": "00000000-0000-0000-0000-000000000000"})
+        self.assertEqual(response.json()["results"], [])
+
+
+class RequisitionDashboardParameterTests(AnalyticsTestData):
+    url = "/api/analytics/requisitions/dashboard/"
+
+    def test_malformed_ids_are_rejected_with_400(self):
+        for param in ("organization", "department"):
+            with self.subTest(param=param):
+                response = self.client.get(self.url, {param: "42"})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": f"{param} must be a UUID"})
+
+    def test_valid_ids_filter_the_rollups(self):
+        requisition = Requisition.objects.create(
+            organization=self.organization, department=self.department, item=self.store.inventories.get(),
+            quantity=2, requested_by=self.admin,
+        )
+        AuditLog.objects.create(
+            object_type="Requisition", object_id=str(requisition.pk), action="requested", performed_by=self.admin,
+        )
+
+        response = self.client.get(self.url, {"department": str(self.department.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["department_name"] for row in response.json()["departments"]], ["Ward 1"])
+
+        response = self.client.get(self.url, {"organization": "00000000-0000-0000-0000-000000000000"})
+        self.assertEqual(response.json()["departments"], [])
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ConsumptionAnalyticsViewSet, RequisitionAnalyticsViewSet
+
+router = DefaultRouter()
+router.register(r"consumption", ConsumptionAnalyticsViewSet, basename="consumption")
+router.register(r"requisitions", RequisitionAnalyticsViewSet, basename="requisition-analytics")
+
+urlpatterns = [
+    path("", include(router.urls)),
+]
@@ -0,0 +1,201 @@
+import uuid
+from datetime import timedelta
+
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import MovementDailyBucket, RequisitionWeeklyRollup
+from .rollups import summarize
+
+INTERVALS = {
+    "day": None,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+DEFAULT_PERIOD_DAYS = 365
+MAX_TOP_ITEMS = 100
+DEFAULT_DASHBOARD_WEEKS = 12
+
+
+class AnalyticsError(Exception):
+    pass
+
+
+def _date_param(request, name, default):
+    try:
+        value = parse_date(request.query_params.get(name, ""))
+    except ValueError:
+        value = None
+    if value is None and name in request.query_params:
+        raise AnalyticsError(f"{name} must be YYYY-MM-DD")
+    return value or default
+
+
+def _uuid_param(request, name):
+    """The ``name`` query parameter as a UUID, None when absent"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise AnalyticsError(f"{name} must be a UUID")
+
+
+class ConsumptionAnalyticsViewSet(viewsets.ViewSet):
+    """Consumption and spend figures read from the daily movement buckets.
+
+    Every endpoint accepts ``start``/``end`` (inclusive dates, default the last
+    year), ``store``, ``department``, ``item`` and ``movement_type`` (default
+    ``stock_out``). Admins may pass ``organization``; other users see their own.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_buckets(self, request):
+        user = request.user
+        params = request.query_params
+
+        buckets = MovementDailyBucket.objects.all()
+        if user.is_superuser or user.role == 'admin':
+            organization_id = _uuid_param(request, 'organization')
+            if organization_id:
+                buckets = buckets.filter(organization_id=organization_id)
+        elif user.organization_id:
+            buckets = buckets.filter(organization_id=user.organization_id)
+        else:
+            return MovementDailyBucket.objects.none()
+
+        end = _date_param(request, 'end', timezone.localdate())
+        start = _date_param(request, 'start', end - timedelta(days=DEFAULT_PERIOD_DAYS - 1))
+        buckets = buckets.filter(
+            day__gte=start,
+            day__lte=end,
+            movement_type=params.get('movement_type', 'stock_out'),
+        )
+
+        for param, field in (('store', 'store_id'), ('department', 'store__department_id'), ('item', 'item_id')):
+            value = _uuid_param(request, param)
+            if value:
+                buckets = buckets.filter(**{field: value})
+
+        return buckets.order_by()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, AnalyticsError):
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().handle_exception(exc)
+
+    @action(detail=False, methods=['get'])
+    def trend(self, request):
+        """Quantity per day, week or month (?interval=)"""
+        interval = request.query_params.get('interval', 'day')
+        if interval not in INTERVALS:
+            return Response({"error": f"interval must be one of {', '.join(INTERVALS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        truncate = INTERVALS[interval]
+        period = truncate('day') if truncate else F('day')
+        rows = (
+            self.get_buckets(request)
+            .annotate(period=period)
+            .values('period')
+            .annotate(quantity=Sum('quantity_total'), movements=Sum('movement_count'))
+            .order_by('period')
+        )
+        return Response({"interval": interval, "results": list(rows)})
+
+    @action(detail=False, methods=['get'])
+    def top_items(self, request):
+        """Items with the highest total quantity (?limit=, default 10)"""
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), MAX_TOP_ITEMS)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = (
+            self.get_buckets(request)
+            .values('item_id', item_name=F('item__name'), item_sku=F('item__sku'))
+            .annotate(quantity=Sum('quantity_total'), movements=Sum('movement_count'))
+            .order_by('-quantity')[:max(limit, 1)]
+        )
+        return Response({"results": list(rows)})
+
+    @action(detail=False, methods=['get'])
+    def department_spend(self, request):
+        """Quantity and spend per department, priced at each item's cheapest active vendor offer"""
+        rows = (
+            self.get_buckets(request)
+            .values(department_id=F('store__department_id'), department_name=F('store__department__name'))
+            .annotate(
+                quantity=Sum('quantity_total'),
+                spend=Sum(
+                    F('quantity_total') * F('item__price_index__cheapest__price'),
+                    output_field=DecimalField(max_digits=18, decimal_places=2),
+                ),
+            )
+            .order_by('-spend')
+        )
+        return Response({"results": list(rows)})
+
+
+class RequisitionAnalyticsViewSet(viewsets.ViewSet):
+    """Requisition throughput read from the weekly department rollups"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def handle_exception(self, exc):
+        if isinstance(exc, AnalyticsError):
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().handle_exception(exc)
+
+    def get_rollups(self, request):
+        user = request.user
+
+        rollups = RequisitionWeeklyRollup.objects.select_related('department')
+        if user.is_superuser or user.role == 'admin':
+            organization_id = _uuid_param(request, 'organization')
+            if organization_id:
+                rollups = rollups.filter(organization_id=organization_id)
+        elif user.role == 'operations' and user.organization_id:
+            rollups = rollups.filter(organization_id=user.organization_id)
+        elif user.department_id:
+            rollups = rollups.filter(department_id=user.department_id)
+        else:
+            return RequisitionWeeklyRollup.objects.none()
+
+        end = _date_param(request, 'end', timezone.localdate())
+        start = _date_param(request, 'start', end - timedelta(weeks=DEFAULT_DASHBOARD_WEEKS))
+        rollups = rollups.filter(week__gt=start - timedelta(days=7), week__lte=end)
+
+        department_id = _uuid_param(request, 'department')
+        if department_id:
+            rollups = rollups.filter(department_id=department_id)
+
+        return rollups.order_by('department__name', 'week')
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """Counts, quantities, spend and latency percentiles per department and week, plus per-department totals"""
+        rollups = list(self.get_rollups(request))
+
+        weeks = []
+        departments = {}
+        for rollup in rollups:
+            weeks.append({
+                "department": rollup.department_id,
+                "department_name": rollup.department.name,
+                "week": rollup.week,
+                **summarize([rollup]),
+            })
+            departments.setdefault(rollup.department, []).append(rollup)
+
+        return Response({
+            "weeks": weeks,
+            "departments": [
+                {"department": department.pk, "department_name": department.name, **summarize(group)}
+                for department, group in departments.items()
+            ],
+        })
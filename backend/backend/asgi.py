@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+# Requests run on short-lived threads here, so a connection kept per thread
+# would never be reused; use DB_POOL for reuse under ASGI (backend/database.py)
+os.environ.setdefault("DB_CONN_MAX_AGE", "0")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup: the event stream uses models and settings
+from core.streams import with_event_stream  # noqa: E402
+
+application = with_event_stream(django_application)
@@ -0,0 +1,128 @@
+"""
+DATABASES configuration, tunable per deployment through the environment.
+
+    DATABASE_URL            connection URL; SQLite in BASE_DIR when unset
+    DB_CONN_MAX_AGE         seconds to keep a connection open between requests
+                            (default 60, 0 = close after every request,
+                            "none" = keep forever)
+    DB_CONN_HEALTH_CHECKS   ping a reused connection before its request uses
+                            it, so a dropped connection is replaced instead of
+                            failing the request (default True)
+    DB_POOL                 use Django's native connection pool (PostgreSQL
+                            only; default False). The pool needs psycopg 3
+                            and psycopg_pool, which requirements.txt does not
+                            install: add "psycopg[pool]" to enable it
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+                            pool bounds and seconds to wait for a free
+                            connection (defaults 2, 10, 30)
+    SQLITE_TUNING           SQLite only: WAL journal, synchronous=NORMAL,
+                            memory-mapped reads, a larger page cache and
+                            BEGIN IMMEDIATE write transactions (default False;
+                            WAL leaves -wal and -shm files beside the database
+                            and keeps it in WAL mode after it is turned off)
+    SQLITE_BUSY_TIMEOUT     seconds a writer waits for the write lock before
+                            "database is locked" (default 20)
+    SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE
+                            bytes to memory-map and KiB of page cache per
+                            connection (defaults 256 MiB and 64 MiB)
+    DATABASE_REPLICA_URLS   comma-separated read replicas, added as
+                            "replica_1", "replica_2", ... and used by
+                            core.routers.ReplicaRouter
+
+Persistent connections are kept per thread, which suits WSGI workers. Under
+ASGI every request runs on a fresh thread, so prefer DB_POOL there. The pool
+and persistent connections are mutually exclusive; with DB_POOL enabled
+DB_CONN_MAX_AGE is ignored.
+"""
+import os
+
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+POSTGRESQL_ENGINE = "django.db.backends.postgresql"
+SQLITE_ENGINE = "django.db.backends.sqlite3"
+
+
+def _flag(name, default):
+    return os.getenv(name, str(default)).lower() in ("true", "1", "yes")
+
+
+def _conn_max_age():
+    value = os.getenv("DB_CONN_MAX_AGE", "60")
+    return None if value.lower() == "none" else int(value)
+
+
+def _pool_options():
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured(
+            'DB_POOL needs psycopg 3 and psycopg_pool (pip install "psycopg[pool]"); '
+            "psycopg2, which requirements.txt installs, has no connection pool."
+        )
+    return {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    }
+
+
+def sqlite_options():
+    """
+    OPTIONS for a SQLite database serving concurrent requests.
+
+    WAL lets readers carry on while one writer commits, and with it
+    synchronous=NORMAL only syncs at checkpoints (a power cut can lose the
+    last commits but never corrupts the file). BEGIN IMMEDIATE takes the write
+    lock when a transaction starts: a read-then-write transaction opened with
+    the default DEFERRED has to upgrade its lock mid-way, and SQLite fails
+    that upgrade immediately when another writer is active instead of
+    waiting out the busy timeout.
+    """
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE', str(64 * 1024)))}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    return {
+        "init_command": ";".join(pragmas),
+        "transaction_mode": "IMMEDIATE",
+        "timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", "20")),
+    }
+
+
+def _connection_config(url):
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=_conn_max_age(),
+        conn_health_checks=_flag("DB_CONN_HEALTH_CHECKS", True),
+    )
+
+    if _flag("DB_POOL", False):
+        if config["ENGINE"] != POSTGRESQL_ENGINE:
+            raise ImproperlyConfigured("DB_POOL is only supported with PostgreSQL.")
+        config["CONN_MAX_AGE"] = 0
+        config.setdefault("OPTIONS", {})["pool"] = _pool_options()
+    if config["ENGINE"] == SQLITE_ENGINE and _flag("SQLITE_TUNING", False):
+        config["OPTIONS"] = {**sqlite_options(), **config.get("OPTIONS", {})}
+    return config
+
+
+def database_config(base_dir):
+    """The "default" database, with connection reuse applied"""
+    return _connection_config(os.getenv("DATABASE_URL") or f"sqlite:///{base_dir / 'db.sqlite3'}")
+
+
+def replica_configs():
+    """{"replica_<n>": config} for every URL in DATABASE_REPLICA_URLS"""
+    urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    replicas = {}
+    for number, url in enumerate(urls, start=1):
+        config = _connection_config(url)
+        # Tests run against the primary only
+        config["TEST"] = {**config.get("TEST", {}), "MIRROR": "default"}
+        replicas[f"replica_{number}"] = config
+    return replicas
@@ -11,11 +11,14 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
-import dj_database_url
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
+from .database import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -36,8 +39,9 @@ ALLOWED_HOSTS = ["localhost", "127.0.0.1"]  # always allow dev
 if ALLOWED_HOSTS_ENV:
     ALLOWED_HOSTS += [host.strip() for host in ALLOWED_HOSTS_ENV.split(",")]
 
-print("DEBUG:", DEBUG)
-print("ALLOWED_HOSTS:", ALLOWED_HOSTS)
+# OpenAPI schema and Swagger/ReDoc pages; drf_spectacular is only imported
+# when they are enabled
+API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", str(DEBUG)) == "True"
 
 
 # Application definition
@@ -54,24 +58,29 @@ INSTALLED_APPS = [
     "rest_framework",
     "corsheaders",
     "django_rest_passwordreset",
-    'drf_spectacular',
-    'drf_spectacular_sidecar',
     'django_filters',
 
     # Local Apps
+    "core",
     "inventory",
     "services",
+    "analytics",
     "org",
     "users",
 ]
 
+if API_DOCS_ENABLED:
+    INSTALLED_APPS += ['drf_spectacular', 'drf_spectacular_sidecar']
+
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -99,20 +108,97 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASE_URL=os.getenv("DATABASE_URL")
-if(DATABASE_URL):
-    DATABASES = {
-        "default": dj_database_url.config(
-            default=os.getenv("DATABASE_URL")
-        )
-    }
-else:
-    DATABASES = {
-        "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3",
-        }
-    }
+# Connection reuse, pooling and read replicas are configured through the
+# environment, see backend/database.py.
+
+DATABASES = {
+    "default": database_config(BASE_DIR),
+    **replica_configs(),
+}
+
+# Safe-method requests read from the replicas (when any are configured); a
+# client that has just written reads from the primary for this many seconds.
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+# Cache holding that flag; it must be shared by every worker (see core.checks)
+REPLICA_STICKY_CACHE = os.getenv("REPLICA_STICKY_CACHE", "default")
+
+
+# =========================
+# CACHES
+# =========================
+# "default" is the shared tier (pick a backend per deployment); "local" is a
+# small per-process tier that core.cache keeps in front of it.
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION",
+            str(BASE_DIR / ".cache") if CACHE_BACKEND == "file" else "nhs-health-shared",
+        ),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "300")),
+        "KEY_PREFIX": "nhs",
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "nhs-health-local",
+        "TIMEOUT": int(os.getenv("LOCAL_CACHE_TIMEOUT", "30")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "2000"))},
+    },
+}
+
+# How long a process trusts the namespace versions it has read before asking
+# the shared tier again, i.e. how late it may see another worker's invalidation
+CACHE_VERSION_LOCAL_SECONDS = int(os.getenv("CACHE_VERSION_LOCAL_SECONDS", "2"))
+
+
+# =========================
+# LIVE EVENTS
+# =========================
+# Change events streamed to dashboards from /api/core/events/, which only
+# backend.asgi serves (e.g. `uvicorn backend.asgi:application`). "local" reaches
+# clients of the same worker process; "relay" shares events between workers
+# through `manage.py run_event_relay`.
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "local")
+EVENTS_RELAY_ADDRESS = os.getenv("EVENTS_RELAY_ADDRESS", "127.0.0.1:8765")
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "25"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+# Lifetime of the single-use tickets browsers open the stream with
+EVENTS_TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", "30"))
+
+
+# =========================
+# MOVEMENT ARCHIVE
+# =========================
+# `manage.py archive_movements` moves movements older than the retention
+# window out of the hot ledger table (inventory.archive), a chunk per
+# transaction. History endpoints and stock replays read both tiers.
+
+MOVEMENT_RETENTION_DAYS = int(os.getenv("MOVEMENT_RETENTION_DAYS", "365"))
+MOVEMENT_ARCHIVE_CHUNK_SIZE = int(os.getenv("MOVEMENT_ARCHIVE_CHUNK_SIZE", "1000"))
+
+
+# =========================
+# IDEMPOTENCY KEYS
+# =========================
+# Movement and requisition writes sent with an Idempotency-Key header store
+# their response for this long (core.idempotency); expired keys are removed
+# by `manage.py purge_idempotency_keys`. A key whose request has run for
+# longer than the lease without a response (its worker died) may be claimed
+# again by a retry; keep the lease above the longest request timeout.
+
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "120"))
 
 
 # Password validation
@@ -161,14 +247,17 @@ MEDIA_ROOT = BASE_DIR / "media"
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.JWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
-    # Schema/OpenAPI
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    
+    # orjson-backed, falls back to DRF's JSONRenderer when orjson is missing
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
     # Pagination
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -178,12 +267,32 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+
+    # Stale writes to versioned models become 409 Conflict
+    'EXCEPTION_HANDLER': 'core.concurrency.exception_handler',
 }
 
+if API_DOCS_ENABLED:
+    REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'
+
+# =========================
+# RESPONSE COMPRESSION
+# =========================
+# core.middleware.CompressionMiddleware: Brotli (when the brotli package is
+# installed and enabled) or gzip, per the request's Accept-Encoding.
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_BROTLI = os.getenv("COMPRESSION_BROTLI", "True") == "True"
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
 # =========================
 # DRF SPECTACULR SETTINGS
 # =========================
 
+# /api/schema/ serves a file built once per code version (core.schema,
+# `manage.py build_schema`)
+API_SCHEMA_DIR = os.getenv("API_SCHEMA_DIR", str(BASE_DIR / ".schema"))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'NHS Health API',
     'DESCRIPTION': 'API documentation for NHS Health System',
@@ -210,6 +319,8 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+CORS_EXPOSE_HEADERS = ["Idempotent-Replayed"]
 
 # =========================
 # EMAIL CONFIG
@@ -15,17 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-# Import DRF components
-from rest_framework import permissions
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
-
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -38,13 +31,23 @@ urlpatterns = [
     path("api/store/", include("inventory.urls")),
 
     path("api/service/", include("services.urls")),
-    
-    # OpenAPI/Swagger Schema
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    
-    # Swagger UI Documentation
-    path('api/docs/', SpectacularSwaggerView.as_view(), name='swagger-ui'),
-    
-    # ReDoc Documentation (alternative to Swagger)
-    path('api/docs/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+
+    path("api/analytics/", include("analytics.urls")),
+
+    path("api/core/", include("core.urls")),
 ]
+
+if settings.API_DOCS_ENABLED:
+    from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
+    from core.schema import schema_view, versioned_page
+
+    urlpatterns += [
+        # OpenAPI schema, prebuilt once per code version
+        path('api/schema/', schema_view, name='schema'),
+
+        # Swagger UI Documentation
+        path('api/docs/', versioned_page(SpectacularSwaggerView).as_view(), name='swagger-ui'),
+
+        # ReDoc Documentation (alternative to Swagger)
+        path('api/docs/redoc/', versioned_page(SpectacularRedocView).as_view(url_name='schema'), name='redoc'),
+    ]
@@ -0,0 +1,108 @@
+"""
+Helpers for the async (ASGI-native) read endpoints.
+
+DRF views are synchronous, so the async dashboard endpoints are plain Django
+async views. ``api_view`` gives them what DRF would: JWT authentication with
+DRF's error bodies, a GET-only guard and JSON from the API's renderer, so
+their payloads match the synchronous viewsets they mirror. Everything they
+load must be fetched through the async ORM (``aget``, ``acount``,
+``async for``) with the relations the serializer reads already joined; a
+lazy relation lookup raises SynchronousOnlyOperation.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import remembered_token
+from .renderers import FastJSONRenderer
+
+NOT_AUTHENTICATED = "Authentication credentials were not provided."
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+async def authenticate(request):
+    """The active user behind the request's Bearer token, or None"""
+    authentication = JWTAuthentication()
+    token = remembered_token(request)
+    try:
+        if token is None:
+            raw_token = authentication.get_raw_token(authentication.get_header(request) or b"")
+            if raw_token is None:
+                return None
+            token = authentication.get_validated_token(raw_token)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return None
+
+    try:
+        user = await get_user_model().objects.select_related("organization", "department").aget(
+            **{api_settings.USER_ID_FIELD: user_id}
+        )
+    except get_user_model().DoesNotExist:
+        return None
+    return user if user.is_active else None
+
+
+def api_view(view):
+    """Authenticate an async GET view and render what it returns as JSON"""
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await authenticate(request)
+        if request.user is None:
+            return json_response({"detail": NOT_AUTHENTICATED}, status=401)
+        result = await view(request, *args, **kwargs)
+        if isinstance(result, HttpResponse):
+            return result
+        return json_response(result)
+
+    return wrapper
+
+
+async def fetch(queryset):
+    return [obj async for obj in queryset]
+
+
+async def paginate(request, queryset, serializer_class, prepare=None):
+    """
+    Same body as DRF's PageNumberPagination: count, next, previous, results.
+    ``prepare`` is awaited with the page's objects before they are serialized.
+    """
+    page_size = settings.REST_FRAMEWORK.get("PAGE_SIZE") or 20
+    count = await queryset.acount()
+    last_page = max((count + page_size - 1) // page_size, 1)
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 0
+    if not 1 <= page <= last_page:
+        return json_response({"detail": "Invalid page."}, status=404)
+
+    offset = (page - 1) * page_size
+    results = await fetch(queryset[offset:offset + page_size])
+    if prepare is not None:
+        await prepare(results)
+
+    url = request.build_absolute_uri()
+    if page == 1:
+        previous = None
+    elif page == 2:
+        previous = remove_query_param(url, "page")
+    else:
+        previous = replace_query_param(url, "page", page - 1)
+    return {
+        "count": count,
+        "next": replace_query_param(url, "page", page + 1) if page < last_page else None,
+        "previous": previous,
+        "results": serializer_class(results, many=True).data,
+    }
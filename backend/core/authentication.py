@@ -0,0 +1,31 @@
+"""
+JWT authentication that validates each request's token once.
+
+ReplicaRoutingMiddleware has to know who is asking before the view runs, so
+it validates the Bearer token itself and keeps the result on the request
+(``VALIDATED_TOKEN_ATTR``). The DRF authentication class below and the async
+views reuse that token instead of decoding and verifying the JWT again; a
+request the middleware did not see, or whose token it rejected, is validated
+(and its error reported) as usual.
+"""
+from rest_framework_simplejwt import authentication
+
+VALIDATED_TOKEN_ATTR = "validated_jwt"
+
+
+def remember_token(request, token):
+    setattr(request, VALIDATED_TOKEN_ATTR, token)
+
+
+def remembered_token(request):
+    return getattr(request, VALIDATED_TOKEN_ATTR, None)
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """simplejwt's JWTAuthentication, reusing a token the middleware already validated"""
+
+    def authenticate(self, request):
+        token = remembered_token(request._request)
+        if token is None:
+            return super().authenticate(request)
+        return self.get_user(token), token
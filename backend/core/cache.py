@@ -0,0 +1,200 @@
+"""
+Shared response cache with per-organization namespaces.
+
+Entries are written to the shared ``default`` cache and mirrored into the
+process-local ``local`` cache. Every key embeds the current version of its
+namespace, and that version lives only in the shared tier, so invalidating a
+namespace is a single increment and the stale entries simply age out.
+
+Each process also keeps the versions it has read in the local tier for
+``CACHE_VERSION_LOCAL_SECONDS``, so a local hit costs no round trip to the
+shared tier. The price is explicit: another process's invalidation can take
+that long to be seen here. Invalidations made by this process are seen
+immediately.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+SHARED_CACHE = "default"
+LOCAL_CACHE = "local"
+
+# Scope used by callers that can see more than one organization
+ALL_ORGANIZATIONS = "all"
+
+
+class CacheStats:
+    """Per-process hit/miss counters, grouped by namespace"""
+
+    OUTCOMES = ("local_hits", "shared_hits", "misses")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, namespace, outcome):
+        with self._lock:
+            counters = self._counters.setdefault(namespace, dict.fromkeys(self.OUTCOMES, 0))
+            counters[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            namespaces = {name: dict(counters) for name, counters in self._counters.items()}
+
+        totals = dict.fromkeys(self.OUTCOMES, 0)
+        for counters in namespaces.values():
+            for outcome in self.OUTCOMES:
+                totals[outcome] += counters[outcome]
+        lookups = sum(totals.values())
+        totals["hit_ratio"] = round((lookups - totals["misses"]) / lookups, 4) if lookups else 0.0
+
+        return {"namespaces": namespaces, "totals": totals}
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+
+
+stats = CacheStats()
+
+
+def _version_key(namespace, scope):
+    return f"nsver:{namespace}:{scope}"
+
+
+def get_version(namespace, scope):
+    """Return the current version of a namespace, initialising it if needed"""
+    key = _version_key(namespace, scope)
+    version = caches[LOCAL_CACHE].get(key)
+    if version is not None:
+        return version
+
+    shared = caches[SHARED_CACHE]
+    version = shared.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        shared.add(key, time.time_ns() // 1_000_000, timeout=None)
+        version = shared.get(key)
+    caches[LOCAL_CACHE].set(key, version, settings.CACHE_VERSION_LOCAL_SECONDS)
+    return version
+
+
+def bump_version(namespace, scope):
+    shared = caches[SHARED_CACHE]
+    key = _version_key(namespace, scope)
+    try:
+        shared.incr(key)
+    except ValueError:
+        shared.add(key, time.time_ns() // 1_000_000, timeout=None)
+    caches[LOCAL_CACHE].delete(key)
+
+
+def invalidate(namespaces, organization_id=None):
+    """
+    Invalidate namespaces for an organization once the current transaction commits.
+
+    The cross-organization scope is always bumped as well, since admin and
+    operations users read listings that span every organization.
+    """
+    if isinstance(namespaces, str):
+        namespaces = [namespaces]
+
+    scopes = [ALL_ORGANIZATIONS]
+    if organization_id is not None:
+        scopes.append(str(organization_id))
+
+    def bump():
+        for namespace in namespaces:
+            for scope in scopes:
+                bump_version(namespace, scope)
+
+    transaction.on_commit(bump)
+
+
+def make_key(namespace, scope, suffix):
+    return f"{namespace}:{scope}:v{get_version(namespace, scope)}:{suffix}"
+
+
+def lookup(namespace, key):
+    """Look a key up in the local tier, then the shared tier"""
+    value = caches[LOCAL_CACHE].get(key)
+    if value is not None:
+        stats.record(namespace, "local_hits")
+        return value
+
+    value = caches[SHARED_CACHE].get(key)
+    if value is not None:
+        stats.record(namespace, "shared_hits")
+        caches[LOCAL_CACHE].set(key, value)
+        return value
+
+    stats.record(namespace, "misses")
+    return None
+
+
+def store(key, value, timeout=None):
+    if timeout is None:
+        caches[SHARED_CACHE].set(key, value)
+    else:
+        caches[SHARED_CACHE].set(key, value, timeout)
+    caches[LOCAL_CACHE].set(key, value)
+
+
+def request_scope(request):
+    """Namespace scope for the requesting user"""
+    user = request.user
+    if user.is_superuser or user.role in ["admin", "operations"] or not user.organization_id:
+        return ALL_ORGANIZATIONS
+    return str(user.organization_id)
+
+
+def request_fingerprint(request):
+    """
+    Identify everything that can change a response for the same URL.
+
+    Querysets are filtered by organization and role, so both are part of the
+    key even when the scope is shared.
+    """
+    user = request.user
+    raw = "|".join([
+        str(user.organization_id),
+        user.role,
+        str(user.is_superuser),
+        request.get_full_path(),
+    ])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def cache_response(namespace, timeout=None):
+    """
+    Cache the serialized data of a viewset list/retrieve action.
+
+    Only successful responses are stored; the version embedded in the key takes
+    care of invalidation, so ``timeout`` is just an upper bound on staleness for
+    writes that bypass model signals.
+    """
+    # Imported here so the model signals that import this module do not pull
+    # DRF into every django.setup()
+    from rest_framework.response import Response
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            key = make_key(namespace, request_scope(request), request_fingerprint(request))
+            data = lookup(namespace, key)
+            if data is not None:
+                return Response(data)
+
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                store(key, response.data, timeout)
+            return response
+
+        return wrapper
+
+    return decorator
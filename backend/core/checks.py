@@ -0,0 +1,58 @@
+"""
+System checks for deployment settings and Django internals the code relies on.
+"""
+import inspect
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import models
+
+from .models import DO_UPDATE_PARAMETERS
+from .routers import replica_aliases
+
+# Backends whose entries are only visible to the process that wrote them
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def check_replica_sticky_cache(app_configs, **kwargs):
+    """With replicas, the read-your-writes flag must live in a cache every worker shares"""
+    if not replica_aliases():
+        return []
+    alias = settings.REPLICA_STICKY_CACHE
+    if alias not in settings.CACHES:
+        return [Error(
+            f"REPLICA_STICKY_CACHE names the cache {alias!r}, which is not in CACHES.",
+            id="core.E001",
+        )]
+    if settings.CACHES[alias]["BACKEND"] in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"REPLICA_STICKY_CACHE ({alias!r}) uses a per-process cache backend.",
+            hint=(
+                "A client's next request may reach another worker, which would not see that it just "
+                "wrote and would read stale rows from a replica. Use a shared backend (CACHE_BACKEND="
+                "redis, memcached or file) or point REPLICA_STICKY_CACHE at one."
+            ),
+            id="core.E002",
+        )]
+    return []
+
+
+@register(Tags.models)
+def check_versioned_model_hook(app_configs, **kwargs):
+    """VersionedModel overrides the private Model._do_update: its signature must be the one it was written for"""
+    parameters = tuple(inspect.signature(models.Model._do_update).parameters)
+    if parameters != DO_UPDATE_PARAMETERS:
+        return [Error(
+            f"Model._do_update takes {parameters}, not the {DO_UPDATE_PARAMETERS} "
+            "core.models.VersionedModel overrides.",
+            hint=(
+                "The installed Django changed this private method. Port VersionedModel._do_update (and "
+                "DO_UPDATE_PARAMETERS) to it before running, or optimistic concurrency checks may be skipped."
+            ),
+            id="core.E003",
+        )]
+    return []
@@ -0,0 +1,61 @@
+"""
+Optimistic concurrency on the API.
+
+Versioned resources (see core.models.VersionedModel) return their
+``version`` in the payload. A client that wants to be sure it is not
+overwriting someone else's change sends it back as ``If-Match: "<version>"``
+on PUT, PATCH, DELETE or a write action. The request is refused with
+412 Precondition Failed if the row has moved on since then.
+
+Without the header the write goes ahead, but it is still checked against the
+version loaded at the start of the request. A writer that commits in between
+turns the save into a 409 Conflict instead of a lost update.
+"""
+from django.utils.http import parse_etags
+from rest_framework import permissions, status
+from rest_framework.exceptions import APIException
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from .models import ConcurrentUpdateError
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource was changed since it was read; reload it and retry."
+    default_code = "precondition_failed"
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The resource was changed by another request; reload it and retry."
+    default_code = "conflict"
+
+
+def exception_handler(exc, context):
+    """DRF's handler, answering ConcurrentUpdateError with 409"""
+    if isinstance(exc, ConcurrentUpdateError):
+        exc = Conflict()
+    return drf_exception_handler(exc, context)
+
+
+def check_if_match(request, instance):
+    """Raise PreconditionFailed unless If-Match is absent, ``*`` or names the instance's version"""
+    header = request.headers.get("If-Match")
+    if not header:
+        return
+    tags = parse_etags(header)
+    if "*" in tags:
+        return
+    versions = {tag.removeprefix("W/").strip('"') for tag in tags}
+    if str(instance.version) not in versions:
+        raise PreconditionFailed()
+
+
+class OptimisticConcurrencyMixin:
+    """Viewset mixin checking If-Match against the object's version on every write"""
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.request.method not in permissions.SAFE_METHODS:
+            check_if_match(self.request, instance)
+        return instance
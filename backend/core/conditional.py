@@ -0,0 +1,71 @@
+"""
+Conditional GET support for slowly changing listings.
+
+A list's validator is the namespace version from core.cache plus the request
+fingerprint, so checking it costs no query: every write that invalidates the
+cached listing (an organization rename shown on every item included) also
+changes the ETag. A single object adds its own ``updated_at``; it is loaded
+once per request and reused by ``retrieve``. A matching ``If-None-Match``
+short-circuits before anything is serialized.
+
+ETags are weak from the start: they identify the data, not the bytes, which
+CompressionMiddleware may re-encode.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import cache
+
+
+def _list_validators(view):
+    # The namespace version alone tells whether the listing changed
+    return None, ""
+
+
+def _detail_validators(view):
+    instance = view.get_object()
+    # retrieve() asks for the object again; this request's view hands back the one just loaded
+    view.get_object = lambda: instance
+    return instance.updated_at, str(instance.pk)
+
+
+def conditional_response(namespace):
+    """
+    Add ETag/Last-Modified to a viewset list/retrieve action and answer
+    ``If-None-Match``/``If-Modified-Since`` with 304 when nothing changed.
+    """
+    def decorator(method):
+        validators = _list_validators if method.__name__ == "list" else _detail_validators
+
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            last_modified, marker = validators(view)
+            scope = cache.request_scope(request)
+            raw = "|".join([
+                cache.request_fingerprint(request),
+                str(cache.get_version(namespace, scope)),
+                marker,
+                last_modified.isoformat() if last_modified else "",
+            ])
+            etag = "W/" + quote_etag(hashlib.md5(raw.encode()).hexdigest())
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,199 @@
+"""
+Per-organization change events for live dashboards.
+
+Writers call ``publish(organization_id, type, data)`` (normally from
+``transaction.on_commit``); the SSE endpoint in core.streams subscribes to one
+organization, or to every organization for administrators, and streams what
+arrives. Subscribers are asyncio queues owned by the ASGI event loop, so
+publishing from sync code hands events over with ``call_soon_threadsafe``.
+
+``LocalBroker`` only reaches subscribers of the same process. With
+``EVENTS_BROKER = "relay"`` every worker also keeps one TCP connection to
+``manage.py run_event_relay``, which repeats each published line to all
+workers, so events reach subscribers wherever they are connected. The
+reading connection opens with ``RELAY_SUBSCRIBE``; publishing uses a second
+connection that the relay never writes to.
+"""
+import asyncio
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+ALL_ORGANIZATIONS = "*"
+RELAY_SUBSCRIBE = b"subscribe\n"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def encode(event):
+    return json.dumps(event, cls=DjangoJSONEncoder, separators=(",", ":"))
+
+
+class Subscription:
+    """One connected client: a bounded queue drained by its stream coroutine"""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event):
+        """Called on the event loop; a client too slow to keep up loses its oldest events"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Fan-out to the subscribers of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, str(channel), _setting("EVENTS_QUEUE_SIZE", 100))
+        with self._lock:
+            self._channels.setdefault(subscription.channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+    def dispatch(self, event):
+        with self._lock:
+            targets = list(self._channels.get(event["organization"], ())) + list(
+                self._channels.get(ALL_ORGANIZATIONS, ())
+            )
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+
+class RelayBroker(LocalBroker):
+    """Local fan-out fed by the shared relay; publishing goes through the relay only"""
+
+    RECONNECT_SECONDS = 2
+
+    def __init__(self, address):
+        super().__init__()
+        host, port = address.rsplit(":", 1)
+        self.address = (host, int(port))
+        self._send_lock = threading.Lock()
+        self._sender = None
+        self._reader = None
+
+    def _connect(self):
+        return socket.create_connection(self.address, timeout=5)
+
+    def _ensure_reader(self):
+        if self._reader is None or not self._reader.is_alive():
+            self._reader = threading.Thread(target=self._read_forever, name="event-relay-reader", daemon=True)
+            self._reader.start()
+
+    def _read_forever(self):
+        while True:
+            try:
+                with self._connect() as conn:
+                    conn.sendall(RELAY_SUBSCRIBE)
+                    conn.settimeout(None)
+                    for line in conn.makefile("r", encoding="utf-8"):
+                        try:
+                            self.dispatch(json.loads(line))
+                        except (ValueError, KeyError):
+                            logger.warning("Ignoring malformed relay event")
+            except OSError as exc:
+                logger.warning("Event relay unavailable (%s); retrying", exc)
+            time.sleep(self.RECONNECT_SECONDS)
+
+    def subscribe(self, channel):
+        self._ensure_reader()
+        return super().subscribe(channel)
+
+    def publish(self, event):
+        self._ensure_reader()
+        line = (encode(event) + "\n").encode("utf-8")
+        with self._send_lock:
+            for _ in range(2):
+                try:
+                    if self._sender is None:
+                        self._sender = self._connect()
+                    self._sender.sendall(line)
+                    return
+                except OSError:
+                    if self._sender is not None:
+                        self._sender.close()
+                    self._sender = None
+        logger.warning("Dropped %s event: relay unavailable", event["type"])
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if _setting("EVENTS_BROKER", "local") == "relay":
+                    _broker = RelayBroker(_setting("EVENTS_RELAY_ADDRESS", "127.0.0.1:8765"))
+                else:
+                    _broker = LocalBroker()
+    return _broker
+
+
+def listening():
+    """False when events would certainly reach nobody, so publishers can skip building them"""
+    broker = get_broker()
+    return isinstance(broker, RelayBroker) or broker.subscriber_count() > 0
+
+
+def publish(organization_id, event_type, data):
+    if organization_id is None:
+        return
+    get_broker().publish({
+        "id": uuid.uuid4().hex,
+        "type": event_type,
+        "organization": str(organization_id),
+        "data": data,
+    })
+
+
+def publish_on_commit(organization_id, event_type, data):
+    transaction.on_commit(lambda: publish(organization_id, event_type, data))
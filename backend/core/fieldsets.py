@@ -0,0 +1,185 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?omit=`` on every model viewset.
+
+``?fields=id,status,item.name`` keeps only the listed fields and
+``?omit=description,item.organization_name`` drops fields. A dotted name
+reaches into a nested serializer. Unknown names are ignored, as with
+``?expand=``.
+
+The listing queryset is trimmed to match: columns no remaining field reads
+are deferred, the forward relations the remaining fields read are joined
+with ``select_related`` (and no others), and prefetches behind removed
+fields are dropped. A narrow request does less database work as well as
+sending less JSON. Fields the trimming cannot see through (model
+properties, ``SerializerMethodField``) keep every column of their model.
+Writes and single-object reads are never deferred: saving a partially
+loaded instance would only write the loaded columns.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def _parse(value):
+    """``"a,b.c"`` -> ``{"a": {}, "b": {"c": {}}}``; an empty dict means the whole field"""
+    paths = [[part.strip() for part in name.split(".")] for name in value.split(",")]
+    tree = {}
+    # Deepest first, so "b" anywhere in the list wins over "b.c"
+    for parts in sorted((parts for parts in paths if all(parts)), key=len, reverse=True):
+        node = tree
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = {}
+    return tree
+
+
+def requested_fieldset(request):
+    """(fields, omit) from the query string; fields is None when not restricted"""
+    if request is None:
+        return None, {}
+    params = getattr(request, "query_params", request.GET)
+    fields = _parse(params["fields"]) if params.get("fields", "").strip() else None
+    return fields, _parse(params.get("omit", ""))
+
+
+def _fields_of(serializer):
+    """The field mapping of a (possibly many=True) serializer, or None for plain fields"""
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    return serializer.fields if isinstance(serializer, BaseSerializer) else None
+
+
+def trim_serializer(serializer, fields=None, omit=None):
+    """Remove the fields not selected by a parsed ``fields``/``omit`` pair, in place"""
+    mapping = _fields_of(serializer)
+    if mapping is None:
+        return serializer
+    omit = omit or {}
+    for name in list(mapping):
+        if fields is not None and name not in fields:
+            del mapping[name]
+        elif name in omit and not omit[name]:
+            del mapping[name]
+        else:
+            nested_fields = fields.get(name) if fields is not None else None
+            if nested_fields or omit.get(name):
+                trim_serializer(mapping[name], nested_fields or None, omit.get(name))
+    return serializer
+
+
+class _Columns:
+    """What the serialized fields read from one model: columns, joined and prefetched relations"""
+
+    def __init__(self):
+        self.names = set()
+        self.everything = False
+        self.relations = {}
+        self.prefetched = set()
+
+    def relation(self, name):
+        return self.relations.setdefault(name, _Columns())
+
+
+def _collect(serializer, model, columns):
+    for field in _fields_of(serializer).values():
+        if field.write_only:
+            continue
+        if field.source == "*":
+            columns.everything = True
+            continue
+        _follow(field, model, field.source_attrs, columns)
+    return columns
+
+
+def _follow(field, model, attrs, columns):
+    try:
+        model_field = model._meta.get_field(attrs[0])
+    except FieldDoesNotExist:
+        # A property or method: it may read any column
+        columns.everything = True
+        return
+
+    if not model_field.is_relation:
+        columns.names.add(model_field.name)
+    elif model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+        columns.names.add(model_field.name)
+        related = model_field.related_model
+        if len(attrs) > 1:
+            _follow(field, related, attrs[1:], columns.relation(model_field.name))
+        elif _fields_of(field) is not None:
+            _collect(field, related, columns.relation(model_field.name))
+    else:
+        columns.prefetched.add(attrs[0])
+
+
+def _deferred(model, columns, prefix=""):
+    if columns.everything:
+        return []
+    return [
+        f"{prefix}{field.name}" for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in columns.names
+    ]
+
+
+def _joins(model, columns, prefix=""):
+    """(select_related paths, deferred names) covering every relation still read"""
+    paths, deferred = [], _deferred(model, columns, prefix)
+    for name, nested in columns.relations.items():
+        related = model._meta.get_field(name).related_model
+        nested_paths, nested_deferred = _joins(related, nested, f"{prefix}{name}__")
+        paths.extend(nested_paths or [f"{prefix}{name}"])
+        deferred.extend(nested_deferred)
+    return paths, deferred
+
+
+def trim_queryset(queryset, serializer):
+    """
+    Defer the columns the serializer no longer reads, join exactly the
+    forward relations it still reads and drop unneeded prefetches.
+    """
+    columns = _collect(serializer, queryset.model, _Columns())
+
+    if queryset.query.select_related is True:
+        # select_related() without arguments: leave the joins alone
+        deferred = _deferred(queryset.model, columns)
+    else:
+        paths, deferred = _joins(queryset.model, columns)
+        queryset = queryset.select_related(None)
+        if paths:
+            queryset = queryset.select_related(*paths)
+
+    lookups = queryset._prefetch_related_lookups
+    kept = [
+        lookup for lookup in lookups
+        if getattr(lookup, "prefetch_through", lookup).split("__")[0] in columns.prefetched | set(columns.relations)
+    ]
+    if len(kept) != len(lookups):
+        queryset = queryset.prefetch_related(None).prefetch_related(*kept)
+
+    return queryset.defer(*deferred) if deferred else queryset
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin honouring ``?fields=``/``?omit=`` on safe methods, and
+    trimming the queryset of the list action to the fields that remain.
+    """
+
+    def _fieldset(self):
+        if self.request is None or self.request.method not in permissions.SAFE_METHODS:
+            return None, {}
+        return requested_fieldset(self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields, omit = self._fieldset()
+        if fields is not None or omit:
+            trim_serializer(serializer, fields, omit)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, omit = self._fieldset()
+        if self.action == "list" and (fields is not None or omit):
+            queryset = trim_queryset(queryset, self.get_serializer())
+        return queryset
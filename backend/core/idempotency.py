@@ -0,0 +1,128 @@
+"""
+Idempotency keys for retried writes.
+
+A client that may retry a POST sends ``Idempotency-Key: <unique value>``.
+The first request claims the key by inserting an IdempotencyKey row for
+(user, key). That insert is the only statement on the hot path, since the
+unique index does the duplicate check. The view then runs and its response
+is stored on the row. A retry hits the unique index, finds the row and gets
+the stored response back with ``Idempotent-Replayed: true``, without the view
+running again.
+
+Cases:
+- A retry that arrives while the first request is still running gets 409.
+- A request whose worker died leaves its key claimed without a response.
+  After ``IDEMPOTENCY_LEASE_SECONDS`` a retry of the same request reclaims
+  the key and runs for real.
+- Reusing a key for a different method, path or body gets 422.
+- If the view raises or returns a 5xx, the key is released, so the retry
+  runs for real.
+- Keys expire after ``IDEMPOTENCY_KEY_TTL_HOURS``. ``manage.py
+  purge_idempotency_keys`` deletes the expired ones.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request, args, kwargs):
+    raw = json.dumps(
+        [request.method, request.path, kwargs, request.data],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """(record, claimed): our new or reclaimed row, or the live row already holding the key (None if it vanished)"""
+    now = timezone.now()
+    expires_at = now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    record = None
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user, key=key, fingerprint=fingerprint, started_at=now, expires_at=expires_at,
+                ), True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is not None and record.expires_at > now:
+            if _abandoned(record, fingerprint, now) and _reclaim(record, now, expires_at):
+                return record, True
+            return record, False
+        # Expired, or released since the insert failed: free it and try once more
+        IdempotencyKey.objects.filter(user=user, key=key, expires_at__lte=now).delete()
+    return record, False
+
+
+def _abandoned(record, fingerprint, now):
+    """Whether the same request claimed ``record`` and never stored a response within the lease"""
+    return (
+        record.status_code is None
+        and record.fingerprint == fingerprint
+        and record.started_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+    )
+
+
+def _reclaim(record, now, expires_at):
+    """Take over an abandoned row; only one of several concurrent retries wins"""
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, started_at=record.started_at
+    ).update(started_at=now, expires_at=expires_at)
+    record.started_at, record.expires_at = now, expires_at
+    return bool(taken)
+
+
+def idempotent(method):
+    """
+    Make a viewset write action safe to retry with an Idempotency-Key header.
+    Requests without the header are not affected.
+    """
+    # Imported here, as in core.cache, so importing this module stays cheap
+    from rest_framework.response import Response
+
+    @wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER, "").strip()
+        if not key or not request.user.is_authenticated:
+            return method(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"{HEADER} is longer than {MAX_KEY_LENGTH} characters"}, status=400)
+
+        fingerprint = request_fingerprint(request, args, kwargs)
+        record, claimed = _claim(request.user, key, fingerprint)
+        if not claimed:
+            if record is not None and record.fingerprint != fingerprint:
+                return Response({"error": f"{HEADER} was already used for a different request"}, status=422)
+            if record is None or record.status_code is None:
+                return Response({"error": "A request with this Idempotency-Key is still in progress"}, status=409)
+            return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: "true"})
+
+        try:
+            response = method(view, request, *args, **kwargs)
+        except BaseException:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+            return response
+
+        record.status_code = response.status_code
+        record.response = response.data
+        record.save(update_fields=["status_code", "response"])
+        return response
+
+    return wrapper
@@ -0,0 +1,82 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.utils import load_backend
+
+
+def _query(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request database cost of opening a new connection for every request "
+        "against the configured connection reuse (DB_CONN_MAX_AGE or DB_POOL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        alias, count = options["database"], options["requests"]
+        configured = connections[alias]
+        settings_dict = configured.settings_dict
+
+        if settings_dict["OPTIONS"].get("pool"):
+            mode = "pool"
+        elif settings_dict["CONN_MAX_AGE"] == 0:
+            mode = "none (DB_CONN_MAX_AGE=0)"
+        else:
+            mode = f"persistent (DB_CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']})"
+        self.stdout.write(f"{settings_dict['ENGINE']} {settings_dict['NAME']}, reuse: {mode}, {count} requests")
+
+        baseline = self._timed(count, lambda: self._fresh_connection_request(settings_dict, alias))
+        reused = self._timed(count, lambda: self._configured_request(configured))
+        configured.close()
+
+        self._report("new connection per request", baseline)
+        self._report("configured reuse", reused)
+        saved = statistics.mean(baseline) - statistics.mean(reused)
+        self.stdout.write(self.style.SUCCESS(f"Connection setup saved per request: {saved * 1000:.3f}ms"))
+
+    def _fresh_connection_request(self, settings_dict, alias):
+        """What every request paid with CONN_MAX_AGE=0 and no pool: connect, query, disconnect"""
+        options = {key: value for key, value in settings_dict["OPTIONS"].items() if key != "pool"}
+        fresh = load_backend(settings_dict["ENGINE"]).DatabaseWrapper(
+            {**settings_dict, "CONN_MAX_AGE": 0, "OPTIONS": options}, alias
+        )
+        try:
+            _query(fresh)
+        finally:
+            fresh.close()
+
+    def _configured_request(self, connection):
+        """A request as Django runs it: connection housekeeping on start and finish"""
+        request_started.send(sender=self.__class__)
+        try:
+            _query(connection)
+        finally:
+            request_finished.send(sender=self.__class__)
+
+    def _timed(self, count, func):
+        func()  # warm up
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def _report(self, label, timings):
+        timings = sorted(timings)
+        self.stdout.write(
+            f"  {label:28} mean {statistics.mean(timings) * 1000:7.3f}ms  "
+            f"p50 {statistics.median(timings) * 1000:7.3f}ms  "
+            f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:7.3f}ms"
+        )
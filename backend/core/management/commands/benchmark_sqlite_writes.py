@@ -0,0 +1,111 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from backend.database import sqlite_options
+
+SCHEMA = [
+    "CREATE TABLE stock (id INTEGER PRIMARY KEY, quantity INTEGER NOT NULL)",
+    "CREATE TABLE movement (id INTEGER PRIMARY KEY AUTOINCREMENT, stock_id INTEGER NOT NULL, "
+    "quantity INTEGER NOT NULL, note TEXT NOT NULL, created_at REAL NOT NULL)",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent stock-movement write transactions against scratch SQLite files, once with "
+        "Django's default SQLite settings and once with the SQLITE_TUNING options, and compare "
+        "throughput and 'database is locked' failures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--transactions", type=int, default=300, help="Per thread")
+        parser.add_argument("--rows", type=int, default=100, help="Stock rows the writers spread over")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['threads']} threads x {options['transactions']} transactions "
+            f"(read stock, update it, insert a movement)"
+        )
+        for label, sqlite_settings in (("default", {}), ("tuned", sqlite_options())):
+            with tempfile.TemporaryDirectory() as directory:
+                alias = f"sqlite_benchmark_{label}"
+                connections.settings[alias] = {
+                    **connections.settings["default"],
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": os.path.join(directory, "benchmark.sqlite3"),
+                    "OPTIONS": sqlite_settings,
+                    "CONN_MAX_AGE": None,
+                }
+                try:
+                    self._report(label, self._run(alias, options))
+                finally:
+                    del connections.settings[alias]
+
+    def _run(self, alias, options):
+        with connections[alias].cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany(
+                "INSERT INTO stock (id, quantity) VALUES (%s, %s)",
+                [(pk, 1000) for pk in range(options["rows"])],
+            )
+        connections[alias].close()
+
+        latencies, failures, lock = [], [], threading.Lock()
+
+        def writer(seed):
+            done, errors = [], 0
+            for n in range(options["transactions"]):
+                stock_id = (seed * 7919 + n) % options["rows"]
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                        cursor.execute("SELECT quantity FROM stock WHERE id = %s", [stock_id])
+                        quantity = cursor.fetchone()[0]
+                        cursor.execute("UPDATE stock SET quantity = %s WHERE id = %s", [quantity - 1, stock_id])
+                        cursor.execute(
+                            "INSERT INTO movement (stock_id, quantity, note, created_at) VALUES (%s, %s, %s, %s)",
+                            [stock_id, 1, "benchmark stock_out", time.time()],
+                        )
+                except OperationalError:
+                    errors += 1
+                    continue
+                done.append(time.perf_counter() - started)
+            connections[alias].close()
+            with lock:
+                latencies.extend(done)
+                failures.append(errors)
+
+        threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM movement")
+            committed = cursor.fetchone()[0]
+        connections[alias].close()
+        return {"elapsed": elapsed, "latencies": sorted(latencies), "failed": sum(failures), "committed": committed}
+
+    def _report(self, label, result):
+        latencies = result["latencies"]
+        line = (
+            f"  {label:8} {result['committed'] / result['elapsed']:8.1f} commits/s  "
+            f"committed {result['committed']}  failed {result['failed']}"
+        )
+        if latencies:
+            line += (
+                f"  p50 {statistics.median(latencies) * 1000:6.2f}ms"
+                f"  p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.2f}ms"
+            )
+        self.stdout.write(line)
@@ -0,0 +1,20 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import build_schema, code_version
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema file served at /api/schema/ for the current code version (run at deploy)."
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS_ENABLED:
+            raise CommandError("API docs are disabled; set API_DOCS_ENABLED=True to build the schema.")
+
+        path = build_schema()
+        self.stdout.write(self.style.SUCCESS(
+            f"Schema for version {code_version()} written to {path} "
+            f"({os.path.getsize(path)} bytes, {os.path.getsize(path + '.gz')} gzipped)"
+        ))
@@ -0,0 +1,84 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a cold process does before it can serve: configure Django, load every
+# app, then import the URLconf (all views and serializers) or the server entry point
+STARTUP_SCRIPTS = {
+    "setup": "import django; django.setup()",
+    "urls": "import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns",
+    "wsgi": "import backend.wsgi; from django.urls import get_resolver; get_resolver().url_patterns",
+    "asgi": "import backend.asgi; from django.urls import get_resolver; get_resolver().url_patterns",
+}
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh Python processes the way a worker or management command does and report "
+        "the startup time, import time per app/package and the slowest modules (python -X importtime)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=sorted(STARTUP_SCRIPTS), default="urls")
+        parser.add_argument("--repeat", type=int, default=5, help="Cold starts to time")
+        parser.add_argument("--top", type=int, default=15, help="Modules and packages to list")
+
+    def handle(self, *args, **options):
+        script = (
+            "import time; _started = time.perf_counter(); "
+            f"{STARTUP_SCRIPTS[options['target']]}; "
+            "print('startup', time.perf_counter() - _started)"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings")}
+
+        wall_times, import_log = [], ""
+        for _ in range(options["repeat"]):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", script],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if result.returncode:
+                # The error is the last line that is not -X importtime output
+                errors = [
+                    line for line in result.stderr.splitlines()
+                    if line.strip() and not IMPORT_TIME_LINE.match(line)
+                ]
+                raise CommandError(errors[-1] if errors else f"exit status {result.returncode}")
+            wall_times.append(float(result.stdout.split("startup")[-1]))
+            import_log = result.stderr
+
+        modules = self._parse(import_log)
+        self.stdout.write(
+            f"{options['target']}: median {statistics.median(wall_times) * 1000:.0f}ms over {len(wall_times)} "
+            f"cold starts (min {min(wall_times) * 1000:.0f}ms), {len(modules)} modules imported"
+        )
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split(".")[0]] += self_us
+        local_apps = {app.split(".")[0] for app in settings.INSTALLED_APPS} | {"backend"}
+        self.stdout.write("\nImport time per app/package (own modules only):")
+        for package, total in sorted(packages.items(), key=lambda item: -item[1])[:options["top"]]:
+            marker = "  *" if package in local_apps else ""
+            self.stdout.write(f"  {total / 1000:8.1f}ms  {package}{marker}")
+
+        self.stdout.write("\nSlowest modules (self / cumulative):")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda module: -module[1])[:options["top"]]:
+            self.stdout.write(f"  {self_us / 1000:8.1f}ms {cumulative_us / 1000:8.1f}ms  {name}")
+        self.stdout.write("\n* installed app")
+
+    def _parse(self, import_log):
+        """[(module, self µs, cumulative µs)] from python -X importtime output"""
+        return [
+            (match.group(4), int(match.group(1)), int(match.group(2)))
+            for match in map(IMPORT_TIME_LINE.match, import_log.splitlines())
+            if match
+        ]
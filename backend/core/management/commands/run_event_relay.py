@@ -0,0 +1,70 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.events import RELAY_SUBSCRIBE
+
+MAX_BUFFERED_BYTES = 8 * 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the event relay that repeats every published event line to all subscribed "
+        "workers (EVENTS_BROKER=relay). Stand-in for a shared pub/sub service."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--address", default=settings.EVENTS_RELAY_ADDRESS, help="host:port to listen on")
+
+    def handle(self, *args, **options):
+        host, port = options["address"].rsplit(":", 1)
+        try:
+            asyncio.run(self.serve(host, int(port)))
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self, host, port):
+        clients = set()
+        handlers = {}
+
+        def fan_out(line):
+            for client in list(clients):
+                if client.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+                    # A worker that stopped reading is cut off rather than buffered forever
+                    clients.discard(client)
+                    client.close()
+                    continue
+                client.write(line)
+
+        async def handle(reader, writer):
+            # Subscribers announce themselves; any other connection only publishes
+            # and is never written to, since nothing would read what it was sent
+            handlers[writer] = asyncio.current_task()
+            try:
+                line = await reader.readline()
+                if line == RELAY_SUBSCRIBE:
+                    clients.add(writer)
+                    while await reader.read(4096):
+                        pass
+                    return
+                while line:
+                    fan_out(line)
+                    line = await reader.readline()
+            finally:
+                handlers.pop(writer, None)
+                clients.discard(writer)
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        self.stdout.write(self.style.SUCCESS(f"Event relay listening on {host}:{port}"))
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                # Closing the connections lets every handler finish on EOF instead of
+                # being cancelled mid-read when the loop shuts down
+                running = list(handlers.values())
+                for writer in list(handlers):
+                    writer.close()
+                await asyncio.gather(*running, return_exceptions=True)
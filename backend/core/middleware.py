@@ -0,0 +1,156 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import remember_token
+from .routers import replica_aliases, replica_reads
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/vnd.oai.openapi",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+ACCEPT_ENCODING_ITEM = _lazy_re_compile(r"\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?")
+
+
+def client_key(request):
+    """
+    Who is asking, without touching the database: JWT user, else session.
+    A valid token is kept on the request for core.authentication to reuse.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header:
+        raw_token = authentication.get_raw_token(header)
+        try:
+            token = authentication.get_validated_token(raw_token)
+            key = f"user:{token[api_settings.USER_ID_CLAIM]}"
+        except (InvalidToken, TokenError, KeyError, TypeError):
+            return None
+        remember_token(request, token)
+        return key
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f"session:{session_key}" if session_key else None
+
+
+def _sticky_key(key):
+    return f"replica:sticky:{key}"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe-method requests read from the replicas, except for clients that
+    wrote within the last REPLICA_STICKY_SECONDS: those read from the primary
+    so they see their own changes immediately (read-your-writes). The flag
+    lives in the REPLICA_STICKY_CACHE cache, which core.checks requires to be
+    shared between workers.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = client_key(request)
+        sticky = caches[settings.REPLICA_STICKY_CACHE]
+        safe = request.method in SAFE_METHODS
+        with replica_reads(safe and not (key and sticky.get(_sticky_key(key)))):
+            response = self.get_response(request)
+        if key and not safe:
+            sticky.set(_sticky_key(key), True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = client_key(request)
+        sticky = caches[settings.REPLICA_STICKY_CACHE]
+        safe = request.method in SAFE_METHODS
+        with replica_reads(safe and not (key and await sticky.aget(_sticky_key(key)))):
+            response = await self.get_response(request)
+        if key and not safe:
+            await sticky.aset(_sticky_key(key), True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+def negotiate_encoding(request, offered=None):
+    """
+    The best of the ``offered`` content codings the client accepts, or None.
+    Offers "br" (if available) and "gzip" by default.
+    """
+    accepted = {}
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        match = ACCEPT_ENCODING_ITEM.match(item)
+        if match and match.group(1):
+            try:
+                accepted[match.group(1).lower()] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+
+    if offered is None:
+        offered = ["br", "gzip"] if brotli is not None and settings.COMPRESSION_BROTLI else ["gzip"]
+    weights = {encoding: accepted.get(encoding, accepted.get("*", 0)) for encoding in offered}
+    best = max(offered, key=lambda encoding: weights[encoding])
+    return best if weights[best] > 0 else None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress text and JSON responses of at least COMPRESSION_MIN_SIZE bytes
+    with Brotli or gzip, whichever the request's Accept-Encoding prefers.
+    Small bodies are left alone: below a kilobyte or so compression saves
+    less than it costs. Like Django's GZipMiddleware, gzip output is padded
+    with random bytes against BREACH and strong ETags become weak.
+    """
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ["Accept-Encoding"])
+        encoding = negotiate_encoding(request)
+        if encoding is None:
+            return response
+
+        if encoding == "br":
+            compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
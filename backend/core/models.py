@@ -0,0 +1,152 @@
+import copy
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, models
+from django.db.models import F
+from django.utils import timezone
+
+
+class ConcurrentUpdateError(DatabaseError):
+    """The row was changed by another writer since this instance was loaded"""
+
+
+def _frozen(value):
+    # Values mutated in place (JSON dicts and lists) must not alias the snapshot
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+
+# ----------------------------
+# Dirty Field Tracking
+# ----------------------------
+class DirtyFieldsModel(models.Model):
+    """
+    Partial writes: ``save()`` on a loaded instance only writes the columns
+    that changed since it was loaded (or last saved), plus ``auto_now``
+    timestamps. A save with nothing changed still writes those timestamps,
+    so ``updated_at`` moves and ``pre_save``/``post_save`` are sent as for
+    any save. Inserts and saves that pass ``update_fields`` explicitly
+    behave as usual.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, names=None):
+        """Record the current value of the loaded fields (or only ``names``) as saved"""
+        loaded = dict(getattr(self, "_loaded_values", {}))
+        for field in self._meta.concrete_fields:
+            if names is not None and field.name not in names and field.attname not in names:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = _frozen(self.__dict__[field.attname])
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """Names of the loaded fields whose value differs from the one last read or written"""
+        loaded = getattr(self, "_loaded_values", {})
+        return {
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        }
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot(fields)
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding and not args
+            and kwargs.get("update_fields") is None and not kwargs.get("force_insert")
+        ):
+            update_fields = self.get_dirty_fields() | {
+                field.name for field in self._meta.concrete_fields if getattr(field, "auto_now", False)
+            }
+            # Empty update_fields would skip the save and its signals: write every column instead
+            if update_fields:
+                kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+        self._snapshot(kwargs.get("update_fields"))
+
+
+# ----------------------------
+# Optimistic Concurrency
+# ----------------------------
+# The parameters of Model._do_update in the Django release requirements.txt
+# pins (5.2). VersionedModel overrides that private method, and Django may
+# change it in any release: core.checks refuses to start when the installed
+# signature differs, so the override is revisited before an upgrade.
+DO_UPDATE_PARAMETERS = ("self", "base_qs", "using", "pk_val", "values", "update_fields", "forced_update")
+
+
+class VersionedModel(DirtyFieldsModel):
+    """
+    Optimistic concurrency through a ``version`` column.
+
+    Every save runs ``UPDATE ... SET version = version + 1 WHERE pk = ? AND
+    version = ?`` with the version the instance was loaded with, and raises
+    ConcurrentUpdateError when another writer got there first, instead of
+    silently overwriting its changes. Bulk ``QuerySet.update()`` calls must
+    bump the column themselves: ``version=F("version") + 1``. Saves are
+    partial, as for any DirtyFieldsModel.
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Private Django API, checked against DO_UPDATE_PARAMETERS (core.E003).
+        # Whatever else is written (update_fields included), the version moves on
+        values = [(field, model, value) for field, model, value in values if field.name != "version"]
+        values.append((self._meta.get_field("version"), None, F("version") + 1))
+        if base_qs.filter(pk=pk_val, version=self.version)._update(values) > 0:
+            self.version += 1
+            self._snapshot(["version"])
+            return True
+        if base_qs.filter(pk=pk_val).exists():
+            raise ConcurrentUpdateError(
+                f"{self._meta.object_name} {pk_val} was changed by someone else (version {self.version} is stale)"
+            )
+        return False
+
+
+# ----------------------------
+# Idempotency Keys
+# ----------------------------
+class IdempotencyKey(models.Model):
+    """The stored outcome of a write sent with an Idempotency-Key header (see core.idempotency)"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    key = models.CharField(max_length=255)
+    # Hash of method, path and body: a key may not be reused for another request
+    fingerprint = models.CharField(max_length=64)
+
+    # Null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+
+    # When the running request claimed the key: past the lease it is abandoned
+    started_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
@@ -0,0 +1,71 @@
+"""
+A drop-in replacement for DRF's JSONRenderer backed by orjson.
+
+Output is byte for byte what JSONRenderer produces in its compact form:
+UUIDs as strings, Decimals that reach the renderer (serializers already turn
+them into strings) as numbers, and U+2028/U+2029 escaped. Datetimes, dates
+and times are passed through to DRF's own encoder, which truncates
+microseconds to milliseconds and writes UTC as "Z", as is anything else
+orjson has no native encoding for. orjson writes NaN and infinities as null
+where JSONRenderer refuses them (or writes NaN with STRICT_JSON off), so
+output containing null is checked for non-finite numbers and rendered by
+JSONRenderer when it has any. Requests for indented output, values orjson
+cannot encode (such as integers beyond 64 bits) and deployments without
+orjson installed fall back to JSONRenderer.
+"""
+import math
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_default = JSONEncoder().default
+
+
+def _has_non_finite(data):
+    """True if any float or Decimal nested in ``data`` is NaN or infinite"""
+    # Only containers are stacked and the common scalar types are skipped by
+    # identity: this runs on most payloads, and a naive walk costs more than
+    # the orjson encoding it guards
+    pending = [data]
+    while pending:
+        container = pending.pop()
+        for value in (container.values() if isinstance(container, dict) else container):
+            kind = type(value)
+            if kind is str or value is None or kind is int or kind is bool:
+                continue
+            if isinstance(value, float):
+                if not math.isfinite(value):
+                    return True
+            elif isinstance(value, (dict, list, tuple)):
+                pending.append(value)
+            elif isinstance(value, Decimal) and not value.is_finite():
+                return True
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(data, default=_default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b"null" in content and _has_non_finite((data,)):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+            content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return content
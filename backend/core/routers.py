@@ -0,0 +1,52 @@
+"""
+Read-replica routing.
+
+Writes always go to "default". Reads go to a random "replica_<n>" alias only
+inside ``replica_reads()``, which ReplicaRoutingMiddleware opens for
+safe-method requests from clients that have not written recently; everything
+else (writes, management commands, background jobs, reads inside a
+transaction on the primary) reads from the primary. With no replicas
+configured the router is a no-op.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_PREFIX = "replica_"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith(REPLICA_PREFIX)]
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Allow (or, with ``enabled=False``, forbid) replica reads for the block"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db.startswith(REPLICA_PREFIX) else None
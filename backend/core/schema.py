@@ -0,0 +1,137 @@
+"""
+The OpenAPI schema as a prebuilt file.
+
+drf_spectacular introspects every viewset and serializer to produce the
+schema, which is far too much work to repeat per request. The schema only
+changes with the code, so it is generated once per code version (at deploy
+with ``manage.py build_schema``, or on the first request otherwise) into
+``API_SCHEMA_DIR/openapi-<version>.json`` plus a gzipped copy, and served
+from memory with the version as ETag. The docs pages carry the same ETag, so
+a returning browser gets a 304 without anything being rendered.
+
+The code version is ``APP_VERSION`` when the deployment sets it (e.g. the git
+commit), otherwise a hash of the Python sources of the project's own packages
+(the apps under BASE_DIR and the settings package, so not a virtualenv or
+node_modules that happens to live there) and the API settings.
+"""
+import gzip
+import hashlib
+import importlib
+import os
+import threading
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .middleware import negotiate_encoding
+
+# Browsers may reuse the schema and docs pages this long before revalidating
+MAX_AGE = 300
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _project_packages():
+    """Directories of the installed apps that live in BASE_DIR, plus the settings package"""
+    base_dir = os.path.realpath(settings.BASE_DIR)
+    settings_package = os.path.dirname(importlib.import_module(settings.ROOT_URLCONF).__file__)
+    packages = {os.path.realpath(settings_package)}
+    packages.update(os.path.realpath(app.path) for app in apps.get_app_configs())
+    return sorted(path for path in packages if os.path.commonpath([base_dir, path]) == base_dir)
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    if os.getenv("APP_VERSION"):
+        return os.getenv("APP_VERSION")
+
+    digest = hashlib.sha1()
+    for package in _project_packages():
+        for root, dirs, files in os.walk(package):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    with open(os.path.join(root, name), "rb") as source:
+                        digest.update(source.read())
+    digest.update(repr((settings.SPECTACULAR_SETTINGS, settings.REST_FRAMEWORK)).encode())
+    return digest.hexdigest()[:16]
+
+
+def schema_path(version=None):
+    return os.path.join(settings.API_SCHEMA_DIR, f"openapi-{version or code_version()}.json")
+
+
+def build_schema():
+    """Generate the schema for the current code version; returns its path"""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    content = OpenApiJsonRenderer().render(schema, renderer_context={})
+
+    path = schema_path()
+    os.makedirs(settings.API_SCHEMA_DIR, exist_ok=True)
+    for target, data in ((path, content), (f"{path}.gz", gzip.compress(content, mtime=0))):
+        partial = f"{target}.{os.getpid()}.tmp"
+        with open(partial, "wb") as output:
+            output.write(data)
+        os.replace(partial, target)
+
+    # Files of earlier versions are dead weight
+    current = os.path.basename(path)
+    for name in os.listdir(settings.API_SCHEMA_DIR):
+        if name.startswith("openapi-") and not name.startswith(current):
+            os.remove(os.path.join(settings.API_SCHEMA_DIR, name))
+    return path
+
+
+def _schema_files():
+    """(json, gzipped json) for the current version, built on first use"""
+    version = code_version()
+    if version not in _loaded:
+        with _lock:
+            if version not in _loaded:
+                path = schema_path(version)
+                if not (os.path.exists(path) and os.path.exists(f"{path}.gz")):
+                    build_schema()
+                with open(path, "rb") as plain, open(f"{path}.gz", "rb") as compressed:
+                    _loaded.clear()
+                    _loaded[version] = (plain.read(), compressed.read())
+    return _loaded[version]
+
+
+def _etag(request=None, *args, **kwargs):
+    return quote_etag(code_version())
+
+
+def schema_view(request):
+    """GET /api/schema/: the prebuilt schema, gzipped when the client accepts it"""
+    gzipped = negotiate_encoding(request, offered=["gzip"]) == "gzip"
+    # Each encoding is a different representation, so it gets its own tag
+    etag = quote_etag(f"{code_version()}-gzip" if gzipped else code_version())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        plain, compressed = _schema_files()
+        response = HttpResponse(compressed if gzipped else plain, content_type="application/vnd.oai.openapi+json")
+        if gzipped:
+            response["Content-Encoding"] = "gzip"
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=MAX_AGE)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def versioned_page(view_class):
+    """A subclass of a docs page view answering revalidation with 304 until the code changes"""
+    return method_decorator(
+        [condition(etag_func=_etag), cache_control(public=True, max_age=MAX_AGE)],
+        name="dispatch",
+    )(type(view_class.__name__, (view_class,), {}))
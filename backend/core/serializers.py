@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+
+def requested_expansions(request):
+    """Names passed in ``?expand=a,b`` (empty when there is no request)"""
+    if request is None:
+        return set()
+    params = getattr(request, "query_params", request.GET)
+    return {name.strip() for name in params.get("expand", "").split(",") if name.strip()}
+
+
+class ExpandableFieldsMixin:
+    """
+    Leave out the fields listed in ``Meta.expandable_fields`` unless the request
+    opts in with ``?expand=<field>``.
+
+    Fields are resolved lazily, so this also works when the serializer is nested
+    and only the root serializer carries the request in its context.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = requested_expansions(self.context.get("request"))
+        for name in getattr(self.Meta, "expandable_fields", []):
+            if name not in expand:
+                fields.pop(name, None)
+        return fields
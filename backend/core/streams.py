@@ -0,0 +1,172 @@
+"""
+Server-sent events endpoint, mounted in backend.asgi at ``EVENT_STREAM_PATH``.
+
+This is a bare ASGI application rather than a Django view: Django's ASGI
+handler keeps a dedicated thread for every request it is serving, which for
+thousands of idle streams means thousands of threads. Here a stream costs one
+coroutine and a queue; the only sync work (loading the user behind the ticket or JWT)
+runs on the shared executor.
+
+EventSource cannot set headers, so browsers first POST to
+``/api/core/events/ticket/`` with their access token and open the stream with
+``?ticket=<ticket>``: a signed user id valid for ``EVENTS_TICKET_SECONDS`` and
+accepted once, so the access token itself never appears in a URL (and in
+access logs). Other clients may send a Bearer Authorization header instead.
+Administrators receive every organization's events, or one with
+``?organization=<id>``.
+"""
+import asyncio
+import hashlib
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+
+from . import cache, events
+
+EVENT_STREAM_PATH = "/api/core/events/"
+TICKET_SALT = "core.streams.ticket"
+
+
+def issue_ticket(user):
+    return signing.dumps(str(user.pk), salt=TICKET_SALT)
+
+
+def _load_user(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        # get_user raises AuthenticationFailed for deleted and inactive users
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+    except (AuthenticationFailed, TokenError):
+        return None
+    finally:
+        close_old_connections()
+    return user if user.is_active else None
+
+
+def _ticket_user(ticket):
+    max_age = settings.EVENTS_TICKET_SECONDS
+    try:
+        user_id = signing.loads(ticket, salt=TICKET_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    # add() only succeeds for the first use of the ticket
+    used = f"stream-ticket:{hashlib.sha256(ticket.encode()).hexdigest()}"
+    if not caches[cache.SHARED_CACHE].add(used, True, max_age):
+        return None
+    try:
+        user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+    finally:
+        close_old_connections()
+    return user
+
+
+def _authenticate(scope, query):
+    if query.get("ticket"):
+        return _ticket_user(query["ticket"][0])
+    raw_token = _raw_token(scope)
+    return raw_token and _load_user(raw_token)
+
+
+def _raw_token(scope):
+    headers = dict(scope["headers"])
+    parts = headers.get(b"authorization", b"").split()
+    if len(parts) == 2 and parts[0].decode() in settings.SIMPLE_JWT.get("AUTH_HEADER_TYPES", ("Bearer",)):
+        return parts[1].decode()
+    return None
+
+
+def _cors_headers(scope):
+    origin = dict(scope["headers"]).get(b"origin")
+    allowed = getattr(settings, "CORS_ALLOWED_ORIGINS", [])
+    if origin is None or not (settings.CORS_ALLOW_ALL_ORIGINS or origin.decode() in allowed):
+        return []
+    headers = [(b"access-control-allow-origin", origin), (b"vary", b"Origin")]
+    if getattr(settings, "CORS_ALLOW_CREDENTIALS", False):
+        headers.append((b"access-control-allow-credentials", b"true"))
+    return headers
+
+
+async def _reply(send, scope, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), *_cors_headers(scope)],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _frame(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {events.encode(event)}\n\n".encode()
+
+
+async def event_stream(scope, receive, send):
+    if scope["method"] != "GET":
+        return await _reply(send, scope, 405, {"error": "Method not allowed"})
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    user = await sync_to_async(_authenticate, thread_sensitive=False)(scope, query)
+    if not user:
+        return await _reply(send, scope, 401, {"error": "Authentication credentials were not provided or are invalid"})
+
+    if user.is_superuser or user.role == 'admin':
+        channel = query.get("organization", [events.ALL_ORGANIZATIONS])[0]
+    elif user.organization_id:
+        channel = user.organization_id
+    else:
+        return await _reply(send, scope, 403, {"error": "User has no organization"})
+
+    async def wait_for_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    subscription = events.get_broker().subscribe(channel)
+    disconnect = asyncio.ensure_future(wait_for_disconnect())
+    heartbeat = getattr(settings, "EVENTS_HEARTBEAT_SECONDS", 25)
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                *_cors_headers(scope),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b"retry: 5000\n\n", "more_body": True})
+
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({next_event, disconnect}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                next_event.cancel()
+                break
+            if next_event in done:
+                body = _frame(next_event.result())
+            else:
+                next_event.cancel()
+                body = b": ping\n\n"
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        disconnect.cancel()
+        subscription.close()
+
+
+def with_event_stream(django_application):
+    """Route EVENT_STREAM_PATH to the stream and everything else to Django"""
+    async def application(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == EVENT_STREAM_PATH:
+            return await event_stream(scope, receive, send)
+        return await django_application(scope, receive, send)
+
+    return application
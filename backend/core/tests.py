@@ -0,0 +1,764 @@
+import asyncio
+import contextlib
+import datetime
+import importlib.util
+import io
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core import signing
+from django.core.management import CommandError, call_command
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, models, transaction
+from django.db.models.signals import post_save
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend import database
+from core import cache, checks, events, idempotency, schema, streams
+from core.management.commands import run_event_relay
+from inventory import views as inventory_views
+from core.models import ConcurrentUpdateError, IdempotencyKey
+from core.renderers import FastJSONRenderer
+from core.routers import ReplicaRouter, replica_reads
+from inventory.models import Inventory, InventoryMovement, Item, Store
+from org.models import Department, Organization
+from users.models import CustomUser
+
+FILE_CACHE_DIR = tempfile.mkdtemp(prefix="nhs-cache-tests-")
+
+LOCAL_TIER = {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "cache-tests-local",
+}
+
+
+class TwoTierCacheTests:
+    """Run against each shared-tier backend by the subclasses below"""
+
+    def setUp(self):
+        caches[cache.SHARED_CACHE].clear()
+        caches[cache.LOCAL_CACHE].clear()
+        cache.stats.reset()
+
+    def test_store_then_lookup_hits_local_tier(self):
+        key = cache.make_key("items", "org-1", "page-1")
+        cache.store(key, {"results": [1]})
+
+        self.assertEqual(cache.lookup("items", key), {"results": [1]})
+        self.assertEqual(cache.stats.snapshot()["namespaces"]["items"]["local_hits"], 1)
+
+    def test_shared_hit_refills_local_tier(self):
+        key = cache.make_key("items", "org-1", "page-1")
+        cache.store(key, {"results": [1]})
+        caches[cache.LOCAL_CACHE].delete(key)
+
+        self.assertEqual(cache.lookup("items", key), {"results": [1]})
+        self.assertEqual(caches[cache.LOCAL_CACHE].get(key), {"results": [1]})
+        self.assertEqual(cache.stats.snapshot()["namespaces"]["items"]["shared_hits"], 1)
+
+    def test_invalidate_changes_key_for_scope_and_all(self):
+        own = cache.make_key("items", "org-1", "page-1")
+        everyone = cache.make_key("items", cache.ALL_ORGANIZATIONS, "page-1")
+        other = cache.make_key("items", "org-2", "page-1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.invalidate("items", "org-1")
+
+        self.assertNotEqual(cache.make_key("items", "org-1", "page-1"), own)
+        self.assertNotEqual(cache.make_key("items", cache.ALL_ORGANIZATIONS, "page-1"), everyone)
+        self.assertEqual(cache.make_key("items", "org-2", "page-1"), other)
+
+    def test_invalidate_waits_for_commit(self):
+        key = cache.make_key("items", "org-1", "page-1")
+        with self.captureOnCommitCallbacks(execute=False):
+            cache.invalidate("items", "org-1")
+        self.assertEqual(cache.make_key("items", "org-1", "page-1"), key)
+
+    def test_version_read_locally_skips_shared_tier(self):
+        cache.get_version("items", "org-1")
+        shared = caches[cache.SHARED_CACHE]
+        with mock.patch.object(shared, "get", wraps=shared.get) as shared_get:
+            cache.get_version("items", "org-1")
+        shared_get.assert_not_called()
+
+    def test_other_process_bump_is_seen_once_local_version_expires(self):
+        key = cache.make_key("items", "org-1", "page-1")
+        # Another worker bumps the shared counter; this process keeps its copy
+        caches[cache.SHARED_CACHE].incr(cache._version_key("items", "org-1"))
+        self.assertEqual(cache.make_key("items", "org-1", "page-1"), key)
+
+        caches[cache.LOCAL_CACHE].delete(cache._version_key("items", "org-1"))
+        self.assertNotEqual(cache.make_key("items", "org-1", "page-1"), key)
+
+    def test_evicted_version_is_reseeded_from_the_clock(self):
+        version = cache.get_version("items", "org-1")
+        caches[cache.SHARED_CACHE].clear()
+        caches[cache.LOCAL_CACHE].clear()
+        self.assertGreaterEqual(cache.get_version("items", "org-1"), version)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "cache-tests-shared"},
+    "local": LOCAL_TIER,
+})
+class LocMemCacheTests(TwoTierCacheTests, TestCase):
+    pass
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": FILE_CACHE_DIR},
+    "local": LOCAL_TIER,
+})
+class FileCacheTests(TwoTierCacheTests, TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(FILE_CACHE_DIR, ignore_errors=True)
+
+
+class EventStreamAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("admin@example.com", "Admin", "pw", role="admin")
+
+    def setUp(self):
+        caches[cache.SHARED_CACHE].clear()
+
+    def open_stream(self, query_string):
+        sent = []
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "headers": [], "query_string": query_string.encode()}
+        async_to_sync(streams.event_stream)(scope, receive, send)
+        return sent[0]["status"]
+
+    def ticket(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/core/events/ticket/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["ticket"]
+
+    def test_ticket_is_accepted_once(self):
+        ticket = self.ticket()
+        self.assertEqual(streams._ticket_user(ticket), self.user)
+        self.assertIsNone(streams._ticket_user(ticket))
+        self.assertEqual(self.open_stream(f"ticket={ticket}"), 401)
+
+    def test_expired_or_forged_ticket_is_rejected(self):
+        ticket = self.ticket()
+        with mock.patch("time.time", return_value=signing.time.time() + 31):
+            self.assertIsNone(streams._ticket_user(ticket))
+        self.assertIsNone(streams._ticket_user(signing.dumps(str(self.user.pk))))
+        self.assertEqual(self.open_stream("ticket=forged"), 401)
+
+    def test_ticket_of_a_deactivated_user_is_rejected(self):
+        ticket = self.ticket()
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(streams._ticket_user(ticket))
+
+    def test_access_token_in_the_query_string_is_ignored(self):
+        self.assertEqual(self.open_stream(f"token={AccessToken.for_user(self.user)}"), 401)
+
+    def test_token_of_a_deleted_or_inactive_user_is_not_an_error(self):
+        token = str(AccessToken.for_user(self.user))
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(streams._load_user(token))
+        CustomUser.objects.filter(pk=self.user.pk).delete()
+        self.assertIsNone(streams._load_user(token))
+
+
+class EventRelayTests(SimpleTestCase):
+    """A publishing and a subscribing worker connected to a running relay"""
+
+    def setUp(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        self.address = f"127.0.0.1:{port}"
+
+        started = threading.Event()
+
+        async def relay():
+            self.relay_loop, self.relay = asyncio.get_running_loop(), asyncio.current_task()
+            started.set()
+            with contextlib.suppress(asyncio.CancelledError):
+                await run_event_relay.Command(stdout=io.StringIO()).serve("127.0.0.1", port)
+
+        # The relay gets its own thread and loop, as it would its own process
+        thread = threading.Thread(target=asyncio.run, args=(relay(),), daemon=True)
+        thread.start()
+        started.wait(5)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(lambda: self.relay_loop.call_soon_threadsafe(self.relay.cancel))
+
+        for _ in range(50):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                threading.Event().wait(0.1)
+
+    def broker(self):
+        broker = events.RelayBroker(self.address)
+        # Once the relay stops, the reader would retry (and warn) for the rest of the run
+        broker.RECONNECT_SECONDS = 3600
+        return broker
+
+    async def test_published_events_reach_subscribers_and_are_not_echoed_to_the_publisher(self):
+        subscriber, publisher = self.broker(), self.broker()
+        subscription = subscriber.subscribe("org-1")
+        self.addCleanup(subscription.close)
+        # Probe until the subscribing connection has joined the fan-out set
+        for _ in range(25):
+            await asyncio.to_thread(publisher.publish, {"id": "probe", "type": "probe", "organization": "org-1"})
+            try:
+                await asyncio.wait_for(subscription.get(), 0.2)
+                break
+            except asyncio.TimeoutError:
+                continue
+
+        sent = [
+            {"id": str(index), "type": "inventory.changed", "organization": "org-1", "data": {"index": index}}
+            for index in range(50)
+        ]
+        for event in sent:
+            await asyncio.to_thread(publisher.publish, event)
+
+        received = []
+        while len(received) < len(sent):
+            event = await asyncio.wait_for(subscription.get(), 5)
+            if event["type"] != "probe":
+                received.append(event)
+        self.assertEqual(received, sent)
+
+        # Nothing comes back on the publishing connection, so its buffer never fills
+        publisher._sender.setblocking(False)
+        self.addCleanup(publisher._sender.close)
+        with self.assertRaises(BlockingIOError):
+            publisher._sender.recv(1)
+
+
+class IdempotencyLeaseTests(TestCase):
+    url = "/api/store/inventory-movements/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            "admin@example.com", "Admin", "pw", role="admin", is_superuser=True
+        )
+        organization = Organization.objects.create(name="North Trust")
+        cls.inventory = Inventory.objects.create(
+            item=Item.objects.create(name="Glove", sku="GLV-001", organization=organization),
+            store=Store.objects.create(name="Main", organization=organization),
+            quantity_available=10,
+        )
+
+    def post(self, body=None):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        body = body or {"inventory": str(self.inventory.pk), "movement_type": "stock_in", "quantity": 5}
+        return client.post(self.url, body, format="json", HTTP_IDEMPOTENCY_KEY="retry-1")
+
+    def crash_after(self, seconds):
+        """Leave the key as a worker that died ``seconds`` into the request would"""
+        IdempotencyKey.objects.filter(key="retry-1").update(
+            status_code=None, response=None,
+            started_at=timezone.now() - datetime.timedelta(seconds=seconds),
+        )
+
+    def test_retry_within_the_lease_is_still_in_progress(self):
+        self.assertEqual(self.post().status_code, 201)
+        self.crash_after(settings.IDEMPOTENCY_LEASE_SECONDS - 10)
+
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(InventoryMovement.objects.count(), 1)
+
+    def test_retry_after_the_lease_reclaims_the_key_and_runs(self):
+        self.assertEqual(self.post().status_code, 201)
+        self.crash_after(settings.IDEMPOTENCY_LEASE_SECONDS + 10)
+
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(InventoryMovement.objects.count(), 2)
+        replay = self.post()
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(InventoryMovement.objects.count(), 2)
+
+    def test_abandoned_key_is_not_reclaimed_for_a_different_request(self):
+        self.assertEqual(self.post().status_code, 201)
+        self.crash_after(settings.IDEMPOTENCY_LEASE_SECONDS + 10)
+
+        body = {"inventory": str(self.inventory.pk), "movement_type": "stock_in", "quantity": 6}
+        self.assertEqual(self.post(body).status_code, 422)
+
+    def test_only_one_concurrent_retry_reclaims(self):
+        self.assertEqual(self.post().status_code, 201)
+        self.crash_after(settings.IDEMPOTENCY_LEASE_SECONDS + 10)
+        real_reclaim = idempotency._reclaim
+
+        def competitor_first(record, now, expires_at):
+            # Another retry reclaims the key between our read and our update
+            real_reclaim(IdempotencyKey.objects.get(pk=record.pk), now, expires_at)
+            return real_reclaim(record, now, expires_at)
+
+        with mock.patch.object(idempotency, "_reclaim", competitor_first):
+            self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(InventoryMovement.objects.count(), 1)
+
+
+class DirtyFieldsModelTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name="North Trust")
+        cls.inventory = Inventory.objects.create(
+            item=Item.objects.create(name="Glove", sku="GLV-001", organization=cls.organization),
+            store=Store.objects.create(name="Main", organization=cls.organization),
+            quantity_available=50, minimum_quantity=10,
+        )
+
+    def saved(self, instance, save=None):
+        """(SET clause with the timestamp masked, post_save calls) of one save"""
+        calls = []
+
+        def receiver(sender, **kwargs):
+            calls.append(kwargs["created"])
+
+        post_save.connect(receiver, sender=type(instance))
+        self.addCleanup(post_save.disconnect, receiver, sender=type(instance))
+        with CaptureQueriesContext(connection) as captured:
+            (save or instance.save)()
+        updates = [query["sql"] for query in captured.captured_queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        clause = updates[0].split(" SET ", 1)[1].split(" WHERE ", 1)[0]
+        return re.sub(r'"updated_at" = [^,]+', '"updated_at" = ?', clause), calls
+
+    def test_single_field_change_sets_only_that_column(self):
+        inventory = Inventory.objects.get(pk=self.inventory.pk)
+        inventory.quantity_available = 5
+        clause, _ = self.saved(inventory)
+
+        self.assertEqual(
+            clause,
+            '"quantity_available" = 5, "updated_at" = ?, "version" = ("inventory_inventory"."version" + 1)',
+        )
+
+    def test_clean_save_still_sends_post_save_and_moves_updated_at(self):
+        organization = Organization.objects.get(pk=self.organization.pk)
+        loaded_at = organization.updated_at
+        clause, calls = self.saved(organization)
+
+        self.assertEqual(clause, '"updated_at" = ?')
+        self.assertEqual(calls, [False])
+        organization.refresh_from_db()
+        self.assertGreater(organization.updated_at, loaded_at)
+
+    def test_update_status_without_a_change_still_saves(self):
+        inventory = Inventory.objects.get(pk=self.inventory.pk)
+        clause, calls = self.saved(inventory, inventory.update_status)
+
+        self.assertEqual(clause, '"updated_at" = ?, "version" = ("inventory_inventory"."version" + 1)')
+        self.assertEqual(calls, [False])
+        self.assertEqual(Inventory.objects.get(pk=self.inventory.pk).version, 2)
+
+
+class VersionedModelTests(TransactionTestCase):
+    """Autocommit, as in production: each writer's save commits on its own"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            "admin@example.com", "Admin", "pw", role="admin", is_superuser=True
+        )
+        organization = Organization.objects.create(name="North Trust")
+        self.item = Item.objects.create(name="Glove", sku="GLV-001", organization=organization)
+
+    def test_second_of_two_interleaved_saves_is_refused(self):
+        first, second = Item.objects.get(pk=self.item.pk), Item.objects.get(pk=self.item.pk)
+        first.name = "Nitrile glove"
+        first.save()
+        second.description = "Box of 100"
+        with self.assertRaises(ConcurrentUpdateError):
+            second.save()
+
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.name, self.item.description, self.item.version), ("Nitrile glove", "", 2))
+
+        second.refresh_from_db()
+        second.description = "Box of 100"
+        second.save()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.name, self.item.description, self.item.version), ("Nitrile glove", "Box of 100", 3))
+
+    def test_interleaved_api_write_is_a_conflict(self):
+        real_get_object = inventory_views.ItemViewSet.get_object
+
+        def get_object_then_competitor(view):
+            # Another writer commits after this request loaded the item
+            item = real_get_object(view)
+            competitor = Item.objects.get(pk=item.pk)
+            competitor.name = "Nitrile glove"
+            competitor.save()
+            return item
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(inventory_views.ItemViewSet, "get_object", get_object_then_competitor):
+            response = client.patch(f"/api/store/items/{self.item.pk}/", {"description": "Box of 100"}, format="json")
+
+        self.assertEqual(response.status_code, 409)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.name, self.item.description, self.item.version), ("Nitrile glove", "", 2))
+
+
+class VersionedModelHookCheckTests(SimpleTestCase):
+
+    def test_the_installed_signature_is_accepted(self):
+        self.assertEqual(checks.check_versioned_model_hook(None), [])
+
+    def test_a_changed_signature_is_rejected(self):
+        def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update, returning_fields):
+            pass
+
+        with mock.patch.object(models.Model, "_do_update", _do_update):
+            errors = checks.check_versioned_model_hook(None)
+        self.assertEqual([error.id for error in errors], ["core.E003"])
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    """backend.database reads its settings from the environment"""
+
+    POSTGRES_URL = "postgres://app:pw@db.internal:5432/nhs"
+
+    def config(self, url=POSTGRES_URL, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return database._connection_config(url)
+
+    def test_connection_reuse(self):
+        config = self.config()
+        self.assertEqual((config["CONN_MAX_AGE"], config["CONN_HEALTH_CHECKS"]), (60, True))
+        config = self.config(DB_CONN_MAX_AGE="none", DB_CONN_HEALTH_CHECKS="false")
+        self.assertEqual((config["CONN_MAX_AGE"], config["CONN_HEALTH_CHECKS"]), (None, False))
+        self.assertEqual(self.config(DB_CONN_MAX_AGE="0")["CONN_MAX_AGE"], 0)
+
+    def test_pool_replaces_persistent_connections(self):
+        with mock.patch.dict(sys.modules, {"psycopg": mock.Mock(), "psycopg_pool": mock.Mock()}):
+            config = self.config(DB_POOL="true", DB_POOL_MAX_SIZE="20", DB_POOL_TIMEOUT="5")
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertEqual(config["OPTIONS"]["pool"], {"min_size": 2, "max_size": 20, "timeout": 5.0})
+
+    def test_pool_without_psycopg_3_is_a_configuration_error(self):
+        with mock.patch.dict(sys.modules, {"psycopg": None}):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'pip install "psycopg[pool]"'):
+                self.config(DB_POOL="true")
+
+    def test_pool_is_rejected_on_other_backends(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "only supported with PostgreSQL"):
+            self.config("sqlite:////tmp/nhs.sqlite3", DB_POOL="true")
+
+    def test_sqlite_tuning_is_opt_in(self):
+        self.assertNotIn("init_command", self.config("sqlite:////tmp/nhs.sqlite3").get("OPTIONS", {}))
+        options = self.config("sqlite:////tmp/nhs.sqlite3", SQLITE_TUNING="true", SQLITE_BUSY_TIMEOUT="5")["OPTIONS"]
+        self.assertEqual((options["transaction_mode"], options["timeout"]), ("IMMEDIATE", 5.0))
+
+    def test_sqlite_tuning_applies_to_new_connections(self):
+        directory = tempfile.mkdtemp(prefix="nhs-sqlite-tests-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "tuned.sqlite3")
+        config = connections.configure_settings({
+            "default": connections.settings["default"],
+            "tuned": self.config(f"sqlite:///{path}", SQLITE_TUNING="true", SQLITE_CACHE_SIZE="1024"),
+        })["tuned"]
+        # Registered directly rather than through DATABASES, which is fixed for the test run
+        tuned = connections["tuned"] = DatabaseWrapper(config, "tuned")
+        self.addCleanup(connections.__delitem__, "tuned")
+        self.addCleanup(tuned.close)
+
+        with tuned.cursor() as cursor:
+            pragmas = {}
+            for pragma in ("journal_mode", "synchronous", "cache_size", "temp_store"):
+                cursor.execute(f"PRAGMA {pragma}")
+                pragmas[pragma] = cursor.fetchone()[0]
+        # synchronous 1 is NORMAL, temp_store 2 is MEMORY
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "cache_size": -1024, "temp_store": 2})
+
+        # BEGIN IMMEDIATE holds the write lock from the start of the block, before anything is written
+        other = sqlite3.connect(path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using="tuned"):
+            with self.assertRaisesMessage(sqlite3.OperationalError, "database is locked"):
+                other.execute("BEGIN IMMEDIATE")
+
+    def test_replicas_are_numbered_and_mirror_the_primary_in_tests(self):
+        urls = f"{self.POSTGRES_URL}, , postgres://app:pw@replica.internal:5432/nhs"
+        with mock.patch.dict(os.environ, {"DATABASE_REPLICA_URLS": urls}):
+            replicas = database.replica_configs()
+        self.assertEqual(list(replicas), ["replica_1", "replica_2"])
+        self.assertEqual(replicas["replica_2"]["HOST"], "replica.internal")
+        self.assertEqual(replicas["replica_2"]["TEST"], {"MIRROR": "default"})
+
+
+@mock.patch("core.routers.replica_aliases", return_value=["replica_1"])
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_a_replica_only_inside_replica_reads(self, aliases):
+        self.assertEqual(self.router.db_for_read(Item), "default")
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Item), "replica_1")
+            with replica_reads(enabled=False):
+                self.assertEqual(self.router.db_for_read(Item), "default")
+
+    def test_reads_inside_a_primary_transaction_stay_on_the_primary(self, aliases):
+        with replica_reads(), mock.patch.object(connection, "in_atomic_block", True):
+            self.assertEqual(self.router.db_for_read(Item), "default")
+
+    def test_without_replicas_reads_use_the_primary(self, aliases):
+        aliases.return_value = []
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Item), "default")
+
+    def test_writes_and_migrations_use_the_primary(self, aliases):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Item), "default")
+        self.assertIs(self.router.allow_migrate("replica_1", "inventory"), False)
+        self.assertIsNone(self.router.allow_migrate("default", "inventory"))
+
+
+@override_settings(
+    REPLICA_STICKY_SECONDS=60,
+    REPLICA_STICKY_CACHE="sticky",
+    CACHES={
+        **settings.CACHES,
+        "sticky": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "replica-tests-sticky"},
+    },
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The primary is the test database; "replica_1" is a second SQLite file
+    copied from it in setUp, which never receives the writes made afterwards.
+    """
+
+    def setUp(self):
+        caches["sticky"].clear()
+        caches[cache.SHARED_CACHE].clear()
+        organization = Organization.objects.create(name="North Trust")
+        department = Department.objects.create(name="Ward 1", organization=organization)
+        store = Store.objects.create(name="Main", organization=organization, department=department)
+        item = Item.objects.create(name="Glove", sku="GLV-001", organization=organization)
+        self.inventory = Inventory.objects.create(item=item, store=store, quantity_available=10)
+        self.writer, self.reader = (
+            CustomUser.objects.create_user(
+                f"{role}@example.com", role.title(), "pw", role="store_manager",
+                organization=organization, department=department,
+            )
+            for role in ("writer", "reader")
+        )
+
+        directory = tempfile.mkdtemp(prefix="nhs-replica-tests-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        replica = sqlite3.connect(os.path.join(directory, "replica.sqlite3"))
+        connection.ensure_connection()
+        connection.connection.backup(replica)
+        replica.close()
+
+        config = connections.configure_settings({
+            "default": connections.settings["default"],
+            "replica_1": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(directory, "replica.sqlite3")},
+        })["replica_1"]
+        # Registered directly rather than through DATABASES, which is fixed for the test run
+        connections["replica_1"] = DatabaseWrapper(config, "replica_1")
+        self.addCleanup(connections.__delitem__, "replica_1")
+        self.addCleanup(connections["replica_1"].close)
+        for patcher in (
+            mock.patch("core.routers.replica_aliases", return_value=["replica_1"]),
+            mock.patch("core.middleware.replica_aliases", return_value=["replica_1"]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def quantity(self, client):
+        return client.get(f"/api/store/inventories/{self.inventory.pk}/").json()["quantity_available"]
+
+    def stock_in(self, client):
+        response = client.post("/api/store/inventory-movements/", {
+            "inventory": str(self.inventory.pk), "movement_type": "stock_in", "quantity": 5,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_writer_reads_its_write_from_the_primary_others_from_the_replica(self):
+        writer, reader = self.client_for(self.writer), self.client_for(self.reader)
+        self.assertEqual(self.quantity(writer), 10)
+
+        self.stock_in(writer)
+
+        self.assertEqual(self.quantity(writer), 15)
+        self.assertEqual(self.quantity(reader), 10)
+
+    def test_sticky_flag_lives_in_the_configured_cache(self):
+        writer = self.client_for(self.writer)
+        self.stock_in(writer)
+        self.assertEqual(self.quantity(writer), 15)
+
+        # A worker that cannot see the flag sends the writer to the stale replica
+        caches["sticky"].clear()
+        self.assertEqual(self.quantity(writer), 10)
+
+    def test_token_is_validated_once_per_request(self):
+        writer = self.client_for(self.writer)
+        with mock.patch.object(
+            JWTAuthentication, "get_validated_token", autospec=True,
+            side_effect=JWTAuthentication.get_validated_token,
+        ) as validate:
+            self.assertEqual(writer.get(f"/api/store/inventories/{self.inventory.pk}/").status_code, 200)
+            self.assertEqual(writer.get("/api/store/async/inventories/summary/").status_code, 200)
+        self.assertEqual(validate.call_count, 2)
+
+
+@mock.patch.object(checks, "replica_aliases", return_value=["replica_1"])
+class ReplicaStickyCacheCheckTests(SimpleTestCase):
+
+    def errors(self, backend, alias="default"):
+        with override_settings(REPLICA_STICKY_CACHE=alias, CACHES={"default": {"BACKEND": backend}}):
+            return [error.id for error in checks.check_replica_sticky_cache(None)]
+
+    def test_per_process_cache_is_rejected(self, aliases):
+        self.assertEqual(self.errors("django.core.cache.backends.locmem.LocMemCache"), ["core.E002"])
+
+    def test_shared_cache_is_accepted(self, aliases):
+        self.assertEqual(self.errors("django.core.cache.backends.redis.RedisCache"), [])
+
+    def test_unknown_alias_is_rejected(self, aliases):
+        self.assertEqual(self.errors("django.core.cache.backends.redis.RedisCache", alias="sticky"), ["core.E001"])
+
+    def test_without_replicas_nothing_is_required(self, aliases):
+        aliases.return_value = []
+        self.assertEqual(self.errors("django.core.cache.backends.locmem.LocMemCache"), [])
+
+
+class ProfileStartupTests(SimpleTestCase):
+    """profile_startup times real cold starts, with the API docs apps on or off"""
+
+    def profile(self, target="urls", **environ):
+        out = io.StringIO()
+        with mock.patch.dict(os.environ, environ):
+            call_command("profile_startup", target=target, repeat=1, top=1000, stdout=out)
+        return out.getvalue()
+
+    def package_lines(self, output):
+        section = output.split("Import time per app/package")[1].split("Slowest modules")[0]
+        return {line.split()[1]: line for line in section.splitlines()[1:] if line.strip()}
+
+    def test_reports_import_time_per_app_and_module(self):
+        output = self.profile(API_DOCS_ENABLED="False")
+        self.assertRegex(output, r"^urls: median \d+ms over 1 cold starts \(min \d+ms\), \d+ modules imported")
+        packages = self.package_lines(output)
+        for app in ("core", "inventory", "services", "analytics", "org", "users"):
+            self.assertTrue(packages[app].endswith(f"{app}  *"))
+        self.assertRegex(packages["rest_framework"], r"^\s+\d+\.\dms  rest_framework  \*$")
+        self.assertNotIn("drf_spectacular", packages)
+        self.assertRegex(output.split("Slowest modules (self / cumulative):")[1], r"\d+\.\dms\s+\d+\.\dms  inventory\.")
+
+    @skipUnless(importlib.util.find_spec("drf_spectacular"), "drf_spectacular is not installed")
+    def test_docs_apps_are_reported_when_enabled(self):
+        packages = self.package_lines(self.profile(API_DOCS_ENABLED="True"))
+        self.assertTrue(packages["drf_spectacular"].endswith("drf_spectacular  *"))
+
+    def test_a_failing_start_is_a_command_error(self):
+        with self.assertRaisesMessage(CommandError, "No module named 'missing_settings'"):
+            self.profile(target="setup", DJANGO_SETTINGS_MODULE="missing_settings")
+
+
+@mock.patch.object(schema, "_schema_files", return_value=(b"{}", b"gzipped"))
+class SchemaViewTests(SimpleTestCase):
+
+    def get(self, accept_encoding):
+        return schema.schema_view(RequestFactory().get("/api/schema/", HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_gzip_is_served_only_when_accepted(self, files):
+        for header, gzipped in [
+            ("gzip, deflate", True),
+            ("br;q=1.0, gzip;q=0.5", True),
+            ("*", True),
+            ("gzip;q=0", False),
+            ("gzip;q=0, *;q=1", False),
+            ("identity", False),
+            ("", False),
+        ]:
+            with self.subTest(header=header):
+                response = self.get(header)
+                self.assertEqual(response.get("Content-Encoding") == "gzip", gzipped)
+                self.assertEqual(response.content, b"gzipped" if gzipped else b"{}")
+
+    def test_code_version_only_reads_project_packages(self, files):
+        schema.code_version.cache_clear()
+        self.addCleanup(schema.code_version.cache_clear)
+        with mock.patch.dict(os.environ, {"APP_VERSION": ""}), \
+                mock.patch.object(schema.os, "walk", wraps=os.walk) as walk:
+            schema.code_version()
+
+        walked = [call.args[0] for call in walk.call_args_list]
+        self.assertIn(os.path.join(settings.BASE_DIR, "inventory"), walked)
+        self.assertNotIn(settings.BASE_DIR, walked)
+        self.assertNotIn(str(settings.BASE_DIR), walked)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_output_is_byte_identical(self):
+        utc = datetime.timezone.utc
+        self.assertRendersLikeDRF({
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "created_at": datetime.datetime(2026, 10, 19, 8, 30, 15, 123456, tzinfo=utc),
+            "whole_second": datetime.datetime(2026, 10, 19, 8, 30, 15, tzinfo=utc),
+            "offset": datetime.datetime(2026, 10, 19, 8, 30, 15, 999999, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+            "naive": datetime.datetime(2026, 10, 19, 8, 30, 15, 500),
+            "day": datetime.date(2026, 10, 19),
+            "at": datetime.time(8, 30, 15, 123456),
+            "price": Decimal("12.50"),
+            "nested": [{"note": "line\u2028separator", "missing": None, "ratio": 0.25}],
+        })
+
+    def test_non_finite_numbers_are_refused_like_drf(self):
+        for value in (float("nan"), float("inf"), -float("inf"), Decimal("NaN")):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render({"results": [{"ratio": value, "other": None}]})
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render(value)
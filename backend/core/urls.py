@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import CacheStatsView, EventTicketView
+
+urlpatterns = [
+    path("cache/stats/", CacheStatsView.as_view(), name="cache-stats"),
+    path("events/ticket/", EventTicketView.as_view(), name="event-ticket"),
+]
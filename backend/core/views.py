@@ -0,0 +1,37 @@
+from django.conf import settings
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import cache, streams
+
+
+class IsAdministrator(permissions.BasePermission):
+    """Only superusers and admin role users"""
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (
+            request.user.is_superuser or request.user.role == 'admin'
+        )
+
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of the response cache for this worker process"""
+    permission_classes = [permissions.IsAuthenticated, IsAdministrator]
+
+    def get(self, request):
+        return Response(cache.stats.snapshot())
+
+    def delete(self, request):
+        cache.stats.reset()
+        return Response(cache.stats.snapshot())
+
+
+class EventTicketView(APIView):
+    """Single-use ticket for opening the event stream, which cannot send an Authorization header"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            "ticket": streams.issue_ticket(request.user),
+            "expires_in": settings.EVENTS_TICKET_SECONDS,
+        })
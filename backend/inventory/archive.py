@@ -0,0 +1,288 @@
+"""
+Movement ledger archiving.
+
+``archive_movements`` moves InventoryMovement rows created before a cutoff
+into ArchivedMovement, one chunk per short transaction: the chunk is copied,
+its net effect is added to each row's MovementCheckpoint and it is deleted
+from the hot table. Locks are held for one chunk at a time, so postings
+carry on while a large backlog is archived, and an interrupted run simply
+resumes where it stopped.
+
+Movements are archived oldest first and new movements are always stamped
+with the current time, so every archived movement of an inventory row is
+older than every hot one. ``MovementLedger`` relies on that to read both
+tiers as one ordered sequence, and ``LedgerCursorPagination`` pages through
+it by keyset, so a deep page costs no more than the first.
+"""
+import heapq
+import json
+from datetime import timedelta
+from functools import cmp_to_key
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.utils.urls import remove_query_param
+
+from .models import ArchivedMovement, InventoryMovement, MovementCheckpoint
+from .stock import net_effects
+
+ARCHIVED_FIELDS = [field.attname for field in ArchivedMovement._meta.concrete_fields]
+
+
+def retention_cutoff(days=None):
+    """Movements created before this are due for the archive"""
+    if days is None:
+        days = settings.MOVEMENT_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def _fold_into_checkpoints(chunk):
+    effects = net_effects(chunk)
+    counts, latest = {}, {}
+    for movement in chunk:
+        counts[movement.inventory_id] = counts.get(movement.inventory_id, 0) + 1
+        latest[movement.inventory_id] = max(latest.get(movement.inventory_id, movement.created_at), movement.created_at)
+
+    checkpoints = MovementCheckpoint.objects.select_for_update().in_bulk(list(counts))
+    now = timezone.now()
+    updated, created = [], []
+    for inventory_id, count in counts.items():
+        available, reserved = effects.get(inventory_id, (0, 0))
+        checkpoint = checkpoints.get(inventory_id)
+        if checkpoint is None:
+            created.append(MovementCheckpoint(
+                inventory_id=inventory_id,
+                archived_until=latest[inventory_id],
+                quantity_available=available,
+                reserved_quantity=reserved,
+                movement_count=count,
+            ))
+            continue
+        checkpoint.archived_until = max(checkpoint.archived_until, latest[inventory_id])
+        checkpoint.quantity_available += available
+        checkpoint.reserved_quantity += reserved
+        checkpoint.movement_count += count
+        checkpoint.updated_at = now
+        updated.append(checkpoint)
+
+    MovementCheckpoint.objects.bulk_create(created)
+    MovementCheckpoint.objects.bulk_update(
+        updated, ["archived_until", "quantity_available", "reserved_quantity", "movement_count", "updated_at"]
+    )
+
+
+def archive_chunk(before, chunk_size):
+    """Archive up to ``chunk_size`` of the oldest movements created before ``before``; returns how many"""
+    with transaction.atomic():
+        chunk = list(
+            InventoryMovement.objects.select_for_update()
+            .filter(created_at__lt=before)
+            .order_by("created_at", "pk")[:chunk_size]
+        )
+        if not chunk:
+            return 0
+
+        ArchivedMovement.objects.bulk_create(
+            [ArchivedMovement(**{name: getattr(movement, name) for name in ARCHIVED_FIELDS}) for movement in chunk],
+            batch_size=chunk_size,
+        )
+        _fold_into_checkpoints(chunk)
+        InventoryMovement.objects.filter(pk__in=[movement.pk for movement in chunk]).delete()
+    return len(chunk)
+
+
+def archive_movements(before, chunk_size=None, max_chunks=None, on_chunk=None):
+    """Archive every movement created before ``before``, chunk by chunk; returns the total"""
+    chunk_size = chunk_size or settings.MOVEMENT_ARCHIVE_CHUNK_SIZE
+    total = chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        archived = archive_chunk(before, chunk_size)
+        if not archived:
+            break
+        total += archived
+        chunks += 1
+        if on_chunk is not None:
+            on_chunk(chunks, total)
+    return total
+
+
+def _compare(ordering):
+    fields = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+
+    def compare(left, right):
+        for name, descending in fields:
+            a, b = getattr(left, name), getattr(right, name)
+            if a == b:
+                continue
+            first = a > b if descending else a < b
+            return -1 if first else 1
+        return 0
+
+    return cmp_to_key(compare)
+
+
+def _flip(name):
+    return name[1:] if name.startswith("-") else f"-{name}"
+
+
+def _after(queryset, ordering, position):
+    """The rows of ``queryset`` strictly after ``position`` in ``ordering``"""
+    keyset, equal = Q(), Q()
+    for name, value in zip(ordering, position):
+        field = name.lstrip("-")
+        lookup = "lt" if name.startswith("-") else "gt"
+        keyset |= equal & Q(**{f"{field}__{lookup}": value})
+        equal &= Q(**{field: value})
+    return queryset.filter(keyset)
+
+
+class MovementLedger:
+    """
+    Hot and archived movements as one ordered, sliceable sequence, which is
+    all Django's Paginator (and so DRF pagination) needs.
+
+    ``hot`` and ``archived`` must be filtered alike. The ordering always ends
+    with pk, so rows that tie on the requested fields keep a stable order.
+    Ordered by creation time, a slice is read from the hot table alone until
+    it runs out; other orderings merge the first ``stop`` rows of both tiers,
+    so ``page`` (a keyset read of ``size`` rows per tier) is the way to walk
+    them.
+    """
+    ordered = True
+
+    def __init__(self, hot, archived):
+        self.ordering = [str(name) for name in hot.query.order_by] or ["-created_at"]
+        if self.ordering[-1].lstrip("-") not in ("pk", "id"):
+            self.ordering.append("pk")
+        self.hot = hot.order_by(*self.ordering)
+        self.archived = archived.order_by(*self.ordering)
+        self._counts = None
+    def _tier_counts(self):
+        if self._counts is None:
+            self._counts = (self.hot.count(), self.archived.count())
+        return self._counts
+
+    def count(self):
+        return sum(self._tier_counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            rows = self[index:index + 1]
+            if not rows:
+                raise IndexError(index)
+            return rows[0]
+
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            stop = self.count()
+        if stop <= start:
+            return []
+
+        if self.ordering[0].lstrip("-") == "created_at":
+            # Archived movements are all older than hot ones
+            first, second = (self.hot, self.archived) if self.ordering[0].startswith("-") else (self.archived, self.hot)
+            first_count = self._tier_counts()[0 if first is self.hot else 1]
+            rows = list(first[start:stop]) if start < first_count else []
+            if stop > first_count:
+                rows += list(second[max(start - first_count, 0):stop - first_count])
+            return rows
+
+        merged = heapq.merge(self.hot[:stop], self.archived[:stop], key=_compare(self.ordering))
+        return list(merged)[start:stop]
+
+    def _fields(self):
+        opts = self.hot.model._meta
+        return [opts.pk if name.lstrip("-") == "pk" else opts.get_field(name.lstrip("-")) for name in self.ordering]
+
+    def position(self, movement):
+        """The keyset position of ``movement``, as text"""
+        return json.dumps([field.value_to_string(movement) for field in self._fields()])
+
+    def parse_position(self, text):
+        """The values of a position made by ``position``; ValueError when malformed"""
+        values = json.loads(text)
+        fields = self._fields()
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError(text)
+        try:
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except ValidationError as error:
+            raise ValueError(text) from error
+
+    def page(self, after=None, size=None, reverse=False):
+        """
+        Up to ``size`` rows following the position ``after`` (from the start
+        when None); ``reverse`` walks backwards and returns the rows nearest
+        ``after`` first.
+        """
+        ordering = [_flip(name) for name in self.ordering] if reverse else self.ordering
+        hot, archived = self.hot.order_by(*ordering), self.archived.order_by(*ordering)
+        if after is not None:
+            hot, archived = _after(hot, ordering, after), _after(archived, ordering, after)
+
+        if ordering[0].lstrip("-") == "created_at":
+            first, second = (hot, archived) if ordering[0].startswith("-") else (archived, hot)
+            rows = list(first[:size])
+            if len(rows) < size:
+                rows += list(second[:size - len(rows)])
+            return rows
+
+        return list(heapq.merge(hot[:size], archived[:size], key=_compare(ordering)))[:size]
+
+
+class LedgerCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a MovementLedger. The cursor holds the position
+    of the last row served, so each page is one keyset read per tier.
+    """
+
+    def paginate_queryset(self, ledger, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.ledger = ledger
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        after = None
+        if self.cursor is not None and self.cursor.position is not None:
+            try:
+                after = ledger.parse_position(self.cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = ledger.page(after, self.page_size + 1, reverse)
+        more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = after is not None, more
+        else:
+            self.has_next, self.has_previous = more, after is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Walked back past the first row: start over
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.ledger.position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.ledger.position(self.page[0])))
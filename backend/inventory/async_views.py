@@ -0,0 +1,82 @@
+"""
+Async variants of the inventory dashboard reads, for serving under ASGI.
+
+Each mirrors an InventoryViewSet/StockAlertViewSet endpoint (same scoping,
+same response body) but awaits the database instead of holding a worker.
+"""
+from django.db.models import Count, Q, Sum
+
+from core.async_views import api_view, fetch, paginate
+
+from .models import Inventory, StockAlert
+from .serializers import InventorySerializer, StockAlertSerializer
+
+INVENTORY_RELATIONS = ("item__organization", "store__organization", "store__department")
+
+ALERT_FILTERS = ("alert_type", "severity")
+ALERT_ORDERINGS = {"created_at", "-created_at", "severity", "-severity"}
+
+
+def scoped_inventories(user):
+    """Multi-org isolation, as in InventoryViewSet.get_queryset"""
+    queryset = Inventory.objects.select_related(*INVENTORY_RELATIONS)
+    if user.is_superuser or user.role == 'admin':
+        return queryset
+    if user.organization_id:
+        return queryset.filter(item__organization_id=user.organization_id)
+    return Inventory.objects.none()
+
+
+async def _inventories_with_status(request, stock_status):
+    queryset = scoped_inventories(request.user).filter(status=stock_status).order_by('item__name')
+    return InventorySerializer(await fetch(queryset), many=True).data
+
+
+@api_view
+async def inventory_summary(request):
+    """Same figures as InventoryViewSet.summary, from one aggregate query"""
+    totals = await scoped_inventories(request.user).aaggregate(
+        total_items=Count('pk'),
+        total_quantity=Sum('quantity_available'),
+        total_reserved=Sum('reserved_quantity'),
+        low_stock_count=Count('pk', filter=Q(status='low_stock')),
+        out_of_stock_count=Count('pk', filter=Q(status='out_of_stock')),
+        stores_count=Count('store', distinct=True),
+        categories_count=Count('item__category', distinct=True),
+    )
+    totals['total_quantity'] = totals['total_quantity'] or 0
+    totals['total_reserved'] = totals['total_reserved'] or 0
+    return totals
+
+
+@api_view
+async def low_stock(request):
+    return await _inventories_with_status(request, 'low_stock')
+
+
+@api_view
+async def out_of_stock(request):
+    return await _inventories_with_status(request, 'out_of_stock')
+
+
+@api_view
+async def stock_alerts(request):
+    """Open alerts, paginated like StockAlertViewSet.list"""
+    user = request.user
+    queryset = StockAlert.objects.filter(is_resolved=False).select_related(
+        'resolved_by', *(f'inventory__{relation}' for relation in INVENTORY_RELATIONS)
+    )
+    if user.is_superuser or user.role == 'admin':
+        pass
+    elif user.organization_id:
+        queryset = queryset.filter(inventory__item__organization_id=user.organization_id)
+    else:
+        queryset = queryset.none()
+
+    for name in ALERT_FILTERS:
+        if request.GET.get(name):
+            queryset = queryset.filter(**{name: request.GET[name]})
+    ordering = request.GET.get('ordering')
+    queryset = queryset.order_by(ordering if ordering in ALERT_ORDERINGS else '-created_at')
+
+    return await paginate(request, queryset, StockAlertSerializer)
@@ -0,0 +1,230 @@
+"""
+In-process prefix index for item type-ahead.
+
+Each organization gets a sorted list of lowercase keys (every word of the item
+name plus the SKU) searched with ``bisect``. Indexes are built lazily in a
+background thread; until one is ready, lookups are answered from the database.
+A loaded index is brought up to date from ``updated_at`` at most every
+``AUTOCOMPLETE_REFRESH_SECONDS`` and fully reloaded every
+``AUTOCOMPLETE_RELOAD_SECONDS`` so hard deletes made by other processes drop out.
+"""
+import bisect
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+# Re-read rows this far behind the watermark, for transactions that committed late
+WATERMARK_OVERLAP = timedelta(seconds=2)
+# Bound on the keys examined per lookup, whatever the prefix
+MAX_SCAN = 500
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _keys(name, sku):
+    keys = {word for word in name.lower().split() if word}
+    if sku:
+        keys.add(sku.lower())
+    return keys
+
+
+class PrefixIndex:
+    """Sorted prefix index over the active items of one organization"""
+
+    def __init__(self, organization_id):
+        self.organization_id = organization_id
+        self.entries = []   # sorted (key, item_id) pairs
+        self.items = {}     # item_id -> (name, sku)
+        self.watermark = None
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+        self.lock = threading.RLock()
+
+    def _rows(self, since=None):
+        from .models import Item
+
+        rows = Item.objects.filter(organization_id=self.organization_id)
+        if since is None:
+            rows = rows.filter(is_active=True)
+        else:
+            rows = rows.filter(updated_at__gte=since - WATERMARK_OVERLAP)
+        return rows.values_list("id", "name", "sku", "is_active", "updated_at").iterator(chunk_size=5000)
+
+    def load(self):
+        entries = []
+        items = {}
+        watermark = None
+        for item_id, name, sku, is_active, updated_at in self._rows():
+            item_id = str(item_id)
+            items[item_id] = (name, sku)
+            entries.extend((key, item_id) for key in _keys(name, sku))
+            if watermark is None or updated_at > watermark:
+                watermark = updated_at
+        entries.sort()
+
+        with self.lock:
+            self.entries = entries
+            self.items = items
+            self.watermark = watermark
+            self.loaded_at = self.refreshed_at = time.monotonic()
+
+    def _remove(self, item_id):
+        name, sku = self.items.pop(item_id)
+        for key in _keys(name, sku):
+            position = bisect.bisect_left(self.entries, (key, item_id))
+            if position < len(self.entries) and self.entries[position] == (key, item_id):
+                del self.entries[position]
+
+    def _add(self, item_id, name, sku):
+        self.items[item_id] = (name, sku)
+        for key in _keys(name, sku):
+            bisect.insort(self.entries, (key, item_id))
+
+    def apply(self, item_id, name, sku, is_active):
+        item_id = str(item_id)
+        with self.lock:
+            current = self.items.get(item_id)
+            if is_active and current == (name, sku):
+                return
+            if current is not None:
+                self._remove(item_id)
+            if is_active:
+                self._add(item_id, name, sku)
+
+    def forget(self, item_id):
+        item_id = str(item_id)
+        with self.lock:
+            if item_id in self.items:
+                self._remove(item_id)
+
+    def refresh(self):
+        """Apply rows changed since the watermark; large batches reload instead"""
+        if self.watermark is None:
+            self.load()
+            return
+        rows = list(self._rows(since=self.watermark))
+        if len(rows) > _setting("AUTOCOMPLETE_MAX_INCREMENTAL_ROWS", 5000):
+            self.load()
+            return
+
+        watermark = self.watermark
+        for item_id, name, sku, is_active, updated_at in rows:
+            self.apply(item_id, name, sku, is_active)
+            watermark = max(watermark, updated_at)
+        with self.lock:
+            self.watermark = watermark
+            self.refreshed_at = time.monotonic()
+
+    def is_stale(self):
+        now = time.monotonic()
+        if now - self.loaded_at > _setting("AUTOCOMPLETE_RELOAD_SECONDS", 600):
+            return "reload"
+        if now - self.refreshed_at > _setting("AUTOCOMPLETE_REFRESH_SECONDS", 5):
+            return "refresh"
+        return None
+
+    def lookup(self, query, limit):
+        """
+        Top matches for a query: the first word is bisected, further words must
+        prefix-match some word of the name. Items whose name or SKU starts with
+        the query rank ahead of items matched on a later word.
+        """
+        words = query.lower().split()
+        if not words:
+            return []
+        first, rest = words[0], words[1:]
+
+        leading, inner = [], []
+        seen = set()
+        with self.lock:
+            position = bisect.bisect_left(self.entries, (first,))
+            end = min(position + MAX_SCAN, len(self.entries))
+            while position < end and len(leading) < limit:
+                key, item_id = self.entries[position]
+                position += 1
+                if not key.startswith(first):
+                    break
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+
+                name, sku = self.items[item_id]
+                lowered = name.lower()
+                if rest:
+                    name_words = lowered.split()
+                    if not all(any(word.startswith(part) for word in name_words) for part in rest):
+                        continue
+                match = {"id": item_id, "name": name, "sku": sku}
+                if lowered.startswith(first) or sku.lower().startswith(first):
+                    leading.append(match)
+                else:
+                    inner.append(match)
+
+        return (leading + inner)[:limit]
+
+
+_indexes = {}
+_loading = set()
+_registry_lock = threading.Lock()
+
+
+def _load_in_background(index):
+    def run():
+        try:
+            index.load()
+            with _registry_lock:
+                _indexes[index.organization_id] = index
+        finally:
+            with _registry_lock:
+                _loading.discard(index.organization_id)
+            connection.close()
+
+    threading.Thread(target=run, name=f"autocomplete-{index.organization_id}", daemon=True).start()
+
+
+def _database_lookup(queryset, query, limit):
+    if not query.strip():
+        return []
+    match = Q(name__istartswith=query) | Q(sku__istartswith=query)
+    rows = queryset.filter(match).order_by("name").values_list("id", "name", "sku")[:limit]
+    return [{"id": item_id, "name": name, "sku": sku} for item_id, name, sku in rows]
+
+
+def suggest(organization_id, query, limit, fallback_queryset):
+    """
+    Suggestions for an organization; answered from the database while the
+    organization's index is cold or loading.
+    """
+    with _registry_lock:
+        index = _indexes.get(organization_id)
+        reload = index is None or index.is_stale() == "reload"
+        if reload and organization_id not in _loading:
+            # A reload builds a fresh index; the current one keeps serving meanwhile
+            _loading.add(organization_id)
+            _load_in_background(PrefixIndex(organization_id))
+
+    if index is None:
+        return _database_lookup(fallback_queryset, query, limit), "database"
+
+    if index.is_stale() == "refresh":
+        index.refresh()
+    return index.lookup(query, limit), "index"
+
+
+def forget(organization_id, item_id):
+    """Drop a deleted item from this process's index"""
+    index = _indexes.get(organization_id)
+    if index is not None:
+        index.forget(item_id)
+
+
+def reset():
+    with _registry_lock:
+        _indexes.clear()
+        _loading.clear()
@@ -0,0 +1,184 @@
+"""
+Expiry sweep.
+
+Run daily. ``sweep_expiry`` handles one organization at a time with a fixed
+number of statements, however many rows are expiring:
+
+* one INSERT ... SELECT raises the near-expiry and expiry StockAlerts that are
+  not already open, with severity and message computed in SQL;
+* with ``write_off``, one INSERT ... SELECT posts a write_off movement for the
+  available quantity of every newly expired row, and ``movements_inserted``
+  hands the inserted rows to the ledger receivers as a queryset;
+* one UPDATE marks the newly expired rows as expired (and zeroes the written
+  off quantity).
+
+The ORM has no INSERT ... SELECT, so those two are raw SQL; the vendor-specific
+fragments (UUID generation, date arithmetic, row locking) are in VENDOR_SQL for
+the backends backend/database.py configures.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import events
+from org.models import Organization
+from users.models import CustomUser
+
+from .models import Inventory, InventoryMovement, Item, StockAlert, Store
+from .stock import movements_inserted
+
+NEAR_EXPIRY_DAYS = 30
+HIGH_SEVERITY_DAYS = 7
+
+VENDOR_SQL = {
+    "postgresql": {
+        # UUIDField is a native uuid column
+        "uuid": "gen_random_uuid()",
+        "date_text": "to_char(inv.expiry_date, 'YYYY-MM-DD')",
+        "days_left": "(inv.expiry_date - %s)",
+        "for_update": "FOR UPDATE OF inv",
+    },
+    "sqlite": {
+        # UUIDField is stored as 32 hex digits, dates as ISO text
+        "uuid": "lower(hex(randomblob(16)))",
+        "date_text": "inv.expiry_date",
+        "days_left": "CAST(julianday(inv.expiry_date) - julianday(%s) AS INTEGER)",
+        # Writers are serialized by the database lock the INSERT takes
+        "for_update": "",
+    },
+}
+
+ALERTS_SQL = """
+    INSERT INTO {alert} (id, inventory_id, alert_type, severity, message, is_resolved, created_at)
+    SELECT
+        {uuid}, inv.id, 'expiry',
+        CASE
+            WHEN inv.expiry_date < %s THEN 'critical'
+            WHEN inv.expiry_date <= %s THEN 'high'
+            ELSE 'medium'
+        END,
+        CASE
+            WHEN inv.expiry_date < %s
+                THEN item.name || ' at ' || store.name || ' expired on ' || {date_text}
+            ELSE item.name || ' at ' || store.name || ' expires on ' || {date_text}
+                || ' (' || CAST({days_left} AS TEXT) || ' days left)'
+        END,
+        %s, %s
+    FROM {inventory} inv
+    JOIN {item} item ON item.id = inv.item_id
+    JOIN {store} store ON store.id = inv.store_id
+    WHERE store.organization_id = %s
+      AND inv.expiry_date <= %s
+      AND inv.quantity_available > 0
+      AND NOT EXISTS (
+          SELECT 1 FROM {alert} open_alert
+          WHERE open_alert.inventory_id = inv.id
+            AND open_alert.alert_type = 'expiry'
+            AND open_alert.is_resolved = %s
+      )
+"""
+
+WRITE_OFFS_SQL = """
+    INSERT INTO {movement} (
+        id, inventory_id, movement_type, quantity, source_type, source_id,
+        performed_by_id, notes, created_at
+    )
+    SELECT {uuid}, inv.id, 'write_off', inv.quantity_available, 'stock_take', '', %s, %s, %s
+    FROM {inventory} inv
+    WHERE inv.store_id IN (SELECT id FROM {store} WHERE organization_id = %s)
+      AND inv.expiry_date < %s
+      AND inv.status <> 'expired'
+      AND inv.quantity_available > 0
+    {for_update}
+"""
+
+WRITE_OFF_NOTES = "Expired stock written off by expiry sweep"
+
+
+def _sql(template):
+    return template.format(
+        alert=StockAlert._meta.db_table,
+        inventory=Inventory._meta.db_table,
+        item=Item._meta.db_table,
+        movement=InventoryMovement._meta.db_table,
+        store=Store._meta.db_table,
+        **VENDOR_SQL[connection.vendor],
+    )
+
+
+def _execute(template, params):
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(template), params)
+        return cursor.rowcount
+
+
+def _pk(model, value):
+    return model._meta.pk.get_db_prep_value(value, connection)
+
+
+def _alert(org_id, today, near_days):
+    """Insert expiry alerts for stocked rows expiring within ``near_days`` that have none open"""
+    ops = connection.ops
+    return _execute(ALERTS_SQL, [
+        ops.adapt_datefield_value(today),
+        ops.adapt_datefield_value(today + timedelta(days=HIGH_SEVERITY_DAYS)),
+        ops.adapt_datefield_value(today),
+        ops.adapt_datefield_value(today),
+        False,
+        ops.adapt_datetimefield_value(timezone.now()),
+        _pk(Organization, org_id),
+        ops.adapt_datefield_value(today + timedelta(days=near_days)),
+        False,
+    ])
+
+
+def _expire(org_id, today, write_off, user):
+    """Flip the organization's newly expired rows; returns (expired, written_off)"""
+    expiring = Inventory.objects.filter(
+        store__organization_id=org_id, expiry_date__lt=today
+    ).exclude(status="expired")
+    changes = {"status": "expired", "updated_at": timezone.now(), "version": F("version") + 1}
+
+    with transaction.atomic():
+        written_off = 0
+        if write_off:
+            now = timezone.now()
+            written_off = _execute(WRITE_OFFS_SQL, [
+                _pk(CustomUser, user.pk) if user else None,
+                WRITE_OFF_NOTES,
+                connection.ops.adapt_datetimefield_value(now),
+                _pk(Organization, org_id),
+                connection.ops.adapt_datefield_value(today),
+            ])
+            changes["quantity_available"] = 0
+        expired = expiring.update(**changes)
+        if written_off:
+            movements_inserted.send(
+                sender=InventoryMovement,
+                movements=InventoryMovement.objects.filter(
+                    movement_type="write_off",
+                    created_at=now,
+                    inventory__store__organization_id=org_id,
+                ),
+            )
+    return expired, written_off
+
+
+def sweep_expiry(organization_id=None, near_days=NEAR_EXPIRY_DAYS, write_off=False, user=None):
+    """Run the sweep for one or every organization; returns per-organization counts"""
+    today = timezone.localdate()
+    organizations = Organization.objects.order_by("pk").values_list("pk", flat=True)
+    if organization_id:
+        organizations = organizations.filter(pk=organization_id)
+
+    results = {}
+    for org_id in organizations:
+        alerts = _alert(org_id, today, near_days)
+        if alerts:
+            # Inserted in SQL, so no post_save: dashboards get one summary event
+            events.publish_on_commit(org_id, "alerts.raised", {"alert_type": "expiry", "count": alerts})
+        expired, written_off = _expire(org_id, today, write_off, user)
+        results[org_id] = {"expired": expired, "alerts": alerts, "written_off": written_off}
+    return results
@@ -0,0 +1,313 @@
+"""
+Streaming CSV import for the item catalogue and vendor price lists.
+
+Rows are read lazily and processed in fixed-size chunks: each chunk is
+validated in memory, checked against the database with one query per lookup
+kind, and written with a single ``bulk_create(update_conflicts=True)`` upsert
+inside its own transaction. Memory use depends on the chunk size, not the file.
+A key repeated within a chunk is reported as an error; across chunks the later
+row simply wins, as with any upsert. Only the first ``MAX_REPORTED_ERRORS`` row errors are kept; the total count is
+always reported.
+
+A file that stops decoding (not UTF-8, e.g. a cp1252 spreadsheet export) or
+stops parsing as CSV is reported as an error on the row where reading
+stopped. The rows before it are imported.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F
+
+from core import cache
+from .models import Item, Store, VendorItem
+from .sourcing import refresh_price_index
+
+MAX_REPORTED_ERRORS = 100
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n"}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ChunkConflict(Exception):
+    """A concurrent import invalidated the chunk's checks; the chunk is rolled back and rebuilt"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def merge(self, other):
+        self.error_count += other.error_count - len(other.errors)
+        for error in other.errors:
+            self.add_error(error["row"], error["error"])
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def text_stream(uploaded_file):
+    """Decode an uploaded (binary) file lazily"""
+    return io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+
+
+def _text(row, column, max_length, required=False, default=""):
+    value = (row.get(column) or "").strip()
+    if not value:
+        if required:
+            raise RowError(f"{column} is required")
+        return default
+    if len(value) > max_length:
+        raise RowError(f"{column} must be at most {max_length} characters")
+    return value
+
+
+def _integer(row, column, default, minimum):
+    value = (row.get(column) or "").strip()
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise RowError(f"{column} must be a whole number")
+    if number < minimum:
+        raise RowError(f"{column} must be at least {minimum}")
+    return number
+
+
+def _boolean(row, column, default=True):
+    value = (row.get(column) or "").strip().lower()
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"{column} must be true or false")
+
+
+class CatalogueImporter:
+    """Base class: subclasses clean rows and upsert a validated chunk"""
+    required_columns = []
+
+    def __init__(self, organization, chunk_size=1000):
+        self.organization = organization
+        self.chunk_size = chunk_size
+
+    conflict_retries = 3
+
+    def run(self, stream):
+        result = ImportResult()
+        reader = csv.DictReader(stream)
+
+        # The last row read; row 1 is the header
+        row_number = 0
+        chunk = []
+        try:
+            missing = [column for column in self.required_columns if column not in (reader.fieldnames or [])]
+            if missing:
+                result.add_error(1, f"Missing columns: {', '.join(missing)}")
+                return result
+
+            row_number = 1
+            for row_number, row in enumerate(reader, start=2):
+                result.rows += 1
+                chunk.append((row_number, row))
+                if len(chunk) >= self.chunk_size:
+                    self._process(chunk, result)
+                    chunk = []
+        except UnicodeDecodeError:
+            result.add_error(row_number + 1, "File is not valid UTF-8; export it as CSV UTF-8 and import the rest again")
+        except csv.Error as error:
+            result.add_error(row_number + 1, f"File could not be read as CSV: {error}")
+        if chunk:
+            self._process(chunk, result)
+
+        self.finish()
+        return result
+
+    def _process(self, chunk, result):
+        cleaned = []
+        for row_number, row in chunk:
+            try:
+                if any("\x00" in str(value) for value in row.values() if value):
+                    raise RowError("Row contains NUL characters")
+                cleaned.append((row_number, self.clean_row(row)))
+            except RowError as error:
+                result.add_error(row_number, str(error))
+
+        for attempt in range(self.conflict_retries):
+            errors = ImportResult()
+            try:
+                with transaction.atomic():
+                    objects = self.build(cleaned, errors)
+                    if objects:
+                        self.upsert(objects)
+                break
+            except ChunkConflict:
+                if attempt == self.conflict_retries - 1:
+                    raise
+        result.merge(errors)
+        result.imported += len(objects)
+
+    def clean_row(self, row):
+        raise NotImplementedError
+
+    def build(self, cleaned, result):
+        raise NotImplementedError
+
+    def upsert(self, objects):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+class ItemImporter(CatalogueImporter):
+    """Columns: name, sku, description, category, unit_of_measure, is_active"""
+    required_columns = ["name", "sku"]
+
+    def clean_row(self, row):
+        return {
+            "name": _text(row, "name", 255, required=True),
+            "sku": _text(row, "sku", 50, required=True),
+            "description": (row.get("description") or "").strip(),
+            "category": _text(row, "category", 100),
+            "unit_of_measure": _text(row, "unit_of_measure", 20, default="units"),
+            "is_active": _boolean(row, "is_active"),
+        }
+
+    def build(self, cleaned, result):
+        # SKUs are unique across organizations; never take over another tenant's item
+        skus = [values["sku"] for _, values in cleaned]
+        foreign = set(
+            Item.objects.filter(sku__in=skus)
+            .exclude(organization=self.organization)
+            .values_list("sku", flat=True)
+        )
+
+        objects = []
+        seen = set()
+        for row_number, values in cleaned:
+            if values["sku"] in foreign:
+                result.add_error(row_number, f"SKU {values['sku']} belongs to another organization")
+            elif values["sku"] in seen:
+                result.add_error(row_number, f"Duplicate SKU {values['sku']} in file")
+            else:
+                seen.add(values["sku"])
+                objects.append(Item(organization=self.organization, **values))
+        return objects
+
+    def upsert(self, objects):
+        skus = [item.sku for item in objects]
+        # The upsert cannot increment a column, so bump existing rows first
+        Item.objects.filter(organization=self.organization, sku__in=skus).update(version=F("version") + 1)
+        Item.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=["sku"],
+            update_fields=["name", "description", "category", "unit_of_measure", "is_active", "updated_at"],
+        )
+        # Another tenant may have created one of these SKUs since build() checked. The upsert
+        # would then have rewritten its item. The rows are locked by now, so re-check them.
+        if Item.objects.filter(sku__in=skus).exclude(organization=self.organization).exists():
+            raise ChunkConflict()
+
+    def finish(self):
+        cache.invalidate(["items", "vendor_items"], self.organization.id)
+
+
+class VendorItemImporter(CatalogueImporter):
+    """Columns: vendor (store code), sku, price, currency, lead_time_days, minimum_order_quantity, is_active"""
+    required_columns = ["vendor", "sku"]
+
+    def clean_row(self, row):
+        price = (row.get("price") or "").strip()
+        if price:
+            try:
+                price = Decimal(price)
+            except InvalidOperation:
+                raise RowError("price must be a number")
+            if price < 0 or price >= Decimal("100000000"):
+                raise RowError("price must be between 0 and 99999999.99")
+            price = price.quantize(Decimal("0.01"))
+        else:
+            price = None
+
+        return {
+            "vendor": _text(row, "vendor", 20, required=True),
+            "sku": _text(row, "sku", 50, required=True),
+            "price": price,
+            "currency": _text(row, "currency", 3, default="GBP").upper(),
+            "lead_time_days": _integer(row, "lead_time_days", 7, minimum=0),
+            "minimum_order_quantity": _integer(row, "minimum_order_quantity", 1, minimum=1),
+            "is_active": _boolean(row, "is_active"),
+        }
+
+    def build(self, cleaned, result):
+        vendors = dict(
+            Store.objects.filter(
+                organization=self.organization,
+                store_type="vendor",
+                code__in={values["vendor"] for _, values in cleaned},
+            ).values_list("code", "id")
+        )
+        items = dict(
+            Item.objects.filter(
+                organization=self.organization,
+                sku__in={values["sku"] for _, values in cleaned},
+            ).values_list("sku", "id")
+        )
+
+        objects = []
+        seen = set()
+        for row_number, values in cleaned:
+            vendor_id = vendors.get(values["vendor"])
+            item_id = items.get(values["sku"])
+            if vendor_id is None:
+                result.add_error(row_number, "Unknown vendor code")
+            elif item_id is None:
+                result.add_error(row_number, "Unknown SKU")
+            elif (vendor_id, item_id) in seen:
+                result.add_error(row_number, "Duplicate vendor/SKU pair in file")
+            else:
+                seen.add((vendor_id, item_id))
+                fields = {name: value for name, value in values.items() if name not in ("vendor", "sku")}
+                objects.append(VendorItem(vendor_id=vendor_id, item_id=item_id, **fields))
+        return objects
+
+    def upsert(self, objects):
+        VendorItem.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=["vendor", "item"],
+            update_fields=["price", "currency", "lead_time_days", "minimum_order_quantity", "is_active", "updated_at"],
+        )
+        item_ids = [vendor_item.item_id for vendor_item in objects]
+        transaction.on_commit(lambda: refresh_price_index(item_ids))
+
+    def finish(self):
+        cache.invalidate("vendor_items", self.organization.id)
+
+
+IMPORTERS = {
+    "items": ItemImporter,
+    "vendor-items": VendorItemImporter,
+}
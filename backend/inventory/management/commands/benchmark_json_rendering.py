@@ -0,0 +1,101 @@
+import gzip
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.middleware import brotli
+from core.renderers import FastJSONRenderer, orjson
+from inventory.models import Inventory, Item, Store
+from inventory.serializers import InventorySerializer
+from org.models import Department, Organization
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Render an inventory export (nested InventorySerializer rows) with DRF's JSONRenderer and "
+        "with FastJSONRenderer, and compare CPU time and response size raw, gzipped and Brotli-compressed. "
+        "The synthetic rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed: FastJSONRenderer falls back to JSONRenderer."))
+        try:
+            with transaction.atomic():
+                data = self._export(options["rows"])
+                self._measure(data, options["repeat"])
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _export(self, rows):
+        suffix = uuid.uuid4().hex[:8]
+        organization = Organization.objects.create(name=f"Benchmark {suffix}")
+        department = Department.objects.create(name="Pharmacy", organization=organization)
+        store = Store.objects.create(name="Benchmark store", organization=organization, department=department)
+        items = Item.objects.bulk_create([
+            Item(
+                name=f"Item {n} {suffix}", sku=f"BM-{suffix}-{n:05d}", organization=organization,
+                category=f"Category {n % 12}", description="Synthetic benchmark item",
+            )
+            for n in range(rows)
+        ])
+        Inventory.objects.bulk_create([
+            Inventory(item=item, store=store, quantity_available=n % 300, minimum_quantity=20, location=f"Shelf {n % 40}")
+            for n, item in enumerate(items)
+        ])
+
+        queryset = Inventory.objects.filter(store=store).select_related(
+            "item__organization", "store__organization", "store__department"
+        )
+        started = time.process_time()
+        data = InventorySerializer(queryset, many=True).data
+        self.stdout.write(f"{rows} rows serialized in {(time.process_time() - started) * 1000:.1f}ms CPU (same for both renderers)")
+        return data
+
+    def _measure(self, data, repeat):
+        outputs = {}
+        for label, renderer in (("JSONRenderer", JSONRenderer()), ("FastJSONRenderer", FastJSONRenderer())):
+            started = time.process_time()
+            for _ in range(repeat):
+                content = renderer.render(data, "application/json", {})
+            cpu = (time.process_time() - started) / repeat
+            outputs[label] = content
+            self.stdout.write(f"  {label:17} render {cpu * 1000:7.2f}ms CPU  {len(content):>9,} bytes")
+
+        baseline, fast = outputs["JSONRenderer"], outputs["FastJSONRenderer"]
+        identical = "byte-identical" if baseline == fast else (
+            "same JSON" if json.loads(baseline) == json.loads(fast) else "DIFFERENT JSON"
+        )
+        self.stdout.write(f"  outputs: {identical}")
+
+        self.stdout.write("Bytes on the wire:")
+        self.stdout.write(f"  identity {len(fast):>9,}")
+        started = time.process_time()
+        compressed = gzip.compress(fast, compresslevel=6)
+        self.stdout.write(
+            f"  gzip     {len(compressed):>9,}  ({len(compressed) / len(fast):.1%}, "
+            f"{(time.process_time() - started) * 1000:.2f}ms CPU)"
+        )
+        if brotli is not None:
+            started = time.process_time()
+            compressed = brotli.compress(fast, quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self.stdout.write(
+                f"  br       {len(compressed):>9,}  ({len(compressed) / len(fast):.1%}, "
+                f"{(time.process_time() - started) * 1000:.2f}ms CPU)"
+            )
+        else:
+            self.stdout.write("  br       (brotli package not installed)")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Store
+from inventory.snapshots import backfill_snapshots, capture_snapshots
+
+
+class Command(BaseCommand):
+    help = "Snapshot today's stock levels for stores that have no snapshot yet today"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store", action="append", help="Only snapshot this store id (repeatable)")
+        parser.add_argument(
+            "--backfill-days", type=int, default=0,
+            help="Also derive missing end-of-day snapshots for this many past days"
+        )
+
+    def handle(self, *args, **options):
+        created = capture_snapshots(options["store"])
+        self.stdout.write(f"Captured {created} snapshots for today.")
+
+        if options["backfill_days"]:
+            stores = Store.objects.filter(inventories__isnull=False).distinct()
+            if options["store"]:
+                stores = stores.filter(pk__in=options["store"])
+            backfilled = sum(
+                backfill_snapshots(store_id, options["backfill_days"])
+                for store_id in stores.values_list("pk", flat=True)
+            )
+            self.stdout.write(f"Backfilled {backfilled} snapshots.")
+
+        self.stdout.write(self.style.SUCCESS("Stock snapshots up to date."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.procurement import generate_purchase_orders
+
+
+class Command(BaseCommand):
+    help = "Draft purchase orders for every low or out-of-stock inventory row, grouped per vendor"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", help="Only generate for this organization id")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        orders = generate_purchase_orders(options["organization"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Generated {len(orders)} purchase orders."))
@@ -0,0 +1,39 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importers import IMPORTERS
+from org.models import Organization
+
+
+class Command(BaseCommand):
+    help = "Stream a catalogue CSV (items or vendor price list) into an organization"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import")
+        parser.add_argument("--organization", required=True, help="Organization id or code")
+        parser.add_argument("--kind", choices=sorted(IMPORTERS), default="items")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        value = options["organization"]
+        organization = Organization.objects.filter(code=value).first()
+        if organization is None:
+            try:
+                organization = Organization.objects.filter(pk=uuid.UUID(value)).first()
+            except ValueError:
+                pass
+        if organization is None:
+            raise CommandError(f"Organization {options['organization']} not found")
+
+        importer = IMPORTERS[options["kind"]](organization, chunk_size=options["chunk_size"])
+        with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+            result = importer.run(stream)
+
+        for error in result.errors:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... and {result.error_count - len(result.errors)} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} of {result.rows} rows ({result.error_count} errors)."
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Item
+from inventory.sourcing import refresh_price_index
+
+
+class Command(BaseCommand):
+    help = "Recompute the best vendor offer index for every item"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", help="Only rebuild items of this organization id")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        items = Item.objects.order_by("pk")
+        if options["organization"]:
+            items = items.filter(organization_id=options["organization"])
+
+        chunk = []
+        total = 0
+        for item_id in items.values_list("pk", flat=True).iterator(chunk_size=options["chunk_size"]):
+            chunk.append(item_id)
+            if len(chunk) >= options["chunk_size"]:
+                refresh_price_index(chunk)
+                total += len(chunk)
+                chunk = []
+        refresh_price_index(chunk)
+        total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Price index rebuilt for {total} items."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from inventory.search import ensure_sqlite_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 catalogue index (PostgreSQL indexes maintain themselves)"
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            self.stdout.write("Nothing to do: search indexes are maintained by the database.")
+            return
+
+        ensure_sqlite_index(connection, rebuild=True)
+        self.stdout.write(self.style.SUCCESS("Catalogue search index rebuilt."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from inventory.expiry import NEAR_EXPIRY_DAYS, sweep_expiry
+
+
+class Command(BaseCommand):
+    help = "Mark expired inventory, raise near-expiry alerts and optionally write expired stock off"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", help="Only sweep this organization id")
+        parser.add_argument("--near-days", type=int, default=NEAR_EXPIRY_DAYS)
+        parser.add_argument("--write-off", action="store_true", help="Post write_off movements for expired stock")
+
+    def handle(self, *args, **options):
+        results = sweep_expiry(options["organization"], options["near_days"], options["write_off"])
+
+        totals = {"expired": 0, "alerts": 0, "written_off": 0}
+        for counts in results.values():
+            for key in totals:
+                totals[key] += counts[key]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Swept {len(results)} organizations: {totals['expired']} rows expired, "
+            f"{totals['alerts']} alerts raised, {totals['written_off']} write-offs posted."
+        ))
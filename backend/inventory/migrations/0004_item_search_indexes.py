@@ -0,0 +1,46 @@
+# Catalogue search indexes for PostgreSQL.
+#
+# SQLite gets an FTS5 table instead, installed by inventory.search after each
+# migrate run (table rebuilds on SQLite drop triggers, so it cannot live here).
+
+from django.db import migrations
+
+# Must match inventory.search.PG_DOCUMENT
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(sku, '') || ' ' || coalesce(description, ''))"
+)
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS inventory_item_search_idx ON inventory_item "
+    f"USING gin (({PG_DOCUMENT}))",
+    "CREATE INDEX IF NOT EXISTS inventory_item_name_trgm_idx ON inventory_item USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS inventory_item_sku_trgm_idx ON inventory_item USING gin (sku gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS inventory_item_search_idx",
+    "DROP INDEX IF EXISTS inventory_item_name_trgm_idx",
+    "DROP INDEX IF EXISTS inventory_item_sku_trgm_idx",
+]
+
+
+def run_postgres(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_stockalert_alter_inventory_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres(POSTGRES_FORWARD), run_postgres(POSTGRES_REVERSE)),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:21
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_item_search_indexes'),
+        ('org', '0003_alter_department_options_alter_organization_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorPriceIndex',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cheapest', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.vendoritem')),
+                ('fastest', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.vendoritem')),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='price_index', to='inventory.item')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_price_index', to='org.organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'item'], name='inventory_v_organiz_5c6d95_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:27
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_purchaseorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('taken_at', models.DateTimeField(help_text='Movements after this instant are not included')),
+                ('inventory_ids', models.JSONField(default=list)),
+                ('quantity_available', models.JSONField(default=list)),
+                ('reserved_quantity', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.store')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['store', 'taken_at'], name='inventory_s_store_i_252635_idx')],
+                'unique_together': {('store', 'day')},
+            },
+        ),
+    ]
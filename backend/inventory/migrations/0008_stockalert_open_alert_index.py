@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stocksnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(fields=['inventory', 'alert_type', 'is_resolved'], name='inventory_s_invento_39eee0_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stockalert_open_alert_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMovement',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('movement_type', models.CharField(choices=[('stock_in', 'Stock In'), ('stock_out', 'Stock Out'), ('reserve', 'Reserve'), ('release', 'Release'), ('adjustment', 'Adjustment'), ('transfer', 'Transfer'), ('write_off', 'Write Off')], max_length=20)),
+                ('quantity', models.PositiveIntegerField()),
+                ('source_type', models.CharField(choices=[('manual', 'Manual Entry'), ('requisition', 'Requisition'), ('purchase_order', 'Purchase Order'), ('transfer_order', 'Transfer Order'), ('stock_take', 'Stock Take')], default='manual', max_length=20)),
+                ('source_id', models.CharField(blank=True, max_length=50)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovementCheckpoint',
+            fields=[
+                ('inventory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='movement_checkpoint', serialize=False, to='inventory.inventory')),
+                ('archived_until', models.DateTimeField()),
+                ('quantity_available', models.IntegerField(default=0)),
+                ('reserved_quantity', models.IntegerField(default=0)),
+                ('movement_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='inventorymovement',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['created_at'], name='inventory_i_created_75a91c_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedmovement',
+            name='destination_store',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.store'),
+        ),
+        migrations.AddField(
+            model_name='archivedmovement',
+            name='inventory',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_movements', to='inventory.inventory'),
+        ),
+        migrations.AddField(
+            model_name='archivedmovement',
+            name='performed_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmovement',
+            index=models.Index(fields=['inventory', 'created_at'], name='inventory_a_invento_d8f832_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmovement',
+            index=models.Index(fields=['created_at'], name='inventory_a_created_29813b_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_versioned_rows'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stockalert',
+            name='inventory_s_invento_d8c58e_idx',
+        ),
+        migrations.AlterField(
+            model_name='inventorymovement',
+            name='inventory',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.inventory'),
+        ),
+        migrations.AlterField(
+            model_name='inventorymovement',
+            name='performed_by',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_movements', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='stockalert',
+            name='inventory',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='inventory.inventory'),
+        ),
+    ]
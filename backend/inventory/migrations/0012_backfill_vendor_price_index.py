@@ -0,0 +1,65 @@
+# Fill VendorPriceIndex for the offers that existed before it.
+#
+# 0005 created the index empty and only VendorItem saves fill it, so offers
+# entered earlier were invisible to best_sources, purchase order generation
+# and department spend until `manage.py rebuild_price_index` was run. The
+# ranking repeats inventory.sourcing as of this migration.
+
+from django.db import migrations
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+STRATEGIES = {
+    "cheapest": [F("price").asc(nulls_last=True), F("lead_time_days").asc(), F("minimum_order_quantity").asc()],
+    "fastest": [F("lead_time_days").asc(), F("price").asc(nulls_last=True), F("minimum_order_quantity").asc()],
+}
+BATCH_SIZE = 1000
+
+
+def backfill_price_index(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Item = apps.get_model("inventory", "Item")
+    VendorItem = apps.get_model("inventory", "VendorItem")
+    VendorPriceIndex = apps.get_model("inventory", "VendorPriceIndex")
+
+    offers = VendorItem.objects.using(db).filter(
+        is_active=True,
+        vendor__is_active=True,
+        vendor__organization_id=F("item__organization_id"),
+    )
+    best = {
+        strategy: dict(
+            offers.annotate(
+                source_rank=Window(RowNumber(), partition_by=[F("item_id")], order_by=ordering)
+            ).filter(source_rank=1).values_list("item_id", "id")
+        )
+        for strategy, ordering in STRATEGIES.items()
+    }
+
+    items = Item.objects.using(db).filter(pk__in=offers.values("item_id")).values_list("id", "organization_id")
+    VendorPriceIndex.objects.using(db).bulk_create(
+        [
+            VendorPriceIndex(
+                item_id=item_id,
+                organization_id=organization_id,
+                cheapest_id=best["cheapest"].get(item_id),
+                fastest_id=best["fastest"].get(item_id),
+            )
+            for item_id, organization_id in items.iterator(chunk_size=BATCH_SIZE)
+        ],
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["item"],
+        update_fields=["cheapest", "fastest", "updated_at"],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0011_drop_prefix_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_price_index, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.core.validators import MinValueValidator
+from core.models import ConcurrentUpdateError, VersionedModel
 from org.models import Organization, Department
 from users.models import CustomUser
 import uuid
@@ -8,7 +10,7 @@ import uuid
 # ----------------------------
 # Item / Product
 # ----------------------------
-class Item(models.Model):
+class Item(VersionedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     sku = models.CharField(max_length=50, unique=True)
@@ -121,7 +123,7 @@ class Store(models.Model):
 # ----------------------------
 # Inventory per Store
 # ----------------------------
-class Inventory(models.Model):
+class Inventory(VersionedModel):
     STATUS_CHOICES = [
         ('available', 'Available'),
         ('low_stock', 'Low Stock'),
@@ -186,15 +188,21 @@ class Inventory(models.Model):
     def needs_reorder(self):
         return self.quantity_available <= self.minimum_quantity
     
+    @property
+    def is_expired(self):
+        return self.expiry_date is not None and self.expiry_date < timezone.localdate()
+
     def update_status(self):
-        """Update inventory status based on quantity"""
-        if self.quantity_available <= 0:
+        """Update inventory status based on expiry and quantity, saving it with any other pending changes"""
+        if self.is_expired:
+            self.status = 'expired'
+        elif self.quantity_available <= 0:
             self.status = 'out_of_stock'
         elif self.quantity_available <= self.minimum_quantity:
             self.status = 'low_stock'
         else:
             self.status = 'available'
-        self.save(update_fields=['status'])
+        self.save()
 
 
 # ----------------------------
@@ -220,10 +228,12 @@ class InventoryMovement(models.Model):
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Served by the (inventory, created_at) index
     inventory = models.ForeignKey(
         Inventory, 
         on_delete=models.CASCADE, 
-        related_name="movements"
+        related_name="movements",
+        db_index=False,
     )
     
     # Movement details
@@ -235,11 +245,13 @@ class InventoryMovement(models.Model):
     source_id = models.CharField(max_length=50, blank=True)  # e.g., requisition ID, PO number
     
     # User who performed the action
+    # Served by the (performed_by, created_at) index
     performed_by = models.ForeignKey(
         CustomUser, 
         on_delete=models.SET_NULL, 
         null=True,
-        related_name="inventory_movements"
+        related_name="inventory_movements",
+        db_index=False,
     )
     
     # Destination store (for transfers)
@@ -258,11 +270,13 @@ class InventoryMovement(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        ordering = ['-created_at']
+        # No default ordering: readers order explicitly, so counts and
+        # aggregates over the ledger do not sort it
         indexes = [
             models.Index(fields=['inventory', 'created_at']),
             models.Index(fields=['movement_type', 'created_at']),
             models.Index(fields=['performed_by', 'created_at']),
+            models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
@@ -270,16 +284,27 @@ class InventoryMovement(models.Model):
     
     def save(self, *args, **kwargs):
         # Update inventory when movement is saved
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        if is_new:
-            self.update_inventory()
+        is_new = self._state.adding  # pk is pre-filled by the UUID default
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-    def update_inventory(self):
+            if is_new:
+                self.update_inventory()
+
+    def update_inventory(self, attempts=3):
+        """Apply the movement to its inventory row, reloading it when another writer changed it first"""
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    self._apply(self.inventory)
+                return
+            except ConcurrentUpdateError:
+                if attempt == attempts - 1:
+                    raise
+                self.inventory.refresh_from_db()
+
+    def _apply(self, inventory):
         """Update inventory quantities based on movement type"""
-        inventory = self.inventory
-        
         if self.movement_type == 'stock_in':
             inventory.quantity_available += self.quantity
         elif self.movement_type == 'stock_out':
@@ -292,6 +317,8 @@ class InventoryMovement(models.Model):
             if inventory.reserved_quantity >= self.quantity:
                 inventory.reserved_quantity -= self.quantity
                 inventory.quantity_available += self.quantity
+        elif self.movement_type == 'write_off':
+            inventory.quantity_available -= self.quantity
         elif self.movement_type == 'adjustment':
             # Could be positive or negative adjustment
             # For simplicity, treat as stock_in if positive, stock_out if negative
@@ -302,11 +329,81 @@ class InventoryMovement(models.Model):
             if self.destination_store:
                 # This would create another movement in the destination store
                 pass
-        
-        inventory.save()
+
+        # Saves the new quantities and status in one UPDATE of the changed columns
         inventory.update_status()
 
 
+# ----------------------------
+# Movement Archive
+# ----------------------------
+class ArchivedMovement(models.Model):
+    """An InventoryMovement moved out of the hot table by inventory.archive.
+
+    Same id and field names as InventoryMovement, so serializers, filters and
+    the snapshot replay read both tiers alike. Rows are copied as they were
+    and never touch Inventory again.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    inventory = models.ForeignKey(
+        Inventory,
+        on_delete=models.CASCADE,
+        related_name="archived_movements"
+    )
+    movement_type = models.CharField(max_length=20, choices=InventoryMovement.MOVEMENT_TYPES)
+    quantity = models.PositiveIntegerField()
+    source_type = models.CharField(max_length=20, choices=InventoryMovement.SOURCE_TYPES, default='manual')
+    source_id = models.CharField(max_length=50, blank=True)
+    performed_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+"
+    )
+    destination_store = models.ForeignKey(
+        Store,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventory', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity} of {self.inventory.item.name} (archived)"
+
+
+class MovementCheckpoint(models.Model):
+    """Opening balance of an inventory row: the net effect of its archived movements.
+
+    Every archived movement of the row was created at or before
+    ``archived_until``, so replaying from the checkpoint only needs the hot
+    table.
+    """
+    inventory = models.OneToOneField(
+        Inventory,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="movement_checkpoint"
+    )
+    archived_until = models.DateTimeField()
+    quantity_available = models.IntegerField(default=0)
+    reserved_quantity = models.IntegerField(default=0)
+    movement_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Checkpoint of {self.inventory_id} at {self.archived_until}"
+
+
 # ----------------------------
 # Vendor-Item Mapping
 # ----------------------------
@@ -368,10 +465,12 @@ class StockAlert(models.Model):
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Lookups by inventory use the (inventory, alert_type, is_resolved) index
     inventory = models.ForeignKey(
         Inventory, 
         on_delete=models.CASCADE, 
-        related_name="alerts"
+        related_name="alerts",
+        db_index=False,
     )
     
     # Alert details
@@ -396,9 +495,206 @@ class StockAlert(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['inventory', 'is_resolved']),
+            models.Index(fields=['inventory', 'alert_type', 'is_resolved']),
             models.Index(fields=['alert_type', 'created_at']),
         ]
 
     def __str__(self):
-        return f"{self.get_alert_type_display()} - {self.inventory.item.name}"
\ No newline at end of file
+        return f"{self.get_alert_type_display()} - {self.inventory.item.name}"
+
+# ----------------------------
+# Best Vendor Price Index
+# ----------------------------
+class VendorPriceIndex(models.Model):
+    """Cheapest and fastest active offer per item, refreshed whenever VendorItem changes"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    item = models.OneToOneField(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="price_index"
+    )
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name="vendor_price_index"
+    )
+
+    cheapest = models.ForeignKey(
+        VendorItem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+    fastest = models.ForeignKey(
+        VendorItem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+
+    # Metadata
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'item']),
+        ]
+
+    def __str__(self):
+        return f"Best offers for {self.item.name}"
+
+
+
+# ----------------------------
+# Purchase Orders
+# ----------------------------
+class PurchaseOrder(models.Model):
+    STATUS_CHOICES = [
+        ('draft', 'Draft'),
+        ('submitted', 'Submitted'),
+        ('received', 'Received'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    po_number = models.CharField(max_length=20, unique=True, blank=True)  # e.g., PO-1A2B3C4D
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name="purchase_orders"
+    )
+    vendor = models.ForeignKey(
+        Store,
+        on_delete=models.PROTECT,
+        limit_choices_to={'store_type': 'vendor'},
+        related_name="purchase_orders"
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    notes = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="created_purchase_orders"
+    )
+    received_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="received_purchase_orders"
+    )
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['organization', 'status']),
+            models.Index(fields=['vendor', 'status']),
+        ]
+
+    @staticmethod
+    def generate_number():
+        return f"PO-{uuid.uuid4().hex[:8].upper()}"
+
+    def save(self, *args, **kwargs):
+        if not self.po_number:
+            self.po_number = self.generate_number()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.po_number} ({self.vendor.name})"
+
+
+class PurchaseOrderLine(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    purchase_order = models.ForeignKey(
+        PurchaseOrder,
+        on_delete=models.CASCADE,
+        related_name="lines"
+    )
+    # Destination stock row; the item comes through it
+    inventory = models.ForeignKey(
+        Inventory,
+        on_delete=models.CASCADE,
+        related_name="purchase_order_lines"
+    )
+    vendor_item = models.ForeignKey(
+        VendorItem,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="purchase_order_lines"
+    )
+
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    received_quantity = models.PositiveIntegerField(default=0)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        unique_together = ("purchase_order", "inventory")
+
+    @property
+    def line_total(self):
+        if self.unit_price is None:
+            return None
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.inventory.item.name} on {self.purchase_order.po_number}"
+
+
+
+# ----------------------------
+# Stock Snapshots
+# ----------------------------
+class StockSnapshot(models.Model):
+    """Compact copy of a store's stock levels, one row per store and day.
+
+    Quantities are stored column-wise: position ``n`` of each array belongs to
+    ``inventory_ids[n]``.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name="stock_snapshots"
+    )
+    day = models.DateField()
+    taken_at = models.DateTimeField(help_text="Movements after this instant are not included")
+
+    inventory_ids = models.JSONField(default=list)
+    quantity_available = models.JSONField(default=list)
+    reserved_quantity = models.JSONField(default=list)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("store", "day")
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['store', 'taken_at']),
+        ]
+
+    def levels(self):
+        """{inventory_id: [available, reserved]}"""
+        return {
+            inventory_id: [available, reserved]
+            for inventory_id, available, reserved in zip(
+                self.inventory_ids, self.quantity_available, self.reserved_quantity
+            )
+        }
+
+    def __str__(self):
+        return f"{self.store.name} stock on {self.day}"
@@ -0,0 +1,142 @@
+"""
+Purchase order generation and receipt.
+
+``generate_purchase_orders`` locks every low/out-of-stock inventory row that is
+not already on an open purchase order, reads them again with each item's
+cheapest vendor from VendorPriceIndex, and writes one draft order per
+(organization, vendor) with two bulk inserts; two concurrent runs cannot
+order the same shortfall twice. ``receive_purchase_order`` posts the stock_in
+movements for all lines through ``stock.post_movements``.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import Inventory, InventoryMovement, PurchaseOrder, PurchaseOrderLine
+from .stock import post_movements
+
+OPEN_STATUSES = ("draft", "submitted")
+
+
+class ProcurementError(Exception):
+    pass
+
+
+def reorder_candidates(organization_id=None):
+    """Low/out-of-stock store rows with an indexed vendor and no open purchase order line"""
+    open_lines = PurchaseOrderLine.objects.filter(
+        inventory=OuterRef("pk"),
+        purchase_order__status__in=OPEN_STATUSES,
+    )
+    candidates = Inventory.objects.filter(
+        status__in=["low_stock", "out_of_stock"],
+        store__is_active=True,
+        item__is_active=True,
+        item__price_index__cheapest__isnull=False,
+    ).exclude(
+        store__store_type="vendor"
+    ).filter(
+        ~Exists(open_lines)
+    )
+    if organization_id:
+        candidates = candidates.filter(store__organization_id=organization_id)
+
+    return candidates.values(
+        "id",
+        "quantity_available",
+        "maximum_quantity",
+        organization_id=F("store__organization_id"),
+        vendor_item_id=F("item__price_index__cheapest_id"),
+        vendor_id=F("item__price_index__cheapest__vendor_id"),
+        unit_price=F("item__price_index__cheapest__price"),
+        minimum_order_quantity=F("item__price_index__cheapest__minimum_order_quantity"),
+    ).order_by("store__organization_id", "pk")
+
+
+def reorder_quantity(row):
+    """Top the row up to its maximum, never ordering below the vendor's minimum"""
+    shortfall = row["maximum_quantity"] - row["quantity_available"]
+    if shortfall <= 0:
+        return 0
+    return max(shortfall, row["minimum_order_quantity"] or 1)
+
+
+def _lock_candidates(candidates):
+    """Lock the candidate inventory rows (in a stable order); returns their ids"""
+    return set(candidates.select_for_update(of=("self",)).values_list("id", flat=True))
+
+
+def generate_purchase_orders(organization_id=None, user=None, chunk_size=2000):
+    """Create draft purchase orders for everything below its reorder level"""
+    with transaction.atomic():
+        # A concurrent run holding these rows has committed its lines by the
+        # time the locks are granted, so the second read no longer sees them
+        locked = _lock_candidates(reorder_candidates(organization_id))
+        grouped = defaultdict(list)
+        for row in reorder_candidates(organization_id).iterator(chunk_size=chunk_size):
+            quantity = reorder_quantity(row) if row["id"] in locked else 0
+            if quantity:
+                grouped[(row["organization_id"], row["vendor_id"])].append((row, quantity))
+
+        if not grouped:
+            return []
+
+        orders = {
+            key: PurchaseOrder(
+                po_number=PurchaseOrder.generate_number(),
+                organization_id=key[0],
+                vendor_id=key[1],
+                created_by=user,
+            )
+            for key in grouped
+        }
+        PurchaseOrder.objects.bulk_create(orders.values(), batch_size=chunk_size)
+
+        PurchaseOrderLine.objects.bulk_create(
+            [
+                PurchaseOrderLine(
+                    purchase_order=orders[key],
+                    inventory_id=row["id"],
+                    vendor_item_id=row["vendor_item_id"],
+                    quantity=quantity,
+                    unit_price=row["unit_price"],
+                )
+                for key, lines in grouped.items()
+                for row, quantity in lines
+            ],
+            batch_size=chunk_size,
+        )
+
+    return list(orders.values())
+
+
+def receive_purchase_order(purchase_order, user=None):
+    """Post stock_in movements for every outstanding line of the order"""
+    with transaction.atomic():
+        order = PurchaseOrder.objects.select_for_update().get(pk=purchase_order.pk)
+        if order.status not in OPEN_STATUSES:
+            raise ProcurementError(f"Cannot receive a {order.status} purchase order")
+
+        lines = order.lines.filter(received_quantity__lt=F("quantity"))
+        movements = [
+            InventoryMovement(
+                inventory_id=inventory_id,
+                movement_type="stock_in",
+                quantity=quantity - received,
+                source_type="purchase_order",
+                source_id=order.po_number,
+                performed_by=user,
+            )
+            for inventory_id, quantity, received in lines.values_list("inventory_id", "quantity", "received_quantity")
+        ]
+        post_movements(movements)
+        lines.update(received_quantity=F("quantity"))
+
+        order.status = "received"
+        order.received_by = user
+        order.received_at = timezone.now()
+        order.save(update_fields=["status", "received_by", "received_at", "updated_at"])
+
+    return order, movements
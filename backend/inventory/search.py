@@ -0,0 +1,236 @@
+"""
+Catalogue search over Item name, SKU and description.
+
+PostgreSQL uses an expression GIN index on a ``simple`` tsvector plus trigram
+indexes on name/SKU (see migration 0004). SQLite uses an FTS5 table kept in
+sync by triggers, which ``ensure_sqlite_index`` (re)installs after every
+migrate because SQLite table rebuilds drop triggers. Any other backend, or an
+SQLite build without FTS5, falls back to ``icontains``.
+
+The FTS5 rows are keyed by ``docid`` from a mapping table holding each item's
+UUID. Its ``INTEGER PRIMARY KEY`` survives VACUUM, unlike the hidden rowid of
+``inventory_item``, so the index never drifts onto the wrong items.
+
+``item_search`` returns a condition and a rank expression, both evaluated in
+the view's own query: every match is counted and paginated, however broad
+the terms.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Func, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+FTS_TABLE = "inventory_item_fts"
+DOCS_TABLE = "inventory_item_fts_docs"
+
+# Same expression as the index in migration 0004. Item search subqueries read
+# inventory_item alone, so the columns need no table qualifier.
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(sku, '') || ' ' || coalesce(description, ''))"
+)
+PG_TRIGRAM_THRESHOLD = 0.3
+
+# name, sku, description weights
+SQLITE_BM25 = f"bm25({FTS_TABLE}, 10.0, 5.0, 1.0)"
+
+SQLITE_SETUP = [
+    f"""CREATE TABLE IF NOT EXISTS {DOCS_TABLE} (
+        docid INTEGER PRIMARY KEY,
+        item_id char(32) NOT NULL UNIQUE
+    )""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, sku, description,
+        prefix='2 3', tokenize='unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inventory_item BEGIN
+        INSERT INTO {DOCS_TABLE}(item_id) VALUES (new.id);
+        INSERT INTO {FTS_TABLE}(rowid, name, sku, description)
+        VALUES (last_insert_rowid(), new.name, new.sku, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inventory_item BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = (SELECT docid FROM {DOCS_TABLE} WHERE item_id = old.id);
+        DELETE FROM {DOCS_TABLE} WHERE item_id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, sku, description ON inventory_item BEGIN
+        UPDATE {FTS_TABLE} SET name = new.name, sku = new.sku, description = new.description
+        WHERE rowid = (SELECT docid FROM {DOCS_TABLE} WHERE item_id = new.id);
+    END""",
+]
+SQLITE_TRIGGERS = [f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au"]
+
+SQLITE_REBUILD = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"DELETE FROM {DOCS_TABLE}",
+    f"INSERT INTO {DOCS_TABLE}(item_id) SELECT id FROM inventory_item",
+    f"""INSERT INTO {FTS_TABLE}(rowid, name, sku, description)
+        SELECT docs.docid, item.name, item.sku, item.description
+        FROM {DOCS_TABLE} docs JOIN inventory_item item ON item.id = docs.item_id""",
+]
+
+_sqlite_fts_available = None
+
+
+def tokenize(terms):
+    return re.findall(r"\w+", terms.lower())
+
+
+def sqlite_fts_available():
+    global _sqlite_fts_available
+    if _sqlite_fts_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _sqlite_fts_available = cursor.fetchone() is not None
+    return _sqlite_fts_available
+
+
+def _drop_rowid_index(cursor, tables):
+    # Indexes built before the docid mapping were linked through the hidden rowid
+    if FTS_TABLE in tables and DOCS_TABLE not in tables:
+        for trigger in SQLITE_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(f"DROP TABLE {FTS_TABLE}")
+
+
+def ensure_sqlite_index(using_connection=None, rebuild=False):
+    """Create the FTS5 table, mapping and triggers if missing; rebuild when they were"""
+    global _sqlite_fts_available
+    conn = using_connection or connection
+    if conn.vendor != "sqlite":
+        return
+
+    with conn.cursor() as cursor:
+        tables = conn.introspection.table_names(cursor)
+        if "inventory_item" not in tables:
+            return
+        _drop_rowid_index(cursor, tables)
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            SQLITE_TRIGGERS,
+        )
+        missing = len(SQLITE_TRIGGERS) - len(cursor.fetchall())
+        try:
+            for statement in SQLITE_SETUP:
+                cursor.execute(statement)
+        except Exception:
+            # SQLite compiled without FTS5: searches fall back to icontains
+            _sqlite_fts_available = False
+            return
+        if missing or rebuild:
+            for statement in SQLITE_REBUILD:
+                cursor.execute(statement)
+    _sqlite_fts_available = True
+
+
+class SqliteRank(Func):
+    """bm25 rank (higher is better) of the item at ``item_pk`` for an FTS5 query; NULL when it does not match"""
+    output_field = FloatField()
+
+    def __init__(self, match, item_pk):
+        super().__init__(Value(match), item_pk)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (match_sql, match_params), (pk_sql, pk_params) = [
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        ]
+        # The rowid constraint lets FTS5 seek straight to the item's entry
+        return (
+            f"(SELECT -{SQLITE_BM25} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH {match_sql} "
+            f"AND {FTS_TABLE}.rowid = (SELECT docid FROM {DOCS_TABLE} WHERE item_id = {pk_sql}))",
+            [*match_params, *pk_params],
+        )
+
+
+def _sqlite_search(items, tokens, pk_field):
+    # Every token is a quoted prefix query, implicitly AND-ed by FTS5
+    match = " ".join(f'"{token}"*' for token in tokens)
+    matching = items.filter(pk__in=RawSQL(
+        f"SELECT docs.item_id FROM {FTS_TABLE} JOIN {DOCS_TABLE} docs ON docs.docid = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s",
+        [match],
+    ))
+    return matching, SqliteRank(match, F(pk_field))
+
+
+def _postgres_search(items, terms, tokens, pk_field):
+    from django.contrib.postgres.search import TrigramSimilarity
+    from django.db.models import BooleanField
+    from django.db.models.functions import Greatest
+
+    tsquery = " & ".join(f"{token}:*" for token in tokens)
+    matching = items.filter(RawSQL(
+        f"{PG_DOCUMENT} @@ to_tsquery('simple', %s) OR name %% %s OR sku %% %s",
+        [tsquery, terms, terms],
+        output_field=BooleanField(),
+    ))
+    rank = RawSQL(f"ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s))", [tsquery], output_field=FloatField())
+    ranked = matching.filter(pk=OuterRef(pk_field)).annotate(
+        search_rank=rank + Greatest(TrigramSimilarity("name", terms), TrigramSimilarity("sku", terms))
+    )
+    return matching, Subquery(ranked.values("search_rank")[:1], output_field=FloatField())
+
+
+def item_search(terms, organization_id=None, path=""):
+    """
+    (condition, rank) for a queryset reaching Item through ``path`` (empty
+    for Item itself): a Q selecting rows whose active item matches ``terms``,
+    and an expression ranking them, higher first (NULL for rows that do not
+    match). Returns None when ``terms`` has nothing to search for.
+    """
+    from .models import Item
+
+    tokens = tokenize(terms)
+    if not tokens:
+        return None
+
+    pk_field = f"{path}__pk" if path else "pk"
+    items = Item.objects.filter(is_active=True)
+    if organization_id is not None:
+        items = items.filter(organization_id=organization_id)
+
+    if connection.vendor == "postgresql":
+        matching, rank = _postgres_search(items, terms, tokens, pk_field)
+    elif connection.vendor == "sqlite" and sqlite_fts_available():
+        matching, rank = _sqlite_search(items, tokens, pk_field)
+    else:
+        query = Q()
+        for token in tokens:
+            query &= Q(name__icontains=token) | Q(sku__icontains=token) | Q(description__icontains=token)
+        # No relevance to rank by: the view's own ordering decides
+        matching, rank = items.filter(query), Value(0.0)
+    return Q(**{f"{pk_field}__in": matching.values("pk")}), rank
+
+
+class ItemSearchFilter(filters.SearchFilter):
+    """
+    Ranked replacement for SearchFilter on catalogue-backed viewsets.
+
+    ``item_search_path`` is the relation from the view's model to Item (empty
+    for Item itself). Any remaining ``search_fields`` are still matched with
+    icontains and OR-ed in. Results are ordered by rank unless the request
+    asks for an explicit ``ordering``, so list this filter after OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, "").strip()
+        if not terms:
+            return queryset
+
+        user = request.user
+        organization_id = None if user.is_superuser or user.role == "admin" else user.organization_id
+        search = item_search(terms, organization_id, getattr(view, "item_search_path", ""))
+        match, rank = search if search is not None else (Q(pk__in=[]), Value(0.0))
+
+        for field in self.get_search_fields(view, request) or []:
+            match |= Q(**{f"{field}__icontains": terms})
+        queryset = queryset.filter(match)
+
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.annotate(
+            search_rank=Coalesce(rank, Value(0.0), output_field=FloatField())
+        ).order_by("-search_rank", *queryset.query.order_by)
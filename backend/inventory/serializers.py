@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.core.validators import MinValueValidator
-from .models import Item, Store, Inventory, InventoryMovement, VendorItem, StockAlert
+from .models import (
+    Item, Store, Inventory, InventoryMovement, VendorItem, StockAlert,
+    PurchaseOrder, PurchaseOrderLine
+)
 
 
 class ItemSerializer(serializers.ModelSerializer):
@@ -11,9 +14,9 @@ class ItemSerializer(serializers.ModelSerializer):
         fields = [
             "id", "name", "sku", "description", "category", "unit_of_measure",
             "organization", "organization_name", "is_active", 
-            "created_at", "updated_at"
+            "created_at", "updated_at", "version"
         ]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        read_only_fields = ["id", "created_at", "updated_at", "version"]
 
 
 class StoreSerializer(serializers.ModelSerializer):
@@ -53,11 +56,11 @@ class InventorySerializer(serializers.ModelSerializer):
             "minimum_quantity", "maximum_quantity", "status",
             "location", "expiry_date", "batch_number",
             "needs_reorder", "available_quantity",
-            "created_at", "updated_at", "last_checked"
+            "created_at", "updated_at", "last_checked", "version"
         ]
         read_only_fields = [
             "id", "status", "total_quantity", "needs_reorder", 
-            "available_quantity", "created_at", "updated_at"
+            "available_quantity", "created_at", "updated_at", "version"
         ]
 
 
@@ -95,7 +98,7 @@ class CreateInventoryMovementSerializer(serializers.ModelSerializer):
         quantity = data['quantity']
         
         # Validate stock availability for stock out and reserve
-        if movement_type in ['stock_out', 'reserve']:
+        if movement_type in ['stock_out', 'reserve', 'write_off']:
             if inventory.quantity_available < quantity:
                 raise serializers.ValidationError(
                     f"Insufficient stock. Available: {inventory.quantity_available}"
@@ -146,4 +149,51 @@ class StockAlertSerializer(serializers.ModelSerializer):
             "is_resolved", "resolved_by", "resolved_by_name", "resolved_at",
             "created_at"
         ]
-        read_only_fields = ["id", "created_at", "resolved_at"]
\ No newline at end of file
+        read_only_fields = ["id", "created_at", "resolved_at"]
+
+
+class SourcingLineSerializer(serializers.Serializer):
+    item = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class SourcingRequestSerializer(serializers.Serializer):
+    """Basket of items to source from vendors"""
+    lines = SourcingLineSerializer(many=True, allow_empty=False)
+    strategy = serializers.ChoiceField(choices=["cheapest", "fastest"], default="cheapest")
+
+
+class PurchaseOrderLineSerializer(serializers.ModelSerializer):
+    item = serializers.UUIDField(source='inventory.item_id', read_only=True)
+    item_name = serializers.CharField(source='inventory.item.name', read_only=True)
+    item_sku = serializers.CharField(source='inventory.item.sku', read_only=True)
+    store = serializers.UUIDField(source='inventory.store_id', read_only=True)
+    store_name = serializers.CharField(source='inventory.store.name', read_only=True)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = PurchaseOrderLine
+        fields = [
+            "id", "inventory", "item", "item_name", "item_sku", "store", "store_name",
+            "vendor_item", "quantity", "received_quantity", "unit_price", "line_total"
+        ]
+        read_only_fields = fields
+
+
+class PurchaseOrderSerializer(serializers.ModelSerializer):
+    vendor_name = serializers.CharField(source='vendor.name', read_only=True)
+    created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
+    received_by_name = serializers.CharField(source='received_by.full_name', read_only=True)
+    lines = PurchaseOrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = [
+            "id", "po_number", "organization", "vendor", "vendor_name", "status", "notes",
+            "created_by", "created_by_name", "received_by", "received_by_name", "lines",
+            "created_at", "updated_at", "submitted_at", "received_at"
+        ]
+        read_only_fields = [
+            "id", "po_number", "organization", "vendor", "status", "created_by", "received_by",
+            "created_at", "updated_at", "submitted_at", "received_at"
+        ]
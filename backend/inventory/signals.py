@@ -0,0 +1,117 @@
+# inventory/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import caches
+from django.db.models import Count
+from django.db import transaction
+from .models import Item, Store, Inventory, InventoryMovement, VendorItem, StockAlert
+from .stock import movements_inserted, movements_posted
+from core import cache, events
+from . import autocomplete
+from .sourcing import refresh_price_index
+
+
+@receiver([post_save, post_delete], sender=Item)
+def invalidate_item_cache(sender, instance, **kwargs):
+    cache.invalidate(["items", "vendor_items"], instance.organization_id)
+
+
+@receiver(post_delete, sender=Item)
+def forget_deleted_item(sender, instance, **kwargs):
+    autocomplete.forget(str(instance.organization_id), instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Store)
+def invalidate_store_cache(sender, instance, **kwargs):
+    cache.invalidate(["stores", "vendor_items"], instance.organization_id)
+    caches[cache.SHARED_CACHE].delete(f"store-organization:{instance.pk}")
+
+
+@receiver(post_save, sender=Store)
+def refresh_vendor_price_index(sender, instance, **kwargs):
+    # Activating or deactivating a vendor changes which offers are eligible
+    if instance.store_type == 'vendor':
+        item_ids = list(instance.vendor_items.values_list('item_id', flat=True))
+        transaction.on_commit(lambda: refresh_price_index(item_ids))
+
+
+def _vendor_organization_id(instance):
+    """The vendor's organization without loading the vendor on every save"""
+    if VendorItem.vendor.is_cached(instance):
+        return instance.vendor.organization_id
+    key = f"store-organization:{instance.vendor_id}"
+    organization_id = caches[cache.SHARED_CACHE].get(key)
+    if organization_id is None:
+        organization_id = Store.objects.filter(pk=instance.vendor_id).values_list("organization_id", flat=True).first()
+        caches[cache.SHARED_CACHE].set(key, organization_id)
+    return organization_id
+
+
+@receiver([post_save, post_delete], sender=VendorItem)
+def invalidate_vendor_item_cache(sender, instance, **kwargs):
+    cache.invalidate("vendor_items", _vendor_organization_id(instance))
+
+
+@receiver([post_save, post_delete], sender=VendorItem)
+def refresh_item_price_index(sender, instance, **kwargs):
+    item_id = instance.item_id
+    transaction.on_commit(lambda: refresh_price_index([item_id]))
+
+
+@receiver(post_save, sender=InventoryMovement)
+def publish_movement(sender, instance, created, **kwargs):
+    if not created or not events.listening():
+        return
+    organization_id = Store.objects.filter(inventories=instance.inventory_id).values_list('organization_id', flat=True).first()
+    events.publish_on_commit(organization_id, "movement.applied", {
+        "movement": instance.pk,
+        "inventory": instance.inventory_id,
+        "movement_type": instance.movement_type,
+        "quantity": instance.quantity,
+        "source_type": instance.source_type,
+        "source_id": instance.source_id,
+    })
+
+
+@receiver(movements_posted)
+def publish_posted_movements(sender, movements, **kwargs):
+    if not events.listening():
+        return
+    organizations = dict(
+        Inventory.objects.filter(pk__in={movement.inventory_id for movement in movements})
+        .values_list('pk', 'store__organization_id')
+    )
+    inventories_by_org = {}
+    for movement in movements:
+        inventories_by_org.setdefault(organizations[movement.inventory_id], set()).add(movement.inventory_id)
+    for organization_id, inventory_ids in inventories_by_org.items():
+        events.publish_on_commit(organization_id, "movements.posted", {
+            "count": sum(1 for movement in movements if movement.inventory_id in inventory_ids),
+            "inventories": sorted(str(pk) for pk in inventory_ids),
+        })
+
+
+@receiver(movements_inserted)
+def publish_inserted_movements(sender, movements, **kwargs):
+    if not events.listening():
+        return
+    counts = (
+        movements.order_by().values_list('inventory__store__organization_id')
+        .annotate(count=Count('pk'))
+    )
+    for organization_id, count in counts:
+        events.publish_on_commit(organization_id, "movements.posted", {"count": count})
+
+
+@receiver(post_save, sender=StockAlert)
+def publish_alert(sender, instance, created, **kwargs):
+    if not created or not events.listening():
+        return
+    organization_id = Store.objects.filter(inventories=instance.inventory_id).values_list('organization_id', flat=True).first()
+    events.publish_on_commit(organization_id, "alert.raised", {
+        "alert": instance.pk,
+        "inventory": instance.inventory_id,
+        "alert_type": instance.alert_type,
+        "severity": instance.severity,
+        "message": instance.message,
+    })
@@ -0,0 +1,204 @@
+"""
+Daily stock snapshots and as-of queries.
+
+``capture_snapshots`` copies each store's current Inventory levels into one
+StockSnapshot row per store and day. ``stock_as_of`` answers "what was on hand
+at this store at that moment" from the latest snapshot taken before the moment
+plus the movements after it; when no earlier snapshot exists it starts from the
+next snapshot (or the live rows) and reverses the movements in between.
+``replay_stock`` rebuilds the same answer from the whole ledger and exists to
+check the other two.
+
+The ledger spans the hot movement table and its archive (inventory.archive).
+Ranges that end before the archive starts never touch the archive table, and
+``replay_stock`` starts from the archive checkpoints when the moment is past
+them.
+
+Only movements are replayed, so direct edits of Inventory quantities are
+picked up by the next snapshot, not by the replay between snapshots.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import ArchivedMovement, Inventory, InventoryMovement, MovementCheckpoint, StockSnapshot
+from .stock import QUANTITY_EFFECTS
+
+
+def end_of_day(day):
+    """Last instant of ``day`` in the current time zone"""
+    midnight = datetime.combine(day + timedelta(days=1), time.min)
+    return timezone.make_aware(midnight) - timedelta(microseconds=1)
+
+
+def movement_deltas(movements):
+    """Grouped (available, reserved) deltas per inventory id, one query"""
+    deltas = defaultdict(lambda: [0, 0])
+    rows = (
+        movements.filter(movement_type__in=QUANTITY_EFFECTS)
+        .order_by()
+        .values("inventory_id", "movement_type")
+        .annotate(total=Sum("quantity"))
+    )
+    for row in rows:
+        available, reserved = QUANTITY_EFFECTS[row["movement_type"]]
+        delta = deltas[str(row["inventory_id"])]
+        delta[0] += available * row["total"]
+        delta[1] += reserved * row["total"]
+    return deltas
+
+
+def _store_movements(store_id, model=InventoryMovement, after=None, until=None):
+    movements = model.objects.filter(inventory__store_id=store_id)
+    if after is not None:
+        movements = movements.filter(created_at__gt=after)
+    if until is not None:
+        movements = movements.filter(created_at__lte=until)
+    return movements
+
+
+def _archived_until(store_id):
+    """Creation time of the store's newest archived movement, None when nothing is archived"""
+    return MovementCheckpoint.objects.filter(inventory__store_id=store_id).aggregate(
+        latest=Max("archived_until")
+    )["latest"]
+
+
+def ledger_deltas(store_id, after=None, until=None):
+    """movement_deltas of the store's movements in (after, until], hot and archived"""
+    deltas = movement_deltas(_store_movements(store_id, after=after, until=until))
+    archived_until = _archived_until(store_id)
+    if archived_until is not None and (after is None or after < archived_until):
+        archived = movement_deltas(_store_movements(store_id, ArchivedMovement, after, until))
+        for inventory_id, (available, reserved) in archived.items():
+            delta = deltas[inventory_id]
+            delta[0] += available
+            delta[1] += reserved
+    return deltas
+
+
+def _apply(levels, deltas, sign):
+    for inventory_id, (available, reserved) in deltas.items():
+        level = levels.setdefault(inventory_id, [0, 0])
+        level[0] += sign * available
+        level[1] += sign * reserved
+    return levels
+
+
+def live_levels(store_id):
+    return {
+        str(pk): [available, reserved]
+        for pk, available, reserved in Inventory.objects.filter(store_id=store_id)
+        .order_by()
+        .values_list("pk", "quantity_available", "reserved_quantity")
+    }
+
+
+def replay_stock(store_id, moment):
+    """Levels at ``moment`` from every movement since the beginning"""
+    archived_until = _archived_until(store_id)
+    if archived_until is None or moment < archived_until:
+        return _apply({}, ledger_deltas(store_id, until=moment), 1)
+
+    # Every archived movement is summed up in the checkpoints
+    levels = {
+        str(pk): [available, reserved]
+        for pk, available, reserved in MovementCheckpoint.objects.filter(inventory__store_id=store_id)
+        .values_list("pk", "quantity_available", "reserved_quantity")
+    }
+    return _apply(levels, movement_deltas(_store_movements(store_id, until=moment)), 1)
+
+
+def stock_as_of(store_id, moment):
+    """Levels at ``moment`` as ({inventory_id: [available, reserved]}, source)"""
+    snapshot = (
+        StockSnapshot.objects.filter(store_id=store_id, taken_at__lte=moment)
+        .order_by("-taken_at")
+        .first()
+    )
+    if snapshot:
+        delta = ledger_deltas(store_id, snapshot.taken_at, moment)
+        return _apply(snapshot.levels(), delta, 1), {"snapshot": snapshot.day}
+
+    snapshot = (
+        StockSnapshot.objects.filter(store_id=store_id, taken_at__gt=moment)
+        .order_by("taken_at")
+        .first()
+    )
+    if snapshot:
+        levels, source = snapshot.levels(), {"snapshot": snapshot.day}
+        delta = ledger_deltas(store_id, moment, snapshot.taken_at)
+    else:
+        levels, source = live_levels(store_id), {"snapshot": None}
+        delta = ledger_deltas(store_id, moment)
+
+    # Walking backwards: rows created after the moment did not exist yet
+    existing = {
+        str(pk) for pk in Inventory.objects.filter(store_id=store_id, created_at__lte=moment).values_list("pk", flat=True)
+    }
+    levels = _apply(levels, delta, -1)
+    return {pk: level for pk, level in levels.items() if pk in existing}, source
+
+
+def _snapshot(store_id, day, taken_at, levels):
+    ordered = sorted(levels.items())
+    return StockSnapshot(
+        store_id=store_id,
+        day=day,
+        taken_at=taken_at,
+        inventory_ids=[pk for pk, _ in ordered],
+        quantity_available=[level[0] for _, level in ordered],
+        reserved_quantity=[level[1] for _, level in ordered],
+    )
+
+
+def capture_snapshots(store_ids=None, batch_size=500):
+    """Snapshot today's live levels for every store not yet snapshotted today; returns how many were inserted"""
+    taken_at = timezone.now()
+    day = timezone.localdate(taken_at)
+
+    rows = Inventory.objects.exclude(
+        store__stock_snapshots__day=day
+    ).order_by("store_id", "pk").values_list("store_id", "pk", "quantity_available", "reserved_quantity")
+    if store_ids is not None:
+        rows = rows.filter(store_id__in=store_ids)
+
+    batch = []
+    for store_id, group in groupby(rows.iterator(chunk_size=2000), key=lambda row: row[0]):
+        levels = {str(pk): [available, reserved] for _, pk, available, reserved in group}
+        batch.append(_snapshot(store_id, day, taken_at, levels))
+        if len(batch) >= batch_size:
+            StockSnapshot.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    StockSnapshot.objects.bulk_create(batch, ignore_conflicts=True)
+
+    # bulk_create returns every object passed in, conflicts included; a run that
+    # raced another one only inserted the rows stamped with its own taken_at
+    return StockSnapshot.objects.filter(day=day, taken_at=taken_at).count()
+
+
+def backfill_snapshots(store_id, days):
+    """Derive end-of-day snapshots for the previous ``days`` days, newest first.
+
+    Each day is derived from the one after it, so only one day of movements is
+    reversed per snapshot.
+    """
+    today = timezone.localdate()
+    existing = set(
+        StockSnapshot.objects.filter(store_id=store_id, day__gte=today - timedelta(days=days))
+        .values_list("day", flat=True)
+    )
+
+    created = 0
+    for offset in range(1, days + 1):
+        day = today - timedelta(days=offset)
+        if day in existing:
+            continue
+        moment = end_of_day(day)
+        levels, _ = stock_as_of(store_id, moment)
+        _snapshot(store_id, day, moment, levels).save()
+        created += 1
+    return created
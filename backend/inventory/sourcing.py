@@ -0,0 +1,121 @@
+"""
+Best-source lookups over VendorItem offers.
+
+An offer is eligible when both it and its vendor store are active and the
+vendor belongs to the item's organization. ``refresh_price_index`` keeps the
+per-item cheapest/fastest offer in VendorPriceIndex; ``best_sources`` answers a
+basket from that index and falls back to one window-function query for lines
+whose indexed offer has a minimum order quantity above the requested quantity.
+"""
+from django.db.models import Case, F, IntegerField, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from .models import Item, VendorItem, VendorPriceIndex
+
+STRATEGIES = {
+    "cheapest": [F("price").asc(nulls_last=True), F("lead_time_days").asc(), F("minimum_order_quantity").asc()],
+    "fastest": [F("lead_time_days").asc(), F("price").asc(nulls_last=True), F("minimum_order_quantity").asc()],
+}
+
+
+def eligible_offers():
+    return VendorItem.objects.filter(
+        is_active=True,
+        vendor__is_active=True,
+        vendor__organization_id=F("item__organization_id"),
+    )
+
+
+def best_offers(offers, strategy):
+    """Keep only the best offer per item (one query, ROW_NUMBER over item)"""
+    return offers.annotate(
+        source_rank=Window(RowNumber(), partition_by=[F("item_id")], order_by=STRATEGIES[strategy])
+    ).filter(source_rank=1)
+
+
+def refresh_price_index(item_ids):
+    """Recompute the indexed best offers for the given items"""
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+
+    offers = eligible_offers().filter(item_id__in=item_ids)
+    best = {
+        strategy: dict(best_offers(offers, strategy).values_list("item_id", "id"))
+        for strategy in STRATEGIES
+    }
+
+    rows = [
+        VendorPriceIndex(
+            item_id=item_id,
+            organization_id=organization_id,
+            cheapest_id=best["cheapest"].get(item_id),
+            fastest_id=best["fastest"].get(item_id),
+        )
+        for item_id, organization_id in Item.objects.filter(pk__in=item_ids).values_list("id", "organization_id")
+    ]
+    VendorPriceIndex.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["item"],
+        update_fields=["cheapest", "fastest", "updated_at"],
+    )
+
+
+def _line(item_id, quantity, offer):
+    if offer is None:
+        return {"item": item_id, "quantity": quantity, "vendor_item": None}
+    return {
+        "item": item_id,
+        "quantity": quantity,
+        "vendor_item": offer.id,
+        "vendor": offer.vendor_id,
+        "vendor_name": offer.vendor.name,
+        "price": str(offer.price) if offer.price is not None else None,
+        "currency": offer.currency,
+        "lead_time_days": offer.lead_time_days,
+        "minimum_order_quantity": offer.minimum_order_quantity,
+        "line_total": str(offer.price * quantity) if offer.price is not None else None,
+    }
+
+
+def best_sources(lines, strategy="cheapest", organization_id=None):
+    """
+    Best offer for each (item_id, quantity) line of a basket.
+
+    Quantities for repeated items are summed. At most two queries run whatever
+    the basket size: the index lookup, and a ranked query for lines the index
+    cannot answer because of minimum order quantities.
+    """
+    quantities = {}
+    for item_id, quantity in lines:
+        quantities[item_id] = quantities.get(item_id, 0) + quantity
+
+    indexed = VendorPriceIndex.objects.filter(item_id__in=quantities).select_related(
+        strategy, f"{strategy}__vendor"
+    )
+    if organization_id is not None:
+        indexed = indexed.filter(organization_id=organization_id)
+
+    chosen = {}
+    for entry in indexed:
+        offer = getattr(entry, strategy)
+        if offer is not None and offer.minimum_order_quantity <= quantities[entry.item_id]:
+            chosen[entry.item_id] = offer
+
+    remaining = [item_id for item_id in quantities if item_id not in chosen]
+    if remaining:
+        offers = eligible_offers().filter(item_id__in=remaining)
+        if organization_id is not None:
+            offers = offers.filter(item__organization_id=organization_id)
+        requested = Case(
+            *[When(item_id=item_id, then=Value(quantities[item_id])) for item_id in remaining],
+            output_field=IntegerField(),
+        )
+        offers = offers.annotate(requested_quantity=requested).filter(
+            minimum_order_quantity__lte=F("requested_quantity")
+        )
+        for offer in best_offers(offers, strategy).select_related("vendor"):
+            chosen[offer.item_id] = offer
+
+    return [_line(item_id, quantity, chosen.get(item_id)) for item_id, quantity in quantities.items()]
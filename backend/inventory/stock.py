@@ -0,0 +1,126 @@
+"""
+Set-based stock posting.
+
+InventoryMovement.save() applies movements one at a time through
+update_inventory(). Jobs that post many movements at once (purchase order
+receipts, expiry write-offs) use ``post_movements`` instead: the movements are
+inserted with one bulk_create, their net effect is applied to Inventory with one
+UPDATE per batch of rows, and statuses are recalculated with one more.
+The UPDATE only matches rows that stay non-negative, so a posting that would
+overdraw stock (say two reservations racing for the same units) raises
+InsufficientStock and is rolled back as a whole. Callers still validate
+quantities beforehand to give a useful error in the common case.
+
+Bulk updates skip save() as well, so they bump Inventory.version themselves
+(see core.models.VersionedModel); rows loaded before a posting then fail
+their next save() instead of overwriting it.
+
+Bulk inserts skip save() and post_save, so ``movements_posted`` is sent with the
+list of created movements for receivers that track the ledger. Postings that
+insert with INSERT ... SELECT and never load the movements (the expiry sweep)
+send ``movements_inserted`` with a queryset of the inserted rows instead, which
+receivers aggregate in the database.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Inventory, InventoryMovement
+
+# (quantity_available, reserved_quantity) multipliers, mirroring update_inventory()
+QUANTITY_EFFECTS = {
+    "stock_in": (1, 0),
+    "stock_out": (-1, 0),
+    "reserve": (-1, 1),
+    "release": (1, -1),
+    "write_off": (-1, 0),
+}
+
+BATCH_SIZE = 500
+
+# Sent inside the posting transaction with movements=<list of InventoryMovement>
+movements_posted = Signal()
+
+# Sent inside the posting transaction with movements=<InventoryMovement queryset>
+movements_inserted = Signal()
+
+
+class InsufficientStock(Exception):
+    """A posting would take an inventory row's available or reserved quantity below zero"""
+
+    def __init__(self, inventory_ids):
+        super().__init__(f"Insufficient stock on {len(inventory_ids)} inventory row(s)")
+        self.inventory_ids = inventory_ids
+
+
+def net_effects(movements):
+    """Sum movement quantities into (available, reserved) deltas per inventory id"""
+    effects = {}
+    for movement in movements:
+        available, reserved = QUANTITY_EFFECTS.get(movement.movement_type, (0, 0))
+        delta = effects.setdefault(movement.inventory_id, [0, 0])
+        delta[0] += available * movement.quantity
+        delta[1] += reserved * movement.quantity
+    return effects
+
+
+def status_expression():
+    """SQL equivalent of Inventory.update_status()"""
+    return Case(
+        When(expiry_date__lt=timezone.localdate(), then=Value("expired")),
+        When(quantity_available__lte=0, then=Value("out_of_stock")),
+        When(quantity_available__lte=F("minimum_quantity"), then=Value("low_stock")),
+        default=Value("available"),
+    )
+
+
+def refresh_statuses(inventory_ids):
+    Inventory.objects.filter(pk__in=list(inventory_ids)).update(
+        status=status_expression(), version=F("version") + 1
+    )
+
+
+def post_movements(movements):
+    """Insert movements and apply them to inventory in bulk"""
+    if not movements:
+        return []
+
+    with transaction.atomic():
+        created = InventoryMovement.objects.bulk_create(movements, batch_size=BATCH_SIZE)
+
+        effects = [(pk, delta) for pk, delta in net_effects(movements).items() if delta != [0, 0]]
+        now = timezone.now()
+        for start in range(0, len(effects), BATCH_SIZE):
+            batch = effects[start:start + BATCH_SIZE]
+            available = F("quantity_available") + Case(
+                *[When(pk=pk, then=Value(delta[0])) for pk, delta in batch], default=Value(0)
+            )
+            reserved = F("reserved_quantity") + Case(
+                *[When(pk=pk, then=Value(delta[1])) for pk, delta in batch], default=Value(0)
+            )
+            # Rows that would go negative are left out of the UPDATE, and the count gives them away
+            updated = (
+                Inventory.objects.filter(pk__in=[pk for pk, _ in batch])
+                .alias(new_available=available, new_reserved=reserved)
+                .filter(new_available__gte=0, new_reserved__gte=0)
+                .update(
+                    quantity_available=available,
+                    reserved_quantity=reserved,
+                    updated_at=now,
+                    version=F("version") + 1,
+                )
+            )
+            if updated != len(batch):
+                short = list(
+                    Inventory.objects.filter(pk__in=[pk for pk, _ in batch])
+                    .alias(new_available=available, new_reserved=reserved)
+                    .filter(Q(new_available__lt=0) | Q(new_reserved__lt=0))
+                    .values_list("pk", flat=True)
+                )
+                raise InsufficientStock(short)
+            refresh_statuses(pk for pk, _ in batch)
+
+        movements_posted.send(sender=InventoryMovement, movements=created)
+
+    return created
@@ -1,3 +1,858 @@
-from django.test import TestCase
+import importlib
+import io
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from analytics.models import MovementDailyBucket
+from core import cache
+from org.models import Department, Organization
+from users.models import CustomUser
+
+from . import autocomplete, procurement, search, snapshots, sourcing
+from .archive import LedgerCursorPagination, archive_movements
+from .expiry import sweep_expiry
+from .importers import ItemImporter, text_stream
+from .models import (
+    ArchivedMovement, Inventory, InventoryMovement, Item, PurchaseOrder, PurchaseOrderLine, StockAlert,
+    StockSnapshot, Store, VendorItem, VendorPriceIndex,
+)
+
+
+class InventoryTestData(TestCase):
+    """One organization with a store, a vendor, items and stocked inventory rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name="North Trust")
+        cls.department = Department.objects.create(name="Ward 1", organization=cls.organization)
+        cls.admin = CustomUser.objects.create_user(
+            "admin@example.com", "Admin", "pw", role="admin", is_superuser=True
+        )
+        cls.manager = CustomUser.objects.create_user(
+            "manager@example.com", "Manager", "pw", role="store_manager",
+            organization=cls.organization, department=cls.department,
+        )
+        cls.store = Store.objects.create(name="Main", organization=cls.organization, department=cls.department)
+        cls.vendor = Store.objects.create(name="Supplier", organization=cls.organization, store_type="vendor")
+        cls.items = [
+            Item.objects.create(name=f"Glove {i}", sku=f"GLV-{i:03d}", organization=cls.organization, category="Medical")
+            for i in range(3)
+        ]
+        cls.inventories = [
+            Inventory.objects.create(item=item, store=cls.store, quantity_available=50, minimum_quantity=10)
+            for item in cls.items
+        ]
+
+    def setUp(self):
+        caches[cache.SHARED_CACHE].clear()
+        caches[cache.LOCAL_CACHE].clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class CachedListTests(InventoryTestData):
+
+    def test_item_list_is_served_from_cache_until_an_item_changes(self):
+        client = self.client_for(self.admin)
+        client.get("/api/store/items/")
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get("/api/store/items/").status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(pk=self.items[0].pk).get().save(update_fields=["name"])
+        with CaptureQueriesContext(connection) as queries:
+            client.get("/api/store/items/")
+        self.assertTrue(self.item_rows_read(queries))
+
+    @staticmethod
+    def item_rows_read(queries):
+        return [q for q in queries.captured_queries if q["sql"].startswith('SELECT "inventory_item".')]
+
+    def test_list_etag_is_weak_and_answers_if_none_match_without_queries(self):
+        client = self.client_for(self.admin)
+        etag = client.get("/api/store/items/")["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        with self.assertNumQueries(0):
+            response = client.get("/api/store/items/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.organization.name = "North Trust (renamed)"
+            self.organization.save()
+        self.assertEqual(client.get("/api/store/items/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_item_detail_is_loaded_once_for_its_etag_and_body(self):
+        client = self.client_for(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f"/api/store/items/{self.items[0].pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], str(self.items[0].pk))
+        self.assertEqual(len(self.item_rows_read(queries)), 1)
+
+        with self.assertNumQueries(1):
+            response = client.get(f"/api/store/items/{self.items[0].pk}/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_compressed_list_keeps_the_same_weak_etag(self):
+        client = self.client_for(self.admin)
+        plain = client.get("/api/store/items/")["ETag"]
+        compressed = client.get("/api/store/items/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(compressed["ETag"], plain)
+        response = client.get("/api/store/items/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=plain)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vendor_item_invalidation_reads_vendor_organization_once(self):
+        offer = VendorItem.objects.create(vendor=self.vendor, item=self.items[0], price=2)
+        VendorItem.objects.get(pk=offer.pk).save()
+
+        offer = VendorItem.objects.get(pk=offer.pk)
+        with CaptureQueriesContext(connection) as queries:
+            offer.save()
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "inventory_store"' in q["sql"]])
+
+
+class ItemSearchTests(InventoryTestData):
+    """The SQLite FTS5 catalogue index, through the item and inventory lists"""
+
+    def setUp(self):
+        super().setUp()
+        self.nitrile = Item.objects.create(name="Nitrile glove", sku="NTR-100", organization=self.organization)
+        self.gauze = Item.objects.create(
+            name="Gauze swab", sku="GZE-200", description="Fits the glove box", organization=self.organization
+        )
+        other = Organization.objects.create(name="South Trust")
+        Item.objects.create(name="Glove liner", sku="LNR-300", organization=other)
+
+    def search(self, terms, user=None, url="/api/store/items/", **params):
+        response = self.client_for(user or self.manager).get(url, {"search": terms, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, terms, **kwargs):
+        return [row["name"] for row in self.search(terms, **kwargs)["results"]]
+
+    def test_name_matches_rank_above_description_matches(self):
+        names = self.names("glove")
+        self.assertEqual(len(names), 5)
+        self.assertEqual(names[-1], "Gauze swab")
+        self.assertNotIn("Glove liner", names)
+
+    def test_tokens_are_prefixes_and_all_must_match(self):
+        self.assertEqual(self.names("gau"), ["Gauze swab"])
+        self.assertEqual(self.names("ntr"), ["Nitrile glove"])
+        self.assertEqual(self.names("glo swa"), ["Gauze swab"])
+        self.assertEqual(self.names("glove zzz"), [])
+
+    def test_index_follows_creates_edits_and_deletes(self):
+        # The list is cached: let the commit hooks invalidate it
+        with self.captureOnCommitCallbacks(execute=True):
+            tape = Item.objects.create(name="Surgical tape", sku="TPE-400", organization=self.organization)
+        self.assertEqual(self.names("surg"), ["Surgical tape"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tape.name = "Paper tape"
+            tape.save()
+        self.assertEqual(self.names("surg"), [])
+        self.assertEqual(self.names("paper"), ["Paper tape"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tape.delete()
+        self.assertEqual(self.names("paper"), [])
+
+    def test_index_survives_renumbered_rowids(self):
+        # VACUUM may renumber the hidden rowids of a table keyed by UUID
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE inventory_item SET rowid = rowid + 1000")
+        self.assertEqual(self.names("gau"), ["Gauze swab"])
+
+    def test_rowid_linked_index_is_replaced(self):
+        with connection.cursor() as cursor:
+            for trigger in search.SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {trigger}")
+            cursor.execute(f"DROP TABLE {search.FTS_TABLE}")
+            cursor.execute(f"DROP TABLE {search.DOCS_TABLE}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {search.FTS_TABLE} USING fts5("
+                "name, sku, description, content='inventory_item', content_rowid='rowid')"
+            )
+
+        search.ensure_sqlite_index(connection)
+        self.assertIn(search.DOCS_TABLE, connection.introspection.table_names())
+        self.assertEqual(self.names("gau"), ["Gauze swab"])
+
+    def test_every_match_is_counted(self):
+        Item.objects.bulk_create([
+            Item(name=f"Swab {i}", sku=f"SWB-{i:03d}", organization=self.organization) for i in range(25)
+        ])
+        body = self.search("swab")
+        self.assertEqual(body["count"], 26)
+        self.assertEqual(len(body["results"]), 20)
+
+    def test_inventory_list_searches_through_the_item(self):
+        Inventory.objects.create(item=self.gauze, store=self.store, quantity_available=5)
+        rows = self.search("gauze", url="/api/store/inventories/")["results"]
+        self.assertEqual([row["item"]["id"] for row in rows], [str(self.gauze.pk)])
+
+    def test_other_backends_fall_back_to_icontains(self):
+        with mock.patch.object(search, "sqlite_fts_available", return_value=False):
+            self.assertEqual(self.names("glove"), ["Gauze swab", "Glove 0", "Glove 1", "Glove 2", "Nitrile glove"])
+            self.assertEqual(self.names("gze-2"), ["Gauze swab"])
+
+
+@mock.patch.object(autocomplete, "_load_in_background")
+class AutocompleteTests(InventoryTestData):
+
+    def setUp(self):
+        super().setUp()
+        autocomplete.reset()
+
+    def suggest(self, user=None, **params):
+        return self.client_for(user or self.manager).get("/api/store/items/autocomplete/", params)
+
+    def test_non_positive_limit_is_clamped(self, load):
+        response = self.suggest(q="Glove", limit=-5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_admin_organization_must_be_a_uuid(self, load):
+        response = self.suggest(self.admin, q="Glove", organization="not-a-uuid")
+        self.assertEqual(response.status_code, 400)
+        load.assert_not_called()
+
+    def test_admin_organization_must_exist(self, load):
+        response = self.suggest(self.admin, q="Glove", organization=str(uuid.uuid4()))
+        self.assertEqual(response.status_code, 400)
+        load.assert_not_called()
+
+    def test_admin_organization_is_searched(self, load):
+        response = self.suggest(self.admin, q="Glove", organization=str(self.organization.pk), limit=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+
+class AutocompleteIndexTests(InventoryTestData):
+    """Lookups served from a real index, loaded on the test thread instead of a background one"""
+
+    def setUp(self):
+        super().setUp()
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        self.surgical = Item.objects.create(name="Surgical Glove", sku="SRG-001", organization=self.organization)
+        self.gauze = Item.objects.create(name="Gauze Roll", sku="GZE-001", organization=self.organization)
+
+        def load_now(index):
+            # Called by suggest() with the registry lock held
+            index.load()
+            autocomplete._indexes[index.organization_id] = index
+            autocomplete._loading.discard(index.organization_id)
+
+        patcher = mock.patch.object(autocomplete, "_load_in_background", side_effect=load_now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The first request finds the index cold and answers from the database
+        self.assertEqual(self.suggest("glo")["source"], "database")
+
+    def suggest(self, q, limit=10):
+        response = self.client_for(self.manager).get("/api/store/items/autocomplete/", {"q": q, "limit": limit})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, q, limit=10):
+        body = self.suggest(q, limit)
+        self.assertEqual(body["source"], "index")
+        return [row["name"] for row in body["results"]]
+
+    def test_leading_matches_rank_ahead_of_later_words(self):
+        names = self.names("glo")
+        self.assertEqual(sorted(names[:3]), ["Glove 0", "Glove 1", "Glove 2"])
+        self.assertEqual(names[3:], ["Surgical Glove"])
+        self.assertEqual(self.names("GLO", limit=2), names[:2])
+        self.assertEqual(self.names("glove surg"), ["Surgical Glove"])
+        self.assertEqual(self.names("glv-001"), ["Glove 1"])
+        self.assertEqual(self.names("bandage"), [])
+
+    @override_settings(AUTOCOMPLETE_REFRESH_SECONDS=0)
+    def test_saved_items_are_picked_up_by_the_next_refresh(self):
+        self.gauze.name = "Crepe Bandage"
+        self.gauze.save()
+        self.items[1].is_active = False
+        self.items[1].save()
+        Item.objects.create(name="Glove Liner", sku="GLL-001", organization=self.organization)
+
+        self.assertEqual(self.names("ban"), ["Crepe Bandage"])
+        self.assertEqual(self.names("gau"), [])
+        self.assertEqual(self.names("glv-001"), [])
+        self.assertEqual(sorted(self.names("glo")[:3]), ["Glove 0", "Glove 2", "Glove Liner"])
+
+    def test_deleted_item_is_dropped_at_once(self):
+        self.assertEqual(self.names("gau"), ["Gauze Roll"])
+        self.gauze.delete()
+        self.assertEqual(self.names("gau"), [])
+        self.assertEqual(self.names("gze"), [])
+
+
+class BestSourceTests(InventoryTestData):
+    """Item 0 is cheapest at a vendor with a 100 unit minimum and fastest at another; item 1 has one offer"""
+
+    def setUp(self):
+        super().setUp()
+        self.courier = Store.objects.create(name="Courier", organization=self.organization, store_type="vendor")
+        self.other = Organization.objects.create(name="South Trust")
+        foreign_vendor = Store.objects.create(name="Foreign", organization=self.other, store_type="vendor")
+        self.foreign_item = Item.objects.create(name="Glove", sku="GLV-900", organization=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulk = VendorItem.objects.create(
+                vendor=self.vendor, item=self.items[0], price=2, lead_time_days=10, minimum_order_quantity=100
+            )
+            self.quick = VendorItem.objects.create(vendor=self.courier, item=self.items[0], price=3, lead_time_days=2)
+            # Another organization's vendor is never a source for this organization's item
+            VendorItem.objects.create(vendor=foreign_vendor, item=self.items[0], price=1, lead_time_days=1)
+            self.only = VendorItem.objects.create(vendor=self.vendor, item=self.items[1], price=5)
+            self.foreign = VendorItem.objects.create(vendor=foreign_vendor, item=self.foreign_item, price=4)
+
+    def sources(self, lines, strategy="cheapest", organization_id=None):
+        return {line["item"]: line["vendor_item"] for line in sourcing.best_sources(lines, strategy, organization_id)}
+
+    def test_cheapest_and_fastest(self):
+        lines = [(self.items[0].pk, 100), (self.items[1].pk, 1)]
+        self.assertEqual(self.sources(lines), {self.items[0].pk: self.bulk.pk, self.items[1].pk: self.only.pk})
+        self.assertEqual(self.sources(lines, "fastest"), {self.items[0].pk: self.quick.pk, self.items[1].pk: self.only.pk})
+
+    def test_minimum_order_quantity_falls_back_to_the_next_best_offer(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.sources([(self.items[0].pk, 10)]), {self.items[0].pk: self.quick.pk})
+        # Repeated items are summed before the minimum is checked
+        self.assertEqual(self.sources([(self.items[0].pk, 60), (self.items[0].pk, 40)]), {self.items[0].pk: self.bulk.pk})
+
+    def test_lines_are_scoped_to_the_organization(self):
+        lines = [(self.items[1].pk, 1), (self.foreign_item.pk, 1)]
+        self.assertEqual(
+            self.sources(lines, organization_id=self.organization.pk),
+            {self.items[1].pk: self.only.pk, self.foreign_item.pk: None},
+        )
+        self.assertEqual(
+            self.sources(lines, organization_id=self.other.pk),
+            {self.items[1].pk: None, self.foreign_item.pk: self.foreign.pk},
+        )
+
+    def test_migration_backfills_offers_entered_before_the_index(self):
+        expected = set(VendorPriceIndex.objects.values_list("item_id", "cheapest_id", "fastest_id"))
+        VendorPriceIndex.objects.all().delete()
+
+        migration = importlib.import_module("inventory.migrations.0012_backfill_vendor_price_index")
+        state = MigrationLoader(connection).project_state(("inventory", "0012_backfill_vendor_price_index"))
+        migration.backfill_price_index(state.apps, mock.Mock(connection=connection))
+        self.assertEqual(set(VendorPriceIndex.objects.values_list("item_id", "cheapest_id", "fastest_id")), expected)
+        self.assertEqual(len(expected), 3)
+
+
+class PurchaseOrderTests(InventoryTestData):
+    """Every row low on stock; items 0 and 2 are cheapest at one vendor, item 1 at another"""
+    url = "/api/store/purchase-orders/"
+
+    def setUp(self):
+        super().setUp()
+        self.second_vendor = Store.objects.create(
+            name="Wholesaler", organization=self.organization, store_type="vendor"
+        )
+        # The price index is refreshed on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for item, cheap, dear in [
+                (self.items[0], self.vendor, self.second_vendor),
+                (self.items[1], self.second_vendor, self.vendor),
+                (self.items[2], self.vendor, self.second_vendor),
+            ]:
+                VendorItem.objects.create(vendor=cheap, item=item, price=2)
+                VendorItem.objects.create(vendor=dear, item=item, price=3)
+        Inventory.objects.filter(store=self.store).update(quantity_available=5, status="low_stock")
+
+    def post(self, path, body=None, user=None):
+        return self.client_for(user or self.manager).post(f"{self.url}{path}", body or {}, format="json")
+
+    def generate(self, **kwargs):
+        response = self.post("generate/", **kwargs)
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def test_lines_are_grouped_by_cheapest_vendor(self):
+        orders = self.generate()
+
+        self.assertEqual(
+            sorted((order["vendor"], sorted(line["inventory"] for line in order["lines"])) for order in orders),
+            sorted([
+                (str(self.vendor.pk), sorted([str(self.inventories[0].pk), str(self.inventories[2].pk)])),
+                (str(self.second_vendor.pk), [str(self.inventories[1].pk)]),
+            ]),
+        )
+        self.assertEqual({line["quantity"] for order in orders for line in order["lines"]}, {995})
+        self.assertEqual({order["status"] for order in orders}, {"draft"})
+
+    def test_rows_on_an_open_order_are_skipped_until_it_is_cancelled(self):
+        first = self.generate()
+        self.assertEqual(self.generate(), [])
+
+        for order in first:
+            self.assertEqual(self.post(f"{order['id']}/cancel/").status_code, 200)
+        self.assertEqual(sum(len(order["lines"]) for order in self.generate()), 3)
+
+    def test_concurrent_run_does_not_order_the_same_shortfall_twice(self):
+        real_lock = procurement._lock_candidates
+        raced = []
+
+        def competitor_first(candidates):
+            # Another run commits its orders while this one waits for the row locks
+            locked = real_lock(candidates)
+            if not raced:
+                raced.append(True)
+                procurement.generate_purchase_orders(self.organization.pk)
+            return locked
+
+        with mock.patch.object(procurement, "_lock_candidates", competitor_first):
+            self.assertEqual(self.generate(), [])
+        self.assertEqual(PurchaseOrderLine.objects.count(), 3)
+
+    def test_submit_then_receive_posts_stock_in_once(self):
+        order = next(order for order in self.generate() if order["vendor"] == str(self.vendor.pk))
+        self.assertEqual(self.post(f"{order['id']}/submit/").json()["status"], "submitted")
+        self.assertEqual(self.post(f"{order['id']}/submit/").status_code, 400)
+
+        with mock.patch.object(procurement, "post_movements", wraps=procurement.post_movements) as posted:
+            response = self.post(f"{order['id']}/receive/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(posted.call_count, 1)
+        (movements,), _ = posted.call_args
+        self.assertEqual(
+            sorted((movement.movement_type, movement.quantity, movement.source_id) for movement in movements),
+            [("stock_in", 995, order["po_number"])] * 2,
+        )
+
+        self.assertEqual(
+            dict(Inventory.objects.filter(store=self.store).values_list("pk", "quantity_available")),
+            {self.inventories[0].pk: 1000, self.inventories[1].pk: 5, self.inventories[2].pk: 1000},
+        )
+        received = PurchaseOrder.objects.get(pk=order["id"])
+        self.assertEqual((received.status, received.received_by), ("received", self.manager))
+        self.assertEqual(self.post(f"{order['id']}/receive/").status_code, 400)
+        self.assertEqual(self.post(f"{order['id']}/cancel/").status_code, 400)
+
+    def test_admin_organization_must_be_a_uuid(self):
+        response = self.post("generate/", {"organization": "not-a-uuid"}, user=self.admin)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "organization must be a UUID"})
+
+        other = Organization.objects.create(name="South Trust")
+        self.assertEqual(self.generate(body={"organization": str(other.pk)}, user=self.admin), [])
+        self.assertEqual(len(self.generate(body={"organization": str(self.organization.pk)}, user=self.admin)), 2)
+
+
+class ItemImportTests(InventoryTestData):
+
+    def run_import(self, content, chunk_size=100):
+        return ItemImporter(self.organization, chunk_size=chunk_size).run(text_stream(io.BytesIO(content)))
+
+    def test_non_utf8_file_reports_the_row_where_reading_stopped(self):
+        rows = "".join(f"Swab {i},SWB-{i:04d}\n" for i in range(600)).encode()
+        result = self.run_import(b"name,sku\n" + rows + "Caf\u00e9 gauze,GZE-1\n".encode("cp1252"))
+
+        self.assertEqual(result.error_count, 1)
+        self.assertIn("UTF-8", result.errors[0]["error"])
+        # Rows decoded before the bad byte are imported, and reported as such
+        self.assertEqual(result.imported, result.rows)
+        self.assertGreater(result.imported, 0)
+        self.assertEqual(Item.objects.filter(sku__startswith="SWB-").count(), result.imported)
+
+    def test_nul_bytes_are_a_row_error(self):
+        result = self.run_import(b"name,sku\nGauze\x00,GZE-1\nTape,TPE-1\n")
+        self.assertEqual(result.as_dict()["errors"], [{"row": 2, "error": "Row contains NUL characters"}])
+        self.assertEqual(result.imported, 1)
+
+    def test_non_utf8_upload_is_not_a_server_error(self):
+        upload = io.BytesIO("name,sku\nCaf\u00e9,CAF-1\n".encode("cp1252"))
+        upload.name = "items.csv"
+        response = self.client_for(self.manager).post("/api/store/items/import_csv/", {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["error_count"], 1)
+
+    def test_sku_taken_by_another_tenant_after_the_check_is_not_overwritten(self):
+        other = Organization.objects.create(name="South Trust")
+        foreign = Item.objects.create(name="Theirs", sku="SHR-001", organization=other)
+        real_build = ItemImporter.build
+        calls = []
+
+        def stale_build(importer, cleaned, result):
+            # The first attempt misses the other tenant's row, as a concurrent import would
+            calls.append(importer)
+            if len(calls) == 1:
+                return [Item(organization=importer.organization, **values) for _, values in cleaned]
+            return real_build(importer, cleaned, result)
+
+        with mock.patch.object(ItemImporter, "build", stale_build):
+            result = self.run_import(b"name,sku\nOurs,SHR-001\nTape,TPE-1\n")
+
+        foreign.refresh_from_db()
+        self.assertEqual((foreign.name, foreign.organization_id), ("Theirs", other.pk))
+        self.assertEqual(result.errors, [{"row": 2, "error": "SKU SHR-001 belongs to another organization"}])
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(len(calls), 2)
+
+
+class StockSnapshotTests(InventoryTestData):
+    """A store whose stock all arrived through movements, so the full ledger replay is exact"""
+
+    # (days ago, hour, item index, movement type, quantity)
+    LEDGER = [
+        (8, 9, 0, "stock_in", 40), (8, 15, 1, "stock_in", 25),
+        (7, 10, 0, "reserve", 10), (6, 11, 0, "stock_out", 5),
+        (6, 16, 1, "write_off", 3), (5, 9, 0, "release", 4),
+        (4, 14, 1, "reserve", 7), (3, 10, 0, "stock_in", 12),
+        (2, 13, 1, "release", 2), (1, 8, 0, "stock_out", 6),
+        (0, 0, 1, "stock_in", 9),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.ledger_store = Store.objects.create(name="Ledger", organization=self.organization)
+        self.rows = [
+            Inventory.objects.create(item=item, store=self.ledger_store, quantity_available=0)
+            for item in self.items[:2]
+        ]
+        now = timezone.now()
+        Inventory.objects.filter(store=self.ledger_store).update(created_at=now - timedelta(days=10))
+        for days_ago, hour, index, movement_type, quantity in self.LEDGER:
+            movement = InventoryMovement(
+                inventory=Inventory.objects.get(pk=self.rows[index].pk),
+                movement_type=movement_type, quantity=quantity, performed_by=self.manager,
+            )
+            movement.save()
+            at = (now - timedelta(days=days_ago)).replace(hour=hour, minute=30)
+            InventoryMovement.objects.filter(pk=movement.pk).update(created_at=min(at, now))
+
+    @staticmethod
+    def stocked(levels):
+        return {pk: level for pk, level in levels.items() if level != [0, 0]}
+
+    def test_snapshot_plus_delta_matches_full_replay(self):
+        snapshots.capture_snapshots([self.ledger_store.pk])
+        snapshots.backfill_snapshots(self.ledger_store.pk, 4)
+
+        now = timezone.now()
+        for days_ago in range(9, -1, -1):
+            for hour in (7, 12, 23):
+                moment = min((now - timedelta(days=days_ago)).replace(hour=hour, minute=0), now)
+                with self.subTest(days_ago=days_ago, hour=hour):
+                    levels, _ = snapshots.stock_as_of(self.ledger_store.pk, moment)
+                    self.assertEqual(
+                        self.stocked(levels),
+                        self.stocked(snapshots.replay_stock(self.ledger_store.pk, moment)),
+                    )
+
+    def test_capture_counts_only_inserted_snapshots(self):
+        self.assertEqual(snapshots.capture_snapshots([self.ledger_store.pk]), 1)
+        self.assertEqual(snapshots.capture_snapshots([self.ledger_store.pk]), 0)
+
+    def test_capture_does_not_count_snapshots_a_concurrent_run_inserted(self):
+        real_bulk_create = StockSnapshot.objects.bulk_create
+        raced = []
+
+        def competitor_first(batch, **kwargs):
+            # Another run snapshots the ledger store between the read and the insert
+            if batch and not raced:
+                raced.append(True)
+                snapshots.capture_snapshots([self.ledger_store.pk])
+            return real_bulk_create(batch, **kwargs)
+
+        with mock.patch.object(StockSnapshot.objects, "bulk_create", competitor_first):
+            created = snapshots.capture_snapshots([self.store.pk, self.ledger_store.pk])
+
+        self.assertEqual(created, 1)
+        self.assertEqual(StockSnapshot.objects.filter(day=timezone.localdate()).count(), 2)
+
+
+class MovementSaveTests(InventoryTestData):
+
+    def test_new_movement_is_applied_once(self):
+        inventory = self.inventories[0]
+        movement = InventoryMovement(
+            inventory=Inventory.objects.get(pk=inventory.pk), movement_type="stock_in", quantity=5,
+            performed_by=self.manager,
+        )
+        # The UUID default fills pk before the first save, so pk alone cannot tell a new row
+        self.assertIsNotNone(movement.pk)
+        movement.save()
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.quantity_available, 55)
+
+        movement.notes = "Counted twice"
+        movement.save()
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.quantity_available, 55)
+
+
+    def test_movement_loaded_from_the_database_is_not_reapplied(self):
+        inventory = self.inventories[0]
+        InventoryMovement(inventory=inventory, movement_type="stock_out", quantity=5, performed_by=self.manager).save()
+
+        movement = InventoryMovement.objects.get(inventory=inventory)
+        movement.save(update_fields=["notes"])
+        movement.save()
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.quantity_available, 45)
+
+    def test_movement_posted_through_the_api_is_applied_once(self):
+        inventory = self.inventories[0]
+        client = self.client_for(self.manager)
+        response = client.post("/api/store/inventory-movements/", {
+            "inventory": str(inventory.pk), "movement_type": "stock_in", "quantity": 5,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.quantity_available, 55)
+
+        movement = InventoryMovement.objects.get(inventory=inventory)
+        response = self.client_for(self.admin).patch(
+            f"/api/store/inventory-movements/{movement.pk}/", {"notes": "Checked"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.quantity_available, 55)
+
+
+class MovementLedgerPaginationTests(InventoryTestData):
+    """Ten movements with tied quantities, the older half archived, served three to a page"""
+    url = "/api/store/inventory-movements/"
+    QUANTITIES = [3, 1, 3, 2, 3, 1, 2, 3, 2, 1]
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        for days_ago, quantity in enumerate(self.QUANTITIES):
+            movement = InventoryMovement.objects.create(
+                inventory=Inventory.objects.get(pk=self.inventories[0].pk), movement_type="stock_in",
+                quantity=quantity, performed_by=self.manager,
+            )
+            InventoryMovement.objects.filter(pk=movement.pk).update(created_at=now - timedelta(days=days_ago))
+        archive_movements(now - timedelta(days=4, hours=12))
+        patcher = mock.patch.object(LedgerCursorPagination, "page_size", 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def movements(self, *key):
+        rows = list(InventoryMovement.objects.values("id", "quantity", "created_at"))
+        rows += list(ArchivedMovement.objects.values("id", "quantity", "created_at"))
+        return [str(row["id"]) for row in sorted(rows, key=lambda row: tuple(key_of(row) for key_of in key))]
+
+    def walk(self, url):
+        """(pages of ids, ledger queries per page) following the next links from ``url``"""
+        client = self.client_for(self.admin)
+        pages, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                body = client.get(url).json()
+            pages.append([row["id"] for row in body["results"]])
+            queries.append([
+                query["sql"] for query in captured.captured_queries
+                if 'FROM "inventory_inventorymovement"' in query["sql"]
+                or 'FROM "inventory_archivedmovement"' in query["sql"]
+            ])
+            url = body["next"]
+        return pages, queries
+
+    def test_ties_are_broken_by_pk_across_both_tiers(self):
+        self.assertEqual(ArchivedMovement.objects.count(), 5)
+        pages, _ = self.walk(f"{self.url}?ordering=quantity")
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertEqual(
+            sum(pages, []),
+            self.movements(lambda row: row["quantity"], lambda row: row["id"]),
+        )
+
+    def test_deep_pages_read_one_page_from_each_tier(self):
+        _, queries = self.walk(f"{self.url}?ordering=-quantity")
+
+        self.assertEqual([len(page) for page in queries], [2, 2, 2, 2])
+        for page in queries:
+            for sql in page:
+                self.assertIn("LIMIT 4", sql)
+
+    def test_previous_link_returns_the_page_before(self):
+        client = self.client_for(self.admin)
+        pages, _ = self.walk(f"{self.url}?ordering=quantity")
+        body = client.get(f"{self.url}?ordering=quantity").json()
+        for _ in range(2):
+            body = client.get(body["next"]).json()
+
+        body = client.get(body["previous"]).json()
+        self.assertEqual([row["id"] for row in body["results"]], pages[1])
+        body = client.get(body["previous"]).json()
+        self.assertEqual([row["id"] for row in body["results"]], pages[0])
+        self.assertIsNone(body["previous"])
+
+    def test_newest_pages_do_not_read_the_archive(self):
+        pages, queries = self.walk(self.url)
+
+        self.assertEqual(
+            sum(pages, []),
+            self.movements(lambda row: -row["created_at"].timestamp(), lambda row: row["id"]),
+        )
+        self.assertEqual(len(queries[0]), 1)
+        self.assertNotIn('"inventory_archivedmovement"', queries[0][0])
+
+    def test_malformed_cursor_is_404(self):
+        # base64 of "p=nope"
+        response = self.client_for(self.admin).get(self.url, {"cursor": "cD1ub3Bl"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExpirySweepTests(InventoryTestData):
+
+    def set_expiry(self, inventory, days):
+        Inventory.objects.filter(pk=inventory.pk).update(expiry_date=timezone.localdate() + timedelta(days=days))
+
+    def sweep(self, **kwargs):
+        return sweep_expiry(self.organization.pk, **kwargs)[self.organization.pk]
+
+    def test_alerts_get_severity_and_message_once(self):
+        for inventory, days in zip(self.inventories, (-2, 5, 20)):
+            self.set_expiry(inventory, days)
+
+        self.assertEqual(self.sweep(), {"expired": 1, "alerts": 3, "written_off": 0})
+        expiry_date = timezone.localdate() + timedelta(days=5)
+        self.assertEqual(
+            sorted(StockAlert.objects.values_list("severity", "message")),
+            [
+                ("critical", f"Glove 0 at Main expired on {timezone.localdate() - timedelta(days=2)}"),
+                ("high", f"Glove 1 at Main expires on {expiry_date} (5 days left)"),
+                ("medium", f"Glove 2 at Main expires on {timezone.localdate() + timedelta(days=20)} (20 days left)"),
+            ],
+        )
+        self.assertEqual(self.sweep(), {"expired": 0, "alerts": 0, "written_off": 0})
+
+    def test_write_off_posts_movements_and_buckets(self):
+        self.set_expiry(self.inventories[0], -1)
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = self.sweep(write_off=True, user=self.manager)
+
+        self.assertEqual(counts, {"expired": 1, "alerts": 1, "written_off": 1})
+        inventory = Inventory.objects.get(pk=self.inventories[0].pk)
+        self.assertEqual((inventory.status, inventory.quantity_available), ("expired", 0))
+        movement = InventoryMovement.objects.get()
+        self.assertEqual(
+            (movement.inventory_id, movement.movement_type, movement.quantity, movement.performed_by_id),
+            (inventory.pk, "write_off", 50, self.manager.pk),
+        )
+        bucket = MovementDailyBucket.objects.get(movement_type="write_off")
+        self.assertEqual((bucket.item_id, bucket.quantity_total, bucket.movement_count), (self.items[0].pk, 50, 1))
+
+    def test_statement_count_does_not_grow_with_rows(self):
+        def queries_for(inventories):
+            for inventory in inventories:
+                self.set_expiry(inventory, -1)
+            with CaptureQueriesContext(connection) as queries:
+                self.sweep(write_off=True)
+            Inventory.objects.update(status="available", quantity_available=50)
+            StockAlert.objects.all().delete()
+            return len(queries.captured_queries)
+
+        self.assertEqual(queries_for(self.inventories[:1]), queries_for(self.inventories))
+
+
+class AsyncDashboardTests(InventoryTestData):
+    """The async dashboard reads return what the viewsets they mirror return"""
+
+    SYNC_PATHS = {
+        "/api/store/async/inventories/summary/": "/api/store/inventories/summary/",
+        "/api/store/async/inventories/low_stock/": "/api/store/inventories/low_stock/",
+        "/api/store/async/inventories/out_of_stock/": "/api/store/inventories/out_of_stock/",
+        "/api/store/async/stock-alerts/": "/api/store/stock-alerts/",
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Inventory.objects.filter(pk=cls.inventories[1].pk).update(quantity_available=5, status="low_stock")
+        Inventory.objects.filter(pk=cls.inventories[2].pk).update(quantity_available=0, status="out_of_stock")
+
+        other = Organization.objects.create(name="South Trust")
+        other_item = Item.objects.create(name="Mask", sku="MSK-001", organization=other)
+        other_inventory = Inventory.objects.create(
+            item=other_item, store=Store.objects.create(name="South", organization=other), quantity_available=1
+        )
+        Inventory.objects.filter(pk=other_inventory.pk).update(status="low_stock")
+
+        # More open alerts than one page, plus another organization's and a resolved one
+        severities = ["low", "medium", "high", "critical"]
+        alerts = [
+            StockAlert.objects.create(
+                inventory=cls.inventories[index % 3], alert_type="low_stock",
+                severity=severities[index % 4], message=f"Alert {index}",
+            )
+            for index in range(22)
+        ]
+        alerts.append(StockAlert.objects.create(inventory=other_inventory, alert_type="low_stock", message="South"))
+        StockAlert.objects.create(inventory=cls.inventories[0], alert_type="expiry", message="Done", is_resolved=True)
+        start = timezone.now()
+        for index, alert in enumerate(alerts):
+            StockAlert.objects.filter(pk=alert.pk).update(created_at=start - timedelta(minutes=index))
+
+    def get_async(self, path, user=None, **params):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"} if user else {}
+        # A lazy relation lookup in the view would raise SynchronousOnlyOperation here
+        return async_to_sync(AsyncClient().get)(path, params, headers=headers)
+
+    def assertMatchesViewset(self, path, user, **params):
+        response = self.get_async(path, user, **params)
+        expected = self.client_for(user).get(self.SYNC_PATHS[path], params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(expected.status_code, 200)
+        body = response.json()
+        if isinstance(body, dict) and "next" in body:
+            for link in ("next", "previous"):
+                if body[link]:
+                    body[link] = body[link].replace("/api/store/async/", "/api/store/")
+        self.assertEqual(body, expected.json())
+        return body
+
+    def test_requests_without_a_token_are_rejected(self):
+        for path in self.SYNC_PATHS:
+            response = self.get_async(path)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json(), {"detail": "Authentication credentials were not provided."})
+
+    def test_inventory_reads_match_the_viewset(self):
+        for user, total_items in ((self.admin, 4), (self.manager, 3)):
+            summary = self.assertMatchesViewset("/api/store/async/inventories/summary/", user)
+            self.assertEqual(summary["total_items"], total_items)
+            low_stock = self.assertMatchesViewset("/api/store/async/inventories/low_stock/", user)
+            self.assertEqual(len(low_stock), total_items - 2)
+            self.assertMatchesViewset("/api/store/async/inventories/out_of_stock/", user)
+
+    def test_stock_alerts_match_the_viewset_page_by_page(self):
+        for user, count in ((self.admin, 23), (self.manager, 22)):
+            first = self.assertMatchesViewset("/api/store/async/stock-alerts/", user)
+            self.assertEqual(first["count"], count)
+            self.assertIsNotNone(first["next"])
+            second = self.assertMatchesViewset("/api/store/async/stock-alerts/", user, page=2)
+            self.assertEqual(len(first["results"]) + len(second["results"]), count)
+            self.assertMatchesViewset("/api/store/async/stock-alerts/", user, severity="high")
+
+    def test_out_of_range_page(self):
+        response = self.get_async("/api/store/async/stock-alerts/", self.manager, page=3)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), self.client_for(self.manager).get("/api/store/stock-alerts/?page=3").json())
@@ -2,8 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ItemViewSet, StoreViewSet, InventoryViewSet, 
-    InventoryMovementViewSet, VendorItemViewSet, StockAlertViewSet
+    InventoryMovementViewSet, VendorItemViewSet, StockAlertViewSet,
+    PurchaseOrderViewSet
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register(r"items", ItemViewSet)
@@ -12,7 +14,17 @@ router.register(r"inventories", InventoryViewSet)
 router.register(r"inventory-movements", InventoryMovementViewSet)
 router.register(r"vendor-items", VendorItemViewSet)
 router.register(r"stock-alerts", StockAlertViewSet)
+router.register(r"purchase-orders", PurchaseOrderViewSet)
+
+# Async mirrors of the dashboard reads; they only pay off under backend.asgi
+async_urlpatterns = [
+    path("inventories/summary/", async_views.inventory_summary, name="async-inventory-summary"),
+    path("inventories/low_stock/", async_views.low_stock, name="async-inventory-low-stock"),
+    path("inventories/out_of_stock/", async_views.out_of_stock, name="async-inventory-out-of-stock"),
+    path("stock-alerts/", async_views.stock_alerts, name="async-stock-alerts"),
+]
 
 urlpatterns = [
+    path("async/", include(async_urlpatterns)),
     path("", include(router.urls)),
 ]
\ No newline at end of file
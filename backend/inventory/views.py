@@ -1,16 +1,37 @@
+import uuid
+
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, F, Sum
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from org.models import Organization
 
-from .models import Item, Store, Inventory, InventoryMovement, VendorItem, StockAlert
+from core.cache import cache_response
+from core.concurrency import OptimisticConcurrencyMixin
+from core.conditional import conditional_response
+from core.fieldsets import SparseFieldsetMixin
+from core.idempotency import idempotent
+
+from .models import (
+    Item, Store, Inventory, InventoryMovement, ArchivedMovement, VendorItem, StockAlert, PurchaseOrder
+)
 from .serializers import (
     ItemSerializer, StoreSerializer, InventorySerializer, 
     InventoryMovementSerializer, VendorItemSerializer, StockAlertSerializer,
-    CreateInventoryMovementSerializer
+    CreateInventoryMovementSerializer, SourcingRequestSerializer, PurchaseOrderSerializer
 )
+from .search import ItemSearchFilter
+from . import autocomplete, sourcing, procurement, snapshots
+from .archive import LedgerCursorPagination, MovementLedger
+from .importers import IMPORTERS, text_stream
 
 
 # Permissions
@@ -50,17 +71,47 @@ class IsInOrganization(permissions.BasePermission):
         return False
 
 
+def run_csv_import(request, kind):
+    """Shared handler for the catalogue CSV upload actions"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({"error": "A CSV file is required in the 'file' field"}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    organization = user.organization
+    if (user.is_superuser or user.role == 'admin') and request.data.get('organization'):
+        organization = get_object_or_404(Organization, pk=request.data['organization'])
+    if organization is None:
+        return Response({"error": "organization is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    chunk_size = getattr(settings, 'CATALOGUE_IMPORT_CHUNK_SIZE', 1000)
+    result = IMPORTERS[kind](organization, chunk_size=chunk_size).run(text_stream(upload))
+    return Response(result.as_dict())
+
+
 # ViewSets
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(OptimisticConcurrencyMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Item.objects.filter(is_active=True).select_related('organization')
     serializer_class = ItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsInventoryAdmin, IsInOrganization]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ItemSearchFilter]
     filterset_fields = ['category', 'is_active']
-    search_fields = ['name', 'sku', 'description']
+    # name, sku and description are matched through the catalogue search index
+    item_search_path = ''
+    search_fields = []
     ordering_fields = ['name', 'sku', 'created_at']
     ordering = ['name']
 
+    @conditional_response("items")
+    @cache_response("items")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response("items")
+    @cache_response("items")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         """Filter by user's organization"""
         user = self.request.user
@@ -75,6 +126,45 @@ class ItemViewSet(viewsets.ModelViewSet):
         
         return Item.objects.none()
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Type-ahead suggestions on item name words and SKU prefixes"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            limit = 10
+
+        user = request.user
+        organization_id = user.organization_id
+        if (user.is_superuser or user.role == 'admin') and request.query_params.get('organization'):
+            # Checked before it can name a cached index or a loader thread
+            try:
+                organization_id = uuid.UUID(request.query_params['organization'])
+            except ValueError:
+                organization_id = None
+            if organization_id is None or not Organization.objects.filter(pk=organization_id).exists():
+                return Response(
+                    {"error": "organization must be the id of an existing organization"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if not organization_id:
+            return Response(
+                {"error": "organization parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results, source = autocomplete.suggest(
+            str(organization_id), query, limit,
+            Item.objects.filter(organization_id=organization_id, is_active=True)
+        )
+        return Response({"results": results, "source": source})
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """Bulk upsert items by SKU from an uploaded CSV file"""
+        return run_csv_import(request, 'items')
+
     def perform_create(self, serializer):
         """Set organization from user if not provided"""
         if not serializer.validated_data.get('organization'):
@@ -83,7 +173,7 @@ class ItemViewSet(viewsets.ModelViewSet):
             serializer.save()
 
 
-class StoreViewSet(viewsets.ModelViewSet):
+class StoreViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Store.objects.filter(is_active=True).select_related('organization', 'department')
     serializer_class = StoreSerializer
     permission_classes = [permissions.IsAuthenticated, IsInventoryAdmin, IsInOrganization]
@@ -93,6 +183,16 @@ class StoreViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
+    @conditional_response("stores")
+    @cache_response("stores")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response("stores")
+    @cache_response("stores")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         """Filter by user's organization"""
         user = self.request.user
@@ -105,14 +205,54 @@ class StoreViewSet(viewsets.ModelViewSet):
         
         return Store.objects.none()
 
-
-class InventoryViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def stock_as_of(self, request, pk=None):
+        """Stock levels of this store at the end of ?date=YYYY-MM-DD or at ?at=<ISO datetime>"""
+        store = self.get_object()
+
+        try:
+            moment = parse_datetime(request.query_params.get('at', ''))
+            day = parse_date(request.query_params.get('date', ''))
+        except ValueError:
+            moment = day = None
+
+        if moment is None:
+            if day is None:
+                return Response({"error": "Provide date=YYYY-MM-DD or at=<ISO datetime>"}, status=status.HTTP_400_BAD_REQUEST)
+            moment = snapshots.end_of_day(day)
+        elif timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+
+        levels, source = snapshots.stock_as_of(store.pk, moment)
+        inventories = Inventory.objects.filter(pk__in=list(levels)).values_list('pk', 'item_id', 'item__name', 'item__sku')
+
+        return Response({
+            "store": store.pk,
+            "as_of": moment,
+            "snapshot": source["snapshot"],
+            "results": [
+                {
+                    "inventory": pk,
+                    "item": item_id,
+                    "item_name": name,
+                    "item_sku": sku,
+                    "quantity_available": levels[str(pk)][0],
+                    "reserved_quantity": levels[str(pk)][1],
+                }
+                for pk, item_id, name, sku in inventories
+            ],
+        })
+
+
+class InventoryViewSet(OptimisticConcurrencyMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Inventory.objects.select_related('item', 'store')
     serializer_class = InventorySerializer
     permission_classes = [permissions.IsAuthenticated, IsInventoryAdmin, IsInOrganization]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ItemSearchFilter]
     filterset_fields = ['store', 'status', 'item__category']
-    search_fields = ['item__name', 'item__sku', 'location', 'batch_number']
+    # item name/sku go through the catalogue search index
+    item_search_path = 'item'
+    search_fields = ['location', 'batch_number']
     ordering_fields = ['item__name', 'quantity_available', 'updated_at']
     ordering = ['item__name']
 
@@ -130,10 +270,13 @@ class InventoryViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def movements(self, request, pk=None):
-        """Get all movements for this inventory"""
+        """Get all movements for this inventory, archived ones included"""
         inventory = self.get_object()
-        movements = inventory.movements.all().order_by('-created_at')
-        serializer = InventoryMovementSerializer(movements, many=True)
+        movements = MovementLedger(
+            inventory.movements.order_by('-created_at'),
+            inventory.archived_movements.all(),
+        )
+        serializer = InventoryMovementSerializer(movements[:], many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
@@ -168,7 +311,7 @@ class InventoryViewSet(viewsets.ModelViewSet):
         return Response(summary)
 
 
-class InventoryMovementViewSet(viewsets.ModelViewSet):
+class InventoryMovementViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = InventoryMovement.objects.select_related(
         'inventory', 'performed_by', 'destination_store'
     ).order_by('-created_at')
@@ -178,6 +321,7 @@ class InventoryMovementViewSet(viewsets.ModelViewSet):
     search_fields = ['inventory__item__name', 'source_id', 'notes']
     ordering_fields = ['created_at', 'quantity']
     ordering = ['-created_at']
+    pagination_class = LedgerCursorPagination
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -196,6 +340,45 @@ class InventoryMovementViewSet(viewsets.ModelViewSet):
         
         return InventoryMovement.objects.none()
 
+    def get_archived_queryset(self):
+        """Archived movements, with the same isolation as get_queryset"""
+        queryset = ArchivedMovement.objects.select_related('inventory', 'performed_by', 'destination_store')
+        user = self.request.user
+
+        if user.is_superuser or user.role == 'admin':
+            return queryset
+
+        if user.organization:
+            return queryset.filter(inventory__item__organization=user.organization)
+
+        return ArchivedMovement.objects.none()
+
+    def get_ledger(self):
+        """Hot and archived movements, filtered alike, as one sequence"""
+        return MovementLedger(
+            self.filter_queryset(self.get_queryset()),
+            self.filter_queryset(self.get_archived_queryset()),
+        )
+
+    def list(self, request, *args, **kwargs):
+        ledger = self.get_ledger()
+        page = self.paginate_queryset(ledger)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(ledger[:], many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            movement = get_object_or_404(self.filter_queryset(self.get_archived_queryset()), pk=kwargs['pk'])
+            self.check_object_permissions(request, movement)
+            return Response(self.get_serializer(movement).data)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Set performed_by to current user"""
         serializer.save(performed_by=self.request.user)
@@ -203,7 +386,7 @@ class InventoryMovementViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Get recent movements"""
-        queryset = self.get_queryset()[:50]
+        queryset = MovementLedger(self.get_queryset(), self.get_archived_queryset())[:50]
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -214,7 +397,7 @@ class InventoryMovementViewSet(viewsets.ModelViewSet):
         pass
 
 
-class VendorItemViewSet(viewsets.ModelViewSet):
+class VendorItemViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = VendorItem.objects.filter(is_active=True).select_related('vendor', 'item')
     serializer_class = VendorItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsInventoryAdmin, IsInOrganization]
@@ -224,6 +407,14 @@ class VendorItemViewSet(viewsets.ModelViewSet):
     ordering_fields = ['item__name', 'price', 'lead_time_days']
     ordering = ['item__name']
 
+    @cache_response("vendor_items")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response("vendor_items")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         """Multi-org isolation"""
         user = self.request.user
@@ -239,8 +430,29 @@ class VendorItemViewSet(viewsets.ModelViewSet):
         
         return VendorItem.objects.none()
 
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """Bulk upsert vendor price lists by (vendor code, SKU) from an uploaded CSV file"""
+        return run_csv_import(request, 'vendor-items')
 
-class StockAlertViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['post'])
+    def best_sources(self, request):
+        """Cheapest or fastest vendor per basket line, respecting minimum order quantities"""
+        serializer = SourcingRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user = request.user
+        organization_id = None if user.is_superuser or user.role == 'admin' else user.organization_id
+        strategy = serializer.validated_data['strategy']
+        lines = [(line['item'], line['quantity']) for line in serializer.validated_data['lines']]
+
+        return Response({
+            "strategy": strategy,
+            "lines": sourcing.best_sources(lines, strategy, organization_id),
+        })
+
+
+class StockAlertViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = StockAlert.objects.filter(is_resolved=False).select_related('inventory', 'resolved_by')
     serializer_class = StockAlertSerializer
     permission_classes = [permissions.IsAuthenticated, IsInventoryAdmin, IsInOrganization]
@@ -268,6 +480,94 @@ class StockAlertViewSet(viewsets.ReadOnlyModelViewSet):
         alert.is_resolved = True
         alert.resolved_by = request.user
         alert.resolved_at = timezone.now()
-        alert.save()
+        alert.save(update_fields=['is_resolved', 'resolved_by', 'resolved_at'])
         
-        return Response({"message": "Alert resolved successfully"})
\ No newline at end of file
+        return Response({"message": "Alert resolved successfully"})
+
+
+class PurchaseOrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = PurchaseOrder.objects.select_related(
+        'vendor', 'created_by', 'received_by'
+    ).prefetch_related('lines__inventory__item', 'lines__inventory__store')
+    serializer_class = PurchaseOrderSerializer
+    permission_classes = [permissions.IsAuthenticated, IsInventoryAdmin]
+    http_method_names = ['get', 'patch', 'post', 'head', 'options']
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['status', 'vendor', 'organization']
+    search_fields = ['po_number', 'vendor__name']
+    ordering_fields = ['created_at', 'status']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        """Multi-org isolation"""
+        user = self.request.user
+
+        if user.is_superuser or user.role == 'admin':
+            return self.queryset
+
+        if user.organization:
+            return self.queryset.filter(organization=user.organization)
+
+        return PurchaseOrder.objects.none()
+
+    def create(self, request, *args, **kwargs):
+        return Response(
+            {"error": "Purchase orders are created through the generate action"},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Draft purchase orders, one per vendor, for every low or out-of-stock inventory row"""
+        user = request.user
+        organization_id = request.data.get('organization')
+        if not (user.is_superuser or user.role == 'admin'):
+            organization_id = user.organization_id
+            if not organization_id:
+                return Response({"error": "User has no organization"}, status=status.HTTP_400_BAD_REQUEST)
+        elif organization_id:
+            try:
+                organization_id = uuid.UUID(str(organization_id))
+            except ValueError:
+                return Response({"error": "organization must be a UUID"}, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = procurement.generate_purchase_orders(organization_id, user)
+        orders = self.get_queryset().filter(pk__in=[order.pk for order in orders])
+        return Response(self.get_serializer(orders, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """Send a draft purchase order to the vendor"""
+        order = self.get_object()
+        if order.status != 'draft':
+            return Response({"error": "Only draft purchase orders can be submitted"}, status=status.HTTP_400_BAD_REQUEST)
+
+        order.status = 'submitted'
+        order.submitted_at = timezone.now()
+        order.save(update_fields=['status', 'submitted_at', 'updated_at'])
+        return Response(self.get_serializer(order).data)
+
+    @action(detail=True, methods=['post'])
+    def receive(self, request, pk=None):
+        """Book every outstanding line into stock in one bulk posting"""
+        order = self.get_object()
+        try:
+            order, movements = procurement.receive_purchase_order(order, request.user)
+        except procurement.ProcurementError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": f"Received {len(movements)} lines",
+            "purchase_order": self.get_serializer(self.get_object()).data,
+        })
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel an open purchase order; its rows become eligible for the next generation run"""
+        order = self.get_object()
+        if order.status not in procurement.OPEN_STATUSES:
+            return Response({"error": f"Cannot cancel a {order.status} purchase order"}, status=status.HTTP_400_BAD_REQUEST)
+
+        order.status = 'cancelled'
+        order.save(update_fields=['status', 'updated_at'])
+        return Response(self.get_serializer(order).data)
@@ -1,9 +1,10 @@
 from django.db import models
 import uuid
 from django.core.exceptions import ValidationError
+from core.models import DirtyFieldsModel
 
 
-class Organization(models.Model):
+class Organization(DirtyFieldsModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255, unique=True)
     code = models.CharField(max_length=10, unique=True, blank=True)
@@ -35,7 +36,7 @@ class Organization(models.Model):
         return f"{self.name} ({self.code})"
 
 
-class Department(models.Model):
+class Department(DirtyFieldsModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     organization = models.ForeignKey(
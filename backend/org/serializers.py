@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import Organization, Department
 from django.core.exceptions import ValidationError
 
+from core.serializers import ExpandableFieldsMixin
+
 
 class DepartmentSerializer(serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', read_only=True)
@@ -17,15 +19,24 @@ class DepartmentSerializer(serializers.ModelSerializer):
         }
 
 
-class OrganizationSerializer(serializers.ModelSerializer):
+class OrganizationSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     departments = DepartmentSerializer(many=True, read_only=True)
-    department_count = serializers.IntegerField(source='departments.count', read_only=True)
+    department_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Organization
         fields = ["id", "name", "code", "address", "phone", "email", 
                  "is_active", "departments", "department_count", "created_at", "updated_at"]
         read_only_fields = ["id", "code", "created_at", "updated_at"]
+        # Only included with ?expand=departments
+        expandable_fields = ["departments"]
+
+    def get_department_count(self, obj) -> int:
+        """Use the queryset annotation when present, otherwise count (uses prefetched rows if any)"""
+        count = getattr(obj, "department_count", None)
+        if count is None:
+            count = obj.departments.count()
+        return count
     
     def validate_code(self, value):
         """Validate organization code format"""
@@ -3,6 +3,11 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Organization, Department
 from services.models import AuditLog  # assuming centralized audit model
+from core import cache
+
+# Cached namespaces that embed organization or department data
+ORGANIZATION_NAMESPACES = ["organizations", "departments", "items", "stores", "vendor_items"]
+DEPARTMENT_NAMESPACES = ["organizations", "departments", "stores"]
 
 @receiver(post_save, sender=Organization)
 def log_org_save(sender, instance, created, **kwargs):
@@ -24,4 +29,11 @@ def log_org_delete(sender, instance, **kwargs):
         description=f"Organization {instance.name} deleted"
     )
 
+@receiver([post_save, post_delete], sender=Organization)
+def invalidate_org_cache(sender, instance, **kwargs):
+    cache.invalidate(ORGANIZATION_NAMESPACES, instance.id)
+
 # Repeat for Department
+@receiver([post_save, post_delete], sender=Department)
+def invalidate_department_cache(sender, instance, **kwargs):
+    cache.invalidate(DEPARTMENT_NAMESPACES, instance.organization_id)
@@ -2,6 +2,12 @@ from rest_framework import serializers, viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db.models import Count
+
+from core.cache import cache_response
+from core.conditional import conditional_response
+from core.fieldsets import SparseFieldsetMixin
+from core.serializers import requested_expansions
 
 from .models import Organization, Department
 from .serializers import (
@@ -50,11 +56,11 @@ class IsInOrganization(permissions.BasePermission):
         return False
 
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+class OrganizationViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing organizations.
     """
-    queryset = Organization.objects.filter(is_active=True).prefetch_related('departments')
+    queryset = Organization.objects.filter(is_active=True).annotate(department_count=Count('departments'))
     permission_classes = [permissions.IsAuthenticated, IsAdminOrOperations]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]  # Removed DjangoFilterBackend
     search_fields = ['name', 'code']
@@ -68,23 +74,38 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             return UpdateOrganizationSerializer
         return OrganizationSerializer
 
+    @conditional_response("organizations")
+    @cache_response("organizations")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response("organizations")
+    @cache_response("organizations")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         """
         Multi-tenant isolation: users only see organizations they have access to.
         """
         user = self.request.user
+        queryset = self.queryset
+
+        # Department trees are only loaded when asked for with ?expand=departments
+        if 'departments' in requested_expansions(self.request):
+            queryset = queryset.prefetch_related('departments')
         
         # Superusers and admin role can see all organizations
         if user.is_superuser or user.role == 'admin':
-            return self.queryset
+            return queryset
         
         # Operations role can see all organizations
         if user.role == 'operations':
-            return self.queryset
+            return queryset
         
         # Regular users can only see their own organization
         if user.organization:
-            return self.queryset.filter(id=user.organization.id)
+            return queryset.filter(id=user.organization.id)
         
         # Users without organization can't see any
         return Organization.objects.none()
@@ -127,7 +148,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         return Response({"message": f"Organization {organization.name} has been activated"})
 
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing departments.
     """
@@ -139,6 +160,16 @@ class DepartmentViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
+    @conditional_response("departments")
+    @cache_response("departments")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response("departments")
+    @cache_response("departments")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         """
         Multi-tenant isolation: filter departments based on user's organization.
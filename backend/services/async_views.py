@@ -0,0 +1,45 @@
+"""
+Async variant of the requisition queue read, for serving under ASGI.
+"""
+from django.db.models import Count
+
+from core.async_views import api_view, paginate
+from org.models import Organization
+
+from .models import Requisition
+from .serializers import REQUISITION_RELATIONS, RequisitionSerializer
+
+OPEN_STATUSES = ("requested", "approved", "reserved", "delivered")
+
+
+@api_view
+async def requisition_queue(request):
+    """
+    Open requisitions (or ``?status=``), oldest first, scoped like
+    RequisitionViewSet.get_queryset and paginated like its list.
+    """
+    user = request.user
+    queryset = Requisition.objects.select_related("organization", *REQUISITION_RELATIONS)
+    if user.role not in ["operations", "admin"]:
+        queryset = queryset.filter(department_id=user.department_id)
+
+    if request.GET.get("status"):
+        queryset = queryset.filter(status=request.GET["status"])
+    else:
+        queryset = queryset.filter(status__in=OPEN_STATUSES)
+    if request.GET.get("priority"):
+        queryset = queryset.filter(priority=request.GET["priority"])
+
+    return await paginate(request, queryset.order_by("created_at"), RequisitionSerializer, prepare=_count_departments)
+
+
+async def _count_departments(requisitions):
+    """OrganizationSerializer reads department_count; supply it instead of a lazy count"""
+    counts = {
+        pk: count
+        async for pk, count in Organization.objects.filter(
+            pk__in={requisition.organization_id for requisition in requisitions}
+        ).annotate(count=Count("departments")).values_list("pk", "count")
+    }
+    for requisition in requisitions:
+        requisition.organization.department_count = counts[requisition.organization_id]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_rename_created_at_auditlog_timestamp_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requisition',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
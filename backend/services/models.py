@@ -2,13 +2,14 @@ from django.db import models
 from django.utils import timezone
 from users.models import CustomUser
 from org.models import Department, Organization
+from core.models import VersionedModel
 from inventory.models import Inventory
 import uuid
 
 # ----------------------------
 # Requisition
 # ----------------------------
-class Requisition(models.Model):
+class Requisition(VersionedModel):
     STATUS_CHOICES = [
         ("requested", "Requested"),
         ("approved", "Approved"),
@@ -4,6 +4,19 @@ from inventory.serializers import InventorySerializer
 from users.serializers import UserSerializer
 from org.serializers import DepartmentSerializer, OrganizationSerializer
 
+# Forward relations RequisitionSerializer reads, besides the organization
+# (joined by the async queue, prefetched with department_count by the viewset)
+REQUISITION_RELATIONS = (
+    "department__organization",
+    "requested_by__organization",
+    "requested_by__department",
+    "hod__organization",
+    "hod__department",
+    "item__item__organization",
+    "item__store__organization",
+    "item__store__department",
+)
+
 class RequisitionSerializer(serializers.ModelSerializer):
     requested_by = UserSerializer(read_only=True)
     hod = UserSerializer(read_only=True)
@@ -14,6 +27,7 @@ class RequisitionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Requisition
         fields = "__all__"
+        read_only_fields = ["version"]
 
 
 class RequisitionCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,22 @@
+# services/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from core import events
+from .models import AuditLog, Requisition
+
+
+@receiver(post_save, sender=AuditLog)
+def publish_requisition_transition(sender, instance, created, **kwargs):
+    if not created or instance.object_type != "Requisition" or not events.listening():
+        return
+    requisition = Requisition.objects.filter(pk=instance.object_id).values(
+        "organization_id", "department_id", "status"
+    ).first()
+    if requisition is None:
+        return
+    events.publish_on_commit(requisition["organization_id"], "requisition.transitioned", {
+        "requisition": instance.object_id,
+        "action": instance.action,
+        "status": requisition["status"],
+        "department": requisition["department_id"],
+    })
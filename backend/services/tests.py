@@ -1,3 +1,296 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from inventory.models import Inventory, InventoryMovement, Item, Store
+from inventory.stock import InsufficientStock, post_movements
+from org.models import Department, Organization
+from users.models import CustomUser
+
+from . import views
+from .models import Requisition
+
+
+class RequisitionTestData(TestCase):
+    """An organization with two departments, a stocked store and requisition users"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name="North Trust")
+        cls.department = Department.objects.create(name="Ward 1", organization=cls.organization)
+        Department.objects.create(name="Ward 2", organization=cls.organization)
+        cls.admin = CustomUser.objects.create_user(
+            "admin@example.com", "Admin", "pw", role="admin", is_superuser=True
+        )
+        cls.officer = CustomUser.objects.create_user(
+            "officer@example.com", "Officer", "pw", role="officer",
+            organization=cls.organization, department=cls.department,
+        )
+        cls.hod = CustomUser.objects.create_user(
+            "hod@example.com", "Hod", "pw", role="hod",
+            organization=cls.organization, department=cls.department,
+        )
+        cls.store = Store.objects.create(name="Main", organization=cls.organization, department=cls.department)
+        cls.item = Item.objects.create(name="Glove", sku="GLV-001", organization=cls.organization)
+        cls.inventory = Inventory.objects.create(
+            item=cls.item, store=cls.store, quantity_available=10, minimum_quantity=2
+        )
+
+    def requisition(self, quantity=1, **fields):
+        return Requisition.objects.create(
+            organization=self.organization, department=self.department, item=self.inventory,
+            quantity=quantity, requested_by=self.officer, hod=self.hod, **fields
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class RequisitionListTests(RequisitionTestData):
+
+    def list_queries(self, user):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(user).get("/api/service/requisitions/")
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries), response.json()["results"]
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.requisition()
+        few, _ = self.list_queries(self.admin)
+        for _ in range(5):
+            self.requisition()
+        many, results = self.list_queries(self.admin)
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(results), 6)
+
+    def test_department_count_comes_from_the_annotation(self):
+        self.requisition()
+        _, results = self.list_queries(self.officer)
+        self.assertEqual(results[0]["organization"]["department_count"], 2)
+
+
+class RequisitionQueueTests(RequisitionTestData):
+    """The async queue returns what the requisition list does for the same filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # 21 requested (14 in the officer's department) and 5 rejected, oldest first
+        other_department = Department.objects.get(name="Ward 2")
+        start = timezone.now()
+        for index in range(26):
+            requisition = Requisition.objects.create(
+                organization=cls.organization, department=other_department if index % 3 == 0 else cls.department,
+                item=cls.inventory, quantity=1, requested_by=cls.officer, hod=cls.hod,
+                status="rejected" if index % 5 == 4 else "requested", priority="urgent" if index % 2 else "normal",
+            )
+            Requisition.objects.filter(pk=requisition.pk).update(created_at=start + timedelta(minutes=index))
+
+    def get_queue(self, user=None, **params):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"} if user else {}
+        # A lazy relation lookup in the view would raise SynchronousOnlyOperation here
+        return async_to_sync(AsyncClient().get)("/api/service/async/requisitions/queue/", params, headers=headers)
+
+    def assertMatchesList(self, user, **params):
+        response = self.get_queue(user, **params)
+        expected = self.client_for(user).get("/api/service/requisitions/", params)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        for link in ("next", "previous"):
+            if body[link]:
+                body[link] = body[link].replace("/async/requisitions/queue/", "/requisitions/")
+        self.assertEqual(body, expected.json())
+        return body
+
+    def test_requests_without_a_token_are_rejected(self):
+        response = self.get_queue()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"detail": "Authentication credentials were not provided."})
+
+    def test_matches_the_requisition_list(self):
+        for user, count in ((self.admin, 21), (self.officer, 14)):
+            body = self.assertMatchesList(user, status="requested")
+            self.assertEqual(body["count"], count)
+            self.assertMatchesList(user, status="requested", priority="urgent")
+            self.assertMatchesList(user, status="rejected")
+
+    def test_paginates_like_the_requisition_list(self):
+        first = self.assertMatchesList(self.admin, status="requested")
+        self.assertEqual(len(first["results"]), 20)
+        self.assertIsNotNone(first["next"])
+        second = self.assertMatchesList(self.admin, status="requested", page=2)
+        self.assertEqual(len(second["results"]), 1)
+        self.assertIsNotNone(second["previous"])
+
+    def test_defaults_to_open_requisitions(self):
+        body = self.get_queue(self.admin).json()
+        self.assertEqual(body["count"], 21)
+        self.assertEqual({row["status"] for row in body["results"]}, {"requested"})
+
+
+class ReserveStockTests(RequisitionTestData):
+
+    def reserve(self, requisition):
+        return self.client_for(self.admin).post(f"/api/service/requisitions/{requisition.pk}/reserve_stock/")
+
+    def test_reserve_moves_stock_to_reserved(self):
+        requisition = self.requisition(quantity=4, status="approved")
+        self.assertEqual(self.reserve(requisition).status_code, 200)
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.quantity_available, self.inventory.reserved_quantity), (6, 4))
+
+    def test_concurrent_reservation_cannot_overdraw_stock(self):
+        first = self.requisition(quantity=8, status="approved")
+        second = self.requisition(quantity=8, status="approved")
+        real_get_object = views.RequisitionViewSet.get_object
+
+        def get_object_then_competitor(view):
+            # The competing reservation commits after this request loaded the inventory row
+            requisition = real_get_object(view)
+            if requisition.pk == second.pk:
+                self.assertEqual(self.reserve(first).status_code, 200)
+            return requisition
+
+        with mock.patch.object(views.RequisitionViewSet, "get_object", get_object_then_competitor):
+            response = self.reserve(second)
+
+        self.assertEqual(response.status_code, 409)
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.quantity_available, self.inventory.reserved_quantity), (2, 8))
+        second.refresh_from_db()
+        self.assertEqual(second.status, "approved")
+        self.assertEqual(InventoryMovement.objects.filter(source_id=str(second.pk)).count(), 0)
+
+    def test_only_an_approved_requisition_is_reserved(self):
+        requisition = self.requisition(quantity=4, status="approved")
+        self.assertEqual(self.reserve(requisition).status_code, 200)
+        response = self.reserve(requisition)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Requisition must be approved before stock is reserved"})
+        self.assertEqual(self.reserve(self.requisition(quantity=1)).status_code, 400)
+
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.quantity_available, self.inventory.reserved_quantity), (6, 4))
+        self.assertEqual(InventoryMovement.objects.filter(movement_type="reserve").count(), 1)
+
+    def test_concurrent_reservation_of_the_same_requisition_is_kept_once(self):
+        requisition = self.requisition(quantity=4, status="approved")
+        real_get_object = views.RequisitionViewSet.get_object
+        raced = []
+
+        def get_object_then_competitor(view):
+            # The same requisition is reserved by another request after this one loaded it
+            loaded = real_get_object(view)
+            if not raced:
+                raced.append(True)
+                self.assertEqual(self.reserve(requisition).status_code, 200)
+            return loaded
+
+        with mock.patch.object(views.RequisitionViewSet, "get_object", get_object_then_competitor):
+            response = self.reserve(requisition)
+
+        self.assertEqual(response.status_code, 409)
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.quantity_available, self.inventory.reserved_quantity), (6, 4))
+        self.assertEqual(InventoryMovement.objects.filter(source_id=str(requisition.pk)).count(), 1)
+
+    def test_post_movements_rejects_an_overdraw_as_a_whole(self):
+        other = Inventory.objects.create(
+            item=Item.objects.create(name="Tape", sku="TPE-001", organization=self.organization),
+            store=self.store, quantity_available=5,
+        )
+        movements = [
+            InventoryMovement(inventory=self.inventory, movement_type="stock_out", quantity=3),
+            InventoryMovement(inventory=other, movement_type="stock_out", quantity=6),
+        ]
+        with self.assertRaises(InsufficientStock) as raised:
+            post_movements(movements)
+
+        self.assertEqual(raised.exception.inventory_ids, [other.pk])
+        self.assertEqual(
+            list(Inventory.objects.filter(pk__in=[self.inventory.pk, other.pk]).values_list("quantity_available", flat=True).order_by("quantity_available")),
+            [5, 10],
+        )
+        self.assertFalse(InventoryMovement.objects.exists())
+
+
+class RequisitionWorkflowTests(RequisitionTestData):
+
+    def post(self, requisition, action):
+        return self.client_for(self.admin).post(f"/api/service/requisitions/{requisition.pk}/{action}/")
+
+    def test_deliver_and_verify_are_routed_and_post_the_ledger(self):
+        requisition = self.requisition(quantity=3, status="approved")
+        self.assertEqual(self.post(requisition, "reserve_stock").status_code, 200)
+        self.assertEqual(self.post(requisition, "deliver").status_code, 200)
+
+        self.inventory.refresh_from_db()
+        self.assertEqual((self.inventory.quantity_available, self.inventory.reserved_quantity), (7, 0))
+        self.assertEqual(
+            sorted(InventoryMovement.objects.filter(source_id=str(requisition.pk)).values_list("movement_type", flat=True)),
+            ["release", "reserve", "stock_out"],
+        )
+
+        self.assertEqual(self.post(requisition, "verify").status_code, 200)
+        requisition.refresh_from_db()
+        self.assertEqual(requisition.status, "completed")
+
+    def test_deliver_requires_a_reservation(self):
+        requisition = self.requisition(status="approved")
+        self.assertEqual(self.post(requisition, "deliver").status_code, 400)
+
+
+class RequisitionFieldsetTests(RequisitionTestData):
+    url = "/api/service/requisitions/"
+
+    def setUp(self):
+        for _ in range(3):
+            self.requisition()
+
+    def listing(self, params, queries):
+        with CaptureQueriesContext(connection) as captured, self.assertNumQueries(queries):
+            response = self.client_for(self.admin).get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        # The count query comes first, the page of rows second
+        return response.json()["results"], captured.captured_queries[1]["sql"]
+
+    def test_full_listing_joins_every_relation_and_prefetches_the_organization(self):
+        rows, sql = self.listing({}, queries=3)
+        self.assertIn('"inventory_store"', sql)
+        self.assertIn('"users_customuser"', sql)
+        self.assertEqual(rows[0]["organization"]["department_count"], 2)
+
+    def test_fields_drop_joins_prefetches_and_columns(self):
+        rows, sql = self.listing({"fields": "id,status"}, queries=2)
+        self.assertEqual(list(rows[0]), ["id", "status"])
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn('"reason"', sql)
+
+    def test_nested_fields_join_only_their_path(self):
+        rows, sql = self.listing({"fields": "id,item.item.name"}, queries=2)
+        self.assertEqual(rows[0]["item"], {"item": {"name": "Glove"}})
+        self.assertIn('"inventory_item"', sql)
+        self.assertNotIn('"inventory_store"', sql)
+        self.assertNotIn('"users_customuser"', sql)
+        self.assertNotIn('"inventory_item"."sku"', sql)
+
+    def test_omit_drops_the_omitted_relations(self):
+        omit = "organization,item,requested_by,hod,department.organization_name,department.organization_code"
+        rows, sql = self.listing({"omit": omit}, queries=2)
+        self.assertNotIn("organization", rows[0])
+        self.assertNotIn("organization_name", rows[0]["department"])
+        self.assertEqual(rows[0]["department"]["name"], "Ward 1")
+        self.assertIn('"org_department"', sql)
+        self.assertNotIn('"org_organization"', sql)
+        self.assertNotIn('"inventory_inventory"', sql)
+        self.assertNotIn('"users_customuser"', sql)
@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import RequisitionViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r"requisitions", RequisitionViewSet, basename="requisitions")
 
 urlpatterns = [
+    path("async/requisitions/queue/", async_views.requisition_queue, name="async-requisition-queue"),
     path("", include(router.urls)),
 ]
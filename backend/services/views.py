@@ -2,10 +2,17 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Requisition, AuditLog
-from .serializers import RequisitionSerializer, RequisitionCreateSerializer
+from .serializers import REQUISITION_RELATIONS, RequisitionSerializer, RequisitionCreateSerializer
 from inventory.models import Inventory, InventoryMovement
+from org.models import Organization
+from inventory.stock import InsufficientStock, post_movements
+from core.concurrency import OptimisticConcurrencyMixin
+from core.fieldsets import SparseFieldsetMixin
+from core.idempotency import idempotent
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Prefetch
 
 class IsHODOrOperations(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -17,10 +24,12 @@ class IsStoreManagerOrOperations(permissions.BasePermission):
         return request.user.is_authenticated and request.user.role in ["store_manager", "operations", "admin"]
 
 
-class RequisitionViewSet(viewsets.ModelViewSet):
+class RequisitionViewSet(OptimisticConcurrencyMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Requisition.objects.all()
     serializer_class = RequisitionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ["status", "priority"]
+    ordering = ["created_at"]
 
     def get_serializer_class(self):
         if self.action in ["create"]:
@@ -29,14 +38,23 @@ class RequisitionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Requisition.objects.select_related(*REQUISITION_RELATIONS).prefetch_related(
+            # OrganizationSerializer reads department_count from the annotation
+            Prefetch("organization", queryset=Organization.objects.annotate(department_count=Count("departments")))
+        )
         if user.role in ["operations", "admin"]:
-            return Requisition.objects.all()
-        return Requisition.objects.filter(department=user.department)
+            return queryset
+        return queryset.filter(department=user.department)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     # -----------------------
     # Approve / Reject Actions
     # -----------------------
     @action(detail=True, methods=["post"], permission_classes=[IsHODOrOperations])
+    @idempotent
     def approve(self, request, pk=None):
         req = self.get_object()
         req.status = "approved"
@@ -62,6 +80,7 @@ class RequisitionViewSet(viewsets.ModelViewSet):
         return Response({"status": "approved"}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], permission_classes=[IsHODOrOperations])
+    @idempotent
     def reject(self, request, pk=None):
         req = self.get_object()
         req.status = "rejected"
@@ -89,19 +108,36 @@ class RequisitionViewSet(viewsets.ModelViewSet):
     # Reserve Stock
     # -----------------------
     @action(detail=True, methods=["post"], permission_classes=[IsStoreManagerOrOperations])
+    @idempotent
     def reserve_stock(self, request, pk=None):
         req = self.get_object()
         inventory = req.item
 
+        if req.status != "approved":
+            return Response({"error": "Requisition must be approved before stock is reserved"}, status=400)
         if inventory.quantity_available < req.quantity:
             return Response({"error": "Insufficient stock"}, status=400)
 
-        inventory.quantity_available -= req.quantity
-        inventory.reserved_quantity += req.quantity
-        inventory.save()
-
-        req.status = "reserved"
-        req.save()
+        # The posting refuses to overdraw the inventory if another reservation took the
+        # stock since the checks above; a concurrent reservation of this requisition
+        # fails the versioned save. Either way nothing is kept.
+        try:
+            with transaction.atomic():
+                post_movements([
+                    InventoryMovement(
+                        inventory=inventory,
+                        movement_type="reserve",
+                        quantity=req.quantity,
+                        source_type="requisition",
+                        source_id=str(req.id),
+                        performed_by=request.user,
+                    )
+                ])
+
+                req.status = "reserved"
+                req.save()
+        except InsufficientStock:
+            return Response({"error": "Insufficient stock"}, status=status.HTTP_409_CONFLICT)
 
         AuditLog.objects.create(
             object_type="Requisition",
@@ -113,93 +149,98 @@ class RequisitionViewSet(viewsets.ModelViewSet):
 
         return Response({"status": "reserved"}, status=200)
 
-# -----------------------
-# Deliver Action
-# -----------------------
-@action(detail=True, methods=["post"], permission_classes=[IsStoreManagerOrOperations])
-def deliver(self, request, pk=None):
-    req = self.get_object()
-
-    if req.status != "reserved":
-        return Response({"error": "Requisition must be reserved before delivery"}, status=400)
-
-    # Reduce reserved, stock already reduced in reservation
-    inventory = req.item
-    inventory.reserved_quantity -= req.quantity
-    inventory.save()
-
-    # Log inventory movement
-    InventoryMovement.objects.create(
-        inventory=inventory,
-        movement_type="stock_out",
-        quantity=req.quantity,
-        performed_by=request.user,
-        reference=str(req.id)
-    )
-
-    req.status = "delivered"
-    req.save()
-
-    # Audit log
-    AuditLog.objects.create(
-        object_type="Requisition",
-        object_id=str(req.id),
-        action="delivered",
-        performed_by=request.user,
-        description=f"{req.quantity} of {req.item.item.name} delivered"
-    )
-
-    # Email notification
-    send_mail(
-        "Requisition Delivered",
-        f"Requisition {req.id} has been delivered to {req.department.name}",
-        settings.DEFAULT_FROM_EMAIL,
-        [req.requested_by.email, req.hod.email],
-    )
-
-    return Response({"status": "delivered"}, status=200)
-
-
-# -----------------------
-# Verify / Complete Action
-# -----------------------
-@action(detail=True, methods=["post"], permission_classes=[IsHODOrOperations])
-def verify(self, request, pk=None):
-    req = self.get_object()
-
-    if req.status != "delivered":
-        return Response({"error": "Requisition must be delivered before verification"}, status=400)
-
-    req.status = "verified"
-    req.save()
-
-    # Audit log
-    AuditLog.objects.create(
-        object_type="Requisition",
-        object_id=str(req.id),
-        action="verified",
-        performed_by=request.user,
-        description=f"Requisition {req.id} verified by HOD"
-    )
-
-    # Optional: mark complete if verification equals completion
-    req.status = "completed"
-    req.save()
-
-    AuditLog.objects.create(
-        object_type="Requisition",
-        object_id=str(req.id),
-        action="completed",
-        performed_by=request.user,
-        description=f"Requisition {req.id} completed"
-    )
-
-    # Email notification
-    send_mail(
-        "Requisition Completed",
-        f"Requisition {req.id} has been fully completed",
-        settings.DEFAULT_FROM_EMAIL,
-        [req.requested_by.email, req.hod.email],
-    )
-
-    return Response({"status": "completed"}, status=200)
+    # -----------------------
+    # Deliver Action
+    # -----------------------
+    @action(detail=True, methods=["post"], permission_classes=[IsStoreManagerOrOperations])
+    @idempotent
+    def deliver(self, request, pk=None):
+        req = self.get_object()
+
+        if req.status != "reserved":
+            return Response({"error": "Requisition must be reserved before delivery"}, status=400)
+
+        # Reserved stock leaves the store: release it and book it out in one posting
+        try:
+            with transaction.atomic():
+                post_movements([
+                    InventoryMovement(
+                        inventory=req.item,
+                        movement_type=movement_type,
+                        quantity=req.quantity,
+                        source_type="requisition",
+                        source_id=str(req.id),
+                        performed_by=request.user,
+                    )
+                    for movement_type in ("release", "stock_out")
+                ])
+
+                req.status = "delivered"
+                req.save()
+        except InsufficientStock:
+            return Response({"error": "Reserved stock is no longer available"}, status=status.HTTP_409_CONFLICT)
+
+        # Audit log
+        AuditLog.objects.create(
+            object_type="Requisition",
+            object_id=str(req.id),
+            action="delivered",
+            performed_by=request.user,
+            description=f"{req.quantity} of {req.item.item.name} delivered"
+        )
+
+        # Email notification
+        send_mail(
+            "Requisition Delivered",
+            f"Requisition {req.id} has been delivered to {req.department.name}",
+            settings.DEFAULT_FROM_EMAIL,
+            [req.requested_by.email, req.hod.email],
+        )
+
+        return Response({"status": "delivered"}, status=200)
+
+
+    # -----------------------
+    # Verify / Complete Action
+    # -----------------------
+    @action(detail=True, methods=["post"], permission_classes=[IsHODOrOperations])
+    @idempotent
+    def verify(self, request, pk=None):
+        req = self.get_object()
+
+        if req.status != "delivered":
+            return Response({"error": "Requisition must be delivered before verification"}, status=400)
+
+        req.status = "verified"
+        req.save()
+
+        # Audit log
+        AuditLog.objects.create(
+            object_type="Requisition",
+            object_id=str(req.id),
+            action="verified",
+            performed_by=request.user,
+            description=f"Requisition {req.id} verified by HOD"
+        )
+
+        # Optional: mark complete if verification equals completion
+        req.status = "completed"
+        req.save()
+
+        AuditLog.objects.create(
+            object_type="Requisition",
+            object_id=str(req.id),
+            action="completed",
+            performed_by=request.user,
+            description=f"Requisition {req.id} completed"
+        )
+
+        # Email notification
+        send_mail(
+            "Requisition Completed",
+            f"Requisition {req.id} has been fully completed",
+            settings.DEFAULT_FROM_EMAIL,
+            [req.requested_by.email, req.hod.email],
+        )
+
+        return Response({"status": "completed"}, status=200)
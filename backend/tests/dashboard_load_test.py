@@ -0,0 +1,167 @@
+"""
+Concurrent dashboard load against the inventory/requisition read endpoints.
+
+Simulates many dashboards polling the summary, low/out-of-stock lists, open
+alerts and the requisition queue, and reports throughput and latency
+percentiles. Run it once per variant against the matching server:
+
+    # current WSGI path (synchronous viewsets)
+    gunicorn backend.wsgi:application --workers 1 --threads 8 --bind 127.0.0.1:8000
+    python tests/dashboard_load_test.py --variant sync --email ... --password ...
+
+    # async views under ASGI
+    uvicorn backend.asgi:application --workers 1 --port 8000
+    python tests/dashboard_load_test.py --variant async --email ... --password ...
+
+Use the same worker count for both runs. Standard library only.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import urllib.request
+
+BASE_URL = "http://localhost:8000"
+
+ENDPOINTS = {
+    "summary": ("/api/store/inventories/summary/", "/api/store/async/inventories/summary/"),
+    "low_stock": ("/api/store/inventories/low_stock/", "/api/store/async/inventories/low_stock/"),
+    "out_of_stock": ("/api/store/inventories/out_of_stock/", "/api/store/async/inventories/out_of_stock/"),
+    "alerts": ("/api/store/stock-alerts/", "/api/store/async/stock-alerts/"),
+    "requisition_queue": ("/api/service/requisitions/?status=requested", "/api/service/async/requisitions/queue/?status=requested"),
+}
+
+
+def print_report(message):
+    print(f"[REPORT] {message}")
+
+
+def login(base_url, email, password):
+    request = urllib.request.Request(
+        f"{base_url}/api/auth/users/login/",
+        data=json.dumps({"email": email, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["access"]
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection, like a browser tab polling"""
+
+    def __init__(self, host, port, token):
+        self.host, self.port, self.token = host, port, token
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAuthorization: Bearer {self.token}\r\n"
+            f"Accept: application/json\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length, close = 0, False
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "connection" and value.strip().lower() == "close":
+                close = True
+        await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def dashboard(client, paths, deadline, results, errors):
+    while time.perf_counter() < deadline:
+        for name, path in paths:
+            t0 = time.perf_counter()
+            try:
+                status = await client.get(path)
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                client.close()
+                status = None
+            if status != 200:
+                errors[name] = errors.get(name, 0) + 1
+                continue
+            results[name].append(time.perf_counter() - t0)
+    client.close()
+
+
+async def run(args, token):
+    host, _, port = args.url.split("://", 1)[1].partition(":")
+    port = int(port or 80)
+    index = 0 if args.variant == "sync" else 1
+    paths = [(name, variants[index]) for name, variants in ENDPOINTS.items()]
+
+    # Warm up connections, caches and the query plan before measuring
+    warmup = Client(host, port, token)
+    for name, path in paths:
+        status = await warmup.get(path)
+        if status != 200:
+            raise SystemExit(f"{path} answered {status}")
+    warmup.close()
+
+    results = {name: [] for name, _ in paths}
+    errors = {}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        dashboard(Client(host, port, token), paths, deadline, results, errors)
+        for _ in range(args.concurrency)
+    ))
+    return results, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--variant", choices=["sync", "async"], required=True)
+    parser.add_argument("--token", help="JWT access token (or use --email/--password)")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--concurrency", type=int, default=50, help="Dashboards polling at once")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    args = parser.parse_args()
+
+    token = args.token or (args.email and login(args.url, args.email, args.password))
+    if not token:
+        print("Provide --token or --email/--password")
+        sys.exit(1)
+
+    print(f"Starting dashboard load test: {args.variant} endpoints, {args.concurrency} dashboards for {args.duration}s")
+    results, errors, elapsed = asyncio.run(run(args, token))
+
+    every = sorted(latency for latencies in results.values() for latency in latencies)
+    for name, latencies in results.items():
+        if latencies:
+            latencies.sort()
+            print_report(
+                f"{name:18} {len(latencies) / elapsed:8.1f} req/s  "
+                f"p50 {statistics.median(latencies) * 1000:7.1f}ms  p99 {percentile(latencies, 0.99) * 1000:7.1f}ms"
+            )
+    if every:
+        print_report(
+            f"{'total':18} {len(every) / elapsed:8.1f} req/s  "
+            f"p50 {statistics.median(every) * 1000:7.1f}ms  p99 {percentile(every, 0.99) * 1000:7.1f}ms"
+        )
+    print_report(f"errors {sum(errors.values())} {errors or ''}")
+    sys.exit(0 if not errors else 1)
+
+
+if __name__ == "__main__":
+    main()
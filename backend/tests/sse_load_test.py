@@ -0,0 +1,149 @@
+"""
+Load test for the server-sent events channel (/api/core/events/).
+
+Opens thousands of idle SSE connections against one ASGI worker, keeps them
+open for a while and reports how many stayed connected, connect latency and
+how many events/heartbeats arrived. Standard library only.
+
+    uvicorn backend.asgi:application --port 8000 --workers 1
+    ulimit -n 20000
+    python tests/sse_load_test.py --email admin@mail.com --password ... --connections 5000 --hold 60
+
+Publish a few changes while it runs (e.g. post a movement) to see them fan out.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import urllib.request
+
+BASE_URL = "http://localhost:8000"
+
+
+def print_report(message):
+    print(f"[REPORT] {message}")
+
+
+def login(base_url, email, password):
+    request = urllib.request.Request(
+        f"{base_url}/api/auth/users/login/",
+        data=json.dumps({"email": email, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["access"]
+
+
+class Stats:
+    def __init__(self):
+        self.connect_times = []
+        self.failures = 0
+        self.open = 0
+        self.events = 0
+        self.pings = 0
+        self.dropped = 0
+
+
+async def hold_connection(host, port, path, token, hold, stats, started, ramp):
+    try:
+        async with ramp:
+            t0 = time.perf_counter()
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write((
+                f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n"
+                f"Authorization: Bearer {token}\r\n\r\n"
+            ).encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            if b" 200 " not in status_line:
+                raise ConnectionError(status_line.decode(errors="replace").strip())
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+    except (OSError, ConnectionError) as exc:
+        stats.failures += 1
+        if stats.failures <= 5:
+            print_report(f"connect failed: {exc}")
+        return
+
+    stats.connect_times.append(time.perf_counter() - t0)
+    stats.open += 1
+    deadline = started + hold
+    try:
+        while (remaining := deadline - time.perf_counter()) > 0:
+            line = await asyncio.wait_for(reader.readline(), remaining)
+            if not line:
+                stats.dropped += 1
+                break
+            if b"event:" in line:
+                stats.events += 1
+            elif b": ping" in line:
+                stats.pings += 1
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        stats.open -= 1
+        writer.close()
+
+
+async def run(args, token):
+    host, _, port = args.url.split("://", 1)[1].partition(":")
+    port = int(port or 80)
+    path = "/api/core/events/"
+    if args.organization:
+        path += f"?organization={args.organization}"
+
+    stats = Stats()
+    started = time.perf_counter()
+    ramp = asyncio.Semaphore(args.ramp)
+    tasks = [
+        asyncio.create_task(hold_connection(host, port, path, token, args.hold, stats, started, ramp))
+        for _ in range(args.connections)
+    ]
+
+    async def progress():
+        while True:
+            await asyncio.sleep(5)
+            print_report(f"t={time.perf_counter() - started:5.1f}s open={stats.open} failed={stats.failures} events={stats.events} pings={stats.pings}")
+
+    reporter = asyncio.create_task(progress())
+    await asyncio.gather(*tasks)
+    reporter.cancel()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--token", help="JWT access token (or use --email/--password)")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--organization", help="Admins: subscribe to one organization only")
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--hold", type=float, default=60, help="Seconds to keep every connection open")
+    parser.add_argument("--ramp", type=int, default=200, help="Connections opened concurrently")
+    args = parser.parse_args()
+
+    token = args.token or (args.email and login(args.url, args.email, args.password))
+    if not token:
+        print("Provide --token or --email/--password")
+        sys.exit(1)
+
+    print(f"Starting SSE load test: {args.connections} connections held for {args.hold}s")
+    stats = asyncio.run(run(args, token))
+
+    connected = len(stats.connect_times)
+    print_report(f"connected {connected}/{args.connections}, failed {stats.failures}, dropped early {stats.dropped}")
+    if connected:
+        times = sorted(stats.connect_times)
+        print_report(
+            f"connect latency p50 {statistics.median(times) * 1000:.1f}ms "
+            f"p99 {times[int(len(times) * 0.99) - 1 if len(times) > 1 else 0] * 1000:.1f}ms"
+        )
+    print_report(f"events received {stats.events}, heartbeats {stats.pings}")
+    sys.exit(0 if stats.failures == 0 and stats.dropped == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager, Group, Permission
 from django.core.exceptions import ValidationError
+from core.models import DirtyFieldsModel
 from org.models import Organization, Department
 
 class CustomUserManager(BaseUserManager):
@@ -32,7 +33,7 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, full_name, password, **extra_fields)
 
 
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class CustomUser(DirtyFieldsModel, AbstractBaseUser, PermissionsMixin):
     NOTIFICATION_LEVEL = [
         ("all", "All"),
         ("approvals", "Only Approvals"),
@@ -8,6 +8,8 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.shortcuts import get_object_or_404
 
+from core.fieldsets import SparseFieldsetMixin
+
 from .models import CustomUser
 from .serializers import (
     UserSerializer, 
@@ -34,7 +36,7 @@ class IsAdminOrSelf(permissions.BasePermission):
         return request.user.is_superuser or request.user.role == 'admin'
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.filter(is_active=True).select_related('organization', 'department')
     serializer_class = UserSerializer
     